@@ -1,9 +1,27 @@
 import streamlit as st
 import pandas as pd
-import plotly.express as px
 import numpy as np
+import time
 from datetime import datetime
 
+from dimensions import DAY_KEY, date_to_key
+from config import (
+    TOPK_CONFIG, JOB_CONFIG, FILTER_CONFIG, MEMORY_CONFIG, PLANNER_CONFIG, WATCH_FOLDER_CONFIG, CHART_COLUMNS
+)
+from ingest import WatchedFolderSource
+from jobs import submit_ingest_job
+from engine import filter_mask
+from memory import memory_manager, result_cache, MB
+from planner import QueryPlanner, PATH_LABELS
+from profiling import profile_frame
+from progressive import ProgressiveRenderer, should_estimate
+from render import figure_cache
+from sampling import estimate_kpis, estimate_groupby, estimate_by_period
+from time_analytics import compute_time_metrics
+from topk import top_k, build_hierarchy, drilldown_top_k, approximate_top_k
+from utils import calculate_kpis, create_time_metrics_chart, GROWTH_PRECISION
+from warmup import get_default_dataset, get_default_sample, get_default_dictionaries
+
 # 页面配置
 st.set_page_config(
     page_title="BI数据分析系统",
@@ -89,80 +107,227 @@ st.title("📊 BI数据分析系统")
 # 侧边栏
 with st.sidebar:
     st.header("🎛️ 控制面板")
-    data_source = st.selectbox("选择数据源", ["示例数据", "上传文件"])
+    data_source = st.selectbox("选择数据源", ["示例数据", "上传文件", "监控文件夹"])
     
     if data_source == "上传文件":
         uploaded_file = st.file_uploader("上传数据文件", type=['csv', 'xlsx'])
     else:
         uploaded_file = None
 
-# 生成示例数据
-def generate_sample_data():
-    np.random.seed(42)
-    dates = pd.date_range(start='2023-01-01', end='2023-12-31', freq='D')
+# 上传文件在后台任务中解析，脚本线程不阻塞；新任务完成前继续显示上一个数据集
+def update_ingest_job(uploaded_file):
+    job = st.session_state.get('ingest_job')
+    
+    if uploaded_file is None:
+        # 文件被移除或切换了数据源，取消未完成的任务
+        if job is not None and job.running:
+            job.cancel()
+        return job
+    
+    if job is None or job.file_id != uploaded_file.file_id:
+        if job is not None and job.running:
+            job.cancel()
+        job = submit_ingest_job(uploaded_file.getvalue(), uploaded_file.name, uploaded_file.file_id)
+        st.session_state.ingest_job = job
     
-    data = []
-    for date in dates:
-        for _ in range(np.random.randint(5, 15)):
-            data.append({
-                '日期': date,
-                '产品类别': np.random.choice(['电子产品', '服装', '食品', '家居', '图书']),
-                '产品名称': np.random.choice(['iPhone', 'MacBook', 'T恤', '牛仔裤', '面包', '牛奶', '沙发', '台灯', '小说', '教材']),
-                '销售额': np.random.randint(100, 5000),
-                '数量': np.random.randint(1, 10),
-                '地区': np.random.choice(['北京', '上海', '广州', '深圳', '杭州']),
-                '客户类型': np.random.choice(['个人', '企业', 'VIP']),
-                '支付方式': np.random.choice(['信用卡', '支付宝', '微信', '现金'])
-            })
+    if job.status == 'done':
+        # 保存已完成的任务，其结果包括数据集、分层样本与维度字典
+        current = st.session_state.get('upload_dataset')
+        if current is None or current.file_id != job.file_id:
+            st.session_state.upload_dataset = job
     
-    return pd.DataFrame(data)
+    with st.sidebar:
+        if job.running:
+            st.progress(job.progress, text=f"正在解析 {job.filename}: "
+                        f"{job.bytes_read / 1024 / 1024:,.1f} / {job.total_bytes / 1024 / 1024:,.1f} MB, "
+                        f"{job.rows:,} 行")
+            if st.button("取消", key="cancel_ingest_job"):
+                job.cancel()
+        elif job.status == 'failed':
+            st.error(f"文件读取错误: {job.error}")
+        elif job.status == 'cancelled':
+            st.info(f"已取消导入 {job.filename}")
+    return job
+
+# 监控文件夹数据源（进程内共享，只解析新增的追加文件）
+@st.cache_resource
+def get_watched_source():
+    return WatchedFolderSource()
+
+# 日期筛选控件取值对应的日期键范围，未选完整范围时不限
+def date_range_keys(date_range):
+    if date_range and len(date_range) == 2:
+        start_key, end_key = date_to_key(list(date_range))
+        return int(start_key), int(end_key)
+    return None, None
+
+# 仪表盘需要读取的列：所需字段齐全的图表用到的字段，加上筛选条件涉及的字段（按存储中的列顺序）
+def dashboard_columns(available, filter_fields):
+    if WATCH_FOLDER_CONFIG['load_columns'] is not None:
+        return WATCH_FOLDER_CONFIG['load_columns']
+    needed = set(filter_fields) | {'日期'}
+    for fields in CHART_COLUMNS.values():
+        if all(field in available for field in fields):
+            needed.update(fields)
+    return [col for col in available if col in needed]
 
 # 加载数据
-@st.cache_data
-def load_data():
-    if uploaded_file is not None:
-        try:
-            if uploaded_file.name.endswith('.csv'):
-                df = pd.read_csv(uploaded_file)
-            else:
-                df = pd.read_excel(uploaded_file)
-            return df
-        except Exception as e:
-            st.error(f"文件读取错误: {e}")
-            return generate_sample_data()
+if data_source == "监控文件夹":
+    # 切换到监控文件夹时取消未完成的上传解析任务
+    update_ingest_job(None)
+    watched_source = get_watched_source()
+    new_rows = watched_source.refresh()
+    with st.sidebar:
+        st.caption(f"📂 {watched_source.folder} | 已接入 {watched_source.file_count} 个文件, {watched_source.row_count:,} 行")
+        if new_rows:
+            st.success(f"新增 {new_rows:,} 行数据")
+        for name, info in watched_source.errors.items():
+            st.warning(f"{name}: {'; '.join(info['errors'])}")
+        st.button("刷新数据", key="refresh_watched_source")
+    # 各批次在接入时已完成校验与预处理并按月分区存储；读取前先确定日期范围与所需的列，每次运行只读取一次。
+    # 日期控件的默认值为最近几个月（取自分区统计信息），控件取值在脚本重新运行前已写入 session_state；
+    # 未修改过日期范围时默认值随追加的数据更新
+    previous_default = st.session_state.get('watched_default_range')
+    selected_range = st.session_state.get('watched_date_range', previous_default)
+    if previous_default is None or tuple(selected_range) == tuple(previous_default):
+        st.session_state.watched_default_range = selected_range = watched_source.default_range()
+    loaded_range = date_range_keys(selected_range)
+    if loaded_range == (None, None):
+        # 只选了起始日期时沿用上次读取的范围，选完整范围后再读取
+        loaded_range = st.session_state.get('watched_loaded_range', (None, None))
+    st.session_state.watched_loaded_range = loaded_range
+    filter_fields = ['地区', '产品类别'] + [field for field in watched_source.dictionaries
+                                         if st.session_state.get(f"filter_select:{field}")]
+    df = watched_source.load(*loaded_range, columns=dashboard_columns(watched_source.store.columns, filter_fields))
+    dataset_aggregates = watched_source.aggregates
+    dataset_sample = watched_source.sample
+    dataset_dictionaries = watched_source.dictionaries
+    dataset_rows = watched_source.row_count
+else:
+    ingest_job = update_ingest_job(uploaded_file)
+    upload_dataset = st.session_state.get('upload_dataset') if uploaded_file is not None else None
+    if upload_dataset is not None:
+        # 后台任务已完成校验、预处理、预聚合、分层抽样与维度字典构建
+        df, dataset_sample = upload_dataset.result, upload_dataset.sample
+        dataset_dictionaries = upload_dataset.dictionaries
+        dataset_aggregates = upload_dataset.aggregates
     else:
-        return generate_sample_data()
+        # 默认数据集在服务启动时预热，或从磁盘快照加载
+        df, dataset_aggregates = get_default_dataset()
+        dataset_sample = get_default_sample()
+        dataset_dictionaries = get_default_dictionaries()
+    dataset_rows = len(df)
 
-# 加载数据
-df = load_data()
+# 数据集标识，与筛选条件一起作为派生结果的缓存键
+if data_source == "监控文件夹":
+    dataset_key = f"watched:{watched_source.row_count}"
+elif upload_dataset is not None:
+    dataset_key = f"upload:{upload_dataset.file_id}"
+else:
+    dataset_key = "sample"
+
+# 内存管理中的数据集标识（监控文件夹追加数据后仍为同一数据集）
+if data_source == "监控文件夹":
+    memory_dataset = "watched"
+elif upload_dataset is not None:
+    memory_dataset = upload_dataset.dataset
+else:
+    memory_dataset = "sample"
 
-# 数据预处理
-if not df.empty and '日期' in df.columns:
-    df['日期'] = pd.to_datetime(df['日期'])
-    df['月份'] = df['日期'].dt.to_period('M')
-    df['季度'] = df['日期'].dt.to_period('Q')
-    df['年份'] = df['日期'].dt.year
+# 产品排行的层级汇总（产品类别 -> 产品名称），切换K值与下钻时无需重新扫描明细
+def compute_product_rankings(filtered_df):
+    if TOPK_CONFIG['mode'] == 'approximate':
+        # 近似模式只维护摘要，不构建层级汇总（不支持下钻）
+        product_totals = approximate_top_k(filtered_df, '产品名称', '数量', TOPK_CONFIG['max_k'])['估计值']
+        return None, product_totals
+    levels = [col for col in ['产品类别', '产品名称'] if col in filtered_df.columns]
+    hierarchy = build_hierarchy(filtered_df, levels, '数量')
+    if len(levels) > 1:
+        product_totals = hierarchy.groupby(level='产品名称', sort=False).sum()
+    else:
+        product_totals = hierarchy
+    return hierarchy, product_totals
 
-# 主界面
-if not df.empty:
-    # 顶部指标
-    col1, col2, col3, col4 = st.columns(4)
+# 产品排行与时间分析指标（每个筛选状态只构建一次日序列，滚动、累计、环比与同比均由其派生）按筛选状态缓存；
+# 两者在渐进式渲染时于后台线程中计算，使用进程内的结果缓存而不是 st.cache_data（后者依赖脚本上下文）
+def get_product_rankings(filtered_df, filter_key):
+    return result_cache.get_or_compute('产品排行', filter_key, memory_dataset,
+                                       lambda: compute_product_rankings(filtered_df))
+
+def get_time_metrics(filtered_df, filter_key):
+    return result_cache.get_or_compute('时间分析', filter_key, memory_dataset,
+                                       lambda: compute_time_metrics(filtered_df))
+
+# 图表渲染到固定的占位元素：估算结果先行显示并加以标注，精确结果算完后在原位置替换
+def chart_renderer(slot, name, build, **kwargs):
+    def render(data, approximate):
+        fig = figure_cache.get_or_build(name, data, build, **kwargs)
+        if approximate:
+            with slot.container():
+                st.caption("≈ 样本估算结果，精确结果计算中…")
+                st.plotly_chart(fig, use_container_width=True)
+        else:
+            slot.plotly_chart(fig, use_container_width=True)
+    return render
+
+# 图表所需字段齐全时才显示该图表
+def chart_enabled(name, columns):
+    return name in CHART_COLUMNS and all(field in columns for field in CHART_COLUMNS[name])
+
+# 按维度字典检索取值的筛选控件，已选取值保存在 session_state 中，检索词变化时保持不变
+def searchable_filter(field, dictionary):
+    state_key = f"filter_values:{field}"
+    selected = [v for v in st.session_state.get(state_key, []) if v in dictionary.counts.index]
     
-    with col1:
-        total_sales = df['销售额'].sum() if '销售额' in df.columns else 0
-        st.metric("总销售额", f"¥{total_sales:,.0f}")
+    if len(dictionary) <= FILTER_CONFIG['max_options']:
+        options = dictionary.values
+    else:
+        query = st.text_input(f"检索{field}", key=f"filter_query:{field}", placeholder=f"共 {len(dictionary):,} 个取值")
+        limit = FILTER_CONFIG['search_limit'] if query else FILTER_CONFIG['top_values']
+        options = selected + [v for v in dictionary.search(query, limit) if v not in selected]
     
-    with col2:
-        total_orders = len(df)
-        st.metric("总订单数", f"{total_orders:,}")
+    selected = st.multiselect(f"选择{field}", options, default=selected, key=f"filter_select:{field}")
+    st.session_state[state_key] = selected
+    return selected
+
+# 主界面
+if dataset_rows > 0:
+    # 数据量较大时先用分层样本估算各指标与图表，精确结果在后台计算后替换；
+    # 后台任务保存在 session_state 中，重新运行时取消上次运行尚未开始的任务
+    renderer = ProgressiveRenderer(should_estimate(df, dataset_sample), st.session_state.get('refine_futures'))
+    st.session_state.refine_futures = renderer.futures
     
-    with col3:
+    # 顶部指标
+    kpi_slots = [col.empty() for col in st.columns(4)]
+    
+    def render_kpis(kpis, approximate):
+        total_sales = kpis.get('总销售额', 0)
+        total_orders = kpis.get('总订单数', 0)
         avg_order_value = total_sales / total_orders if total_orders > 0 else 0
-        st.metric("平均订单金额", f"¥{avg_order_value:,.0f}")
+        unique_customers = kpis.get('客户类型数', 0)
+        
+        if approximate:
+            margin = kpis.get('总销售额误差', 0)
+            kpi_slots[0].metric("总销售额 (估算)", f"≈¥{total_sales:,.0f}",
+                                help=f"95%置信区间: ¥{total_sales - margin:,.0f} ~ ¥{total_sales + margin:,.0f}，精确结果计算中")
+            kpi_slots[2].metric("平均订单金额 (估算)", f"≈¥{avg_order_value:,.0f}")
+            kpi_slots[3].metric("客户类型数 (估算)", f"≥{unique_customers}")
+        else:
+            kpi_slots[0].metric("总销售额", f"¥{total_sales:,.0f}")
+            kpi_slots[2].metric("平均订单金额", f"¥{avg_order_value:,.0f}")
+            kpi_slots[3].metric("客户类型数", f"{unique_customers}")
+        # 订单数由各层行数得到，估算阶段也是精确值
+        kpi_slots[1].metric("总订单数", f"{total_orders:,}")
     
-    with col4:
-        unique_customers = df['客户类型'].nunique() if '客户类型' in df.columns else 0
-        st.metric("客户类型数", f"{unique_customers}")
+    if dataset_aggregates and DAY_KEY in dataset_aggregates and '销售额' in df.columns:
+        # 直接使用预聚合结果，无需扫描明细
+        renderer.show(render_kpis, lambda: {
+            '总销售额': dataset_aggregates[DAY_KEY]['销售额'].sum(),
+            '总订单数': dataset_aggregates[DAY_KEY]['订单数'].sum(),
+            '客户类型数': len(dataset_aggregates['客户类型']) if '客户类型' in dataset_aggregates else 0
+        })
+    else:
+        renderer.show(render_kpis, lambda: calculate_kpis(df), lambda: estimate_kpis(dataset_sample))
     
     st.markdown("---")
     
@@ -171,9 +336,9 @@ if not df.empty:
     col1, col2, col3 = st.columns(3)
     
     with col1:
-        if '地区' in df.columns:
-            # 获取所有地区选项
-            all_regions = df['地区'].unique()
+        if '地区' in dataset_dictionaries:
+            # 获取所有地区选项（取自接入时构建的维度字典，无需扫描明细）
+            all_regions = dataset_dictionaries['地区'].values
             
             # 初始化session_state
             if 'selected_regions' not in st.session_state:
@@ -192,7 +357,7 @@ if not df.empty:
             selected_regions = st.multiselect(
                 "选择地区", 
                 all_regions, 
-                default=st.session_state.selected_regions,
+                default=[r for r in st.session_state.selected_regions if r in all_regions],
                 key="regions_multiselect"
             )
             
@@ -202,9 +367,9 @@ if not df.empty:
             selected_regions = []
     
     with col2:
-        if '产品类别' in df.columns:
+        if '产品类别' in dataset_dictionaries:
             # 获取所有产品类别选项
-            all_categories = df['产品类别'].unique()
+            all_categories = dataset_dictionaries['产品类别'].values
             
             # 初始化session_state
             if 'selected_categories' not in st.session_state:
@@ -223,7 +388,7 @@ if not df.empty:
             selected_categories = st.multiselect(
                 "选择产品类别", 
                 all_categories, 
-                default=st.session_state.selected_categories,
+                default=[c for c in st.session_state.selected_categories if c in all_categories],
                 key="categories_multiselect"
             )
             
@@ -234,23 +399,48 @@ if not df.empty:
     
     with col3:
         if '日期' in df.columns:
-            date_range = st.date_input("选择日期范围", value=(df['日期'].min().date(), df['日期'].max().date()))
+            # 默认范围为完整数据集的日期范围，监控文件夹为最近几个月（读取数据前已确定）
+            if data_source == "监控文件夹":
+                date_range = st.date_input("选择日期范围", value=st.session_state.watched_default_range,
+                                           key="watched_date_range")
+            else:
+                date_bounds = (df['日期'].min().date(), df['日期'].max().date())
+                date_range = st.date_input("选择日期范围", value=date_bounds, key="date_range")
         else:
             date_range = None
     
-    # 应用筛选
-    filtered_df = df.copy()
-    if selected_regions:
-        filtered_df = filtered_df[filtered_df['地区'].isin(selected_regions)]
-    if selected_categories:
-        filtered_df = filtered_df[filtered_df['产品类别'].isin(selected_categories)]
-    if date_range and len(date_range) == 2:
-        filtered_df = filtered_df[
-            (filtered_df['日期'].dt.date >= date_range[0]) &
-            (filtered_df['日期'].dt.date <= date_range[1])
-        ]
+    # 其余可选字段的筛选：取值较多时只列出已选取值与高频取值/检索结果
+    extra_fields = [field for field in dataset_dictionaries if field not in ('地区', '产品类别')]
+    extra_filters = {}
+    if extra_fields:
+        with st.expander("🔎 更多筛选", expanded=False):
+            for field, col in zip(extra_fields, st.columns(len(extra_fields))):
+                with col:
+                    selected = searchable_filter(field, dataset_dictionaries[field])
+                if selected:
+                    extra_filters[field] = selected
+    
+    # 查询规划：按筛选条件的估计选择率为明细与各图表选择预聚合、行索引或全表扫描
+    filters = {'地区': selected_regions, '产品类别': selected_categories, **extra_filters}
+    planner = QueryPlanner(df, dataset_aggregates, dataset_dictionaries, dataset_key).where(
+        filters, date_range_keys(date_range))
+    # 筛选后的明细只用于时间分析、产品排行与数据详情，启用渐进式渲染时在后台读取
+    filtered_rows = renderer.submit(planner.rows)
+    
+    # 分层样本的筛选（与查询规划器使用同一组条件，由计算引擎执行；
+    # 日期范围覆盖全部数据时不筛选，日期缺失的行与精确结果一样计入）
+    if renderer.enabled:
+        filtered_sample = dataset_sample[filter_mask(
+            dataset_sample, {field: values for field, values in filters.items() if values},
+            {DAY_KEY: planner.predicates[DAY_KEY]} if DAY_KEY in planner.predicates else None)]
+    else:
+        filtered_sample = None
+    filter_key = (dataset_key, tuple(selected_regions), tuple(selected_categories), tuple(date_range or ()),
+                  tuple((field, tuple(values)) for field, values in extra_filters.items()))
+    
+    # 图表区域（图表库在此处才导入，关键指标可先行显示）
+    import plotly.express as px
     
-    # 图表区域
     st.subheader("📈 数据可视化")
     
     tab1, tab2, tab3, tab4 = st.tabs(["销售趋势", "产品分析", "地区分析", "客户分析"])
@@ -259,92 +449,178 @@ if not df.empty:
         col1, col2 = st.columns(2)
         
         with col1:
-            if '月份' in filtered_df.columns and '销售额' in filtered_df.columns:
-                monthly_sales = filtered_df.groupby('月份')['销售额'].sum().reset_index()
-                # 将月份格式化为 "2023-06" 的形式
-                monthly_sales['月份'] = monthly_sales['月份'].dt.strftime('%Y-%m')
-                # 确保月份列被当作字符串处理
-                monthly_sales['月份'] = monthly_sales['月份'].astype(str)
+            if chart_enabled('monthly_sales', df.columns):
+                # 按日期键聚合后通过日历维度表上卷，月份格式为 "2023-06"
+                def build_monthly_chart(data):
+                    fig = px.line(data, x='月份', y='销售额', title="月度销售趋势")
+                    # 配置X轴，确保使用我们指定的格式
+                    fig.update_xaxes(
+                        type='category',  # 强制作为分类变量
+                        tickangle=45,     # 倾斜标签以防重叠
+                        tickmode='array',
+                        ticktext=data['月份'].tolist(),
+                        tickvals=data['月份'].tolist()
+                    )
+                    return fig
                 
-                fig_monthly = px.line(monthly_sales, x='月份', y='销售额', title="月度销售趋势")
-                # 配置X轴，确保使用我们指定的格式
-                fig_monthly.update_xaxes(
-                    type='category',  # 强制作为分类变量
-                    tickangle=45,     # 倾斜标签以防重叠
-                    tickmode='array',
-                    ticktext=monthly_sales['月份'].tolist(),
-                    tickvals=monthly_sales['月份'].tolist()
-                )
-                st.plotly_chart(fig_monthly, use_container_width=True)
+                renderer.show(chart_renderer(st.empty(), "monthly_sales", build_monthly_chart),
+                              lambda: planner.aggregate_by_period('month'),
+                              lambda: estimate_by_period(filtered_sample, 'month'))
         
         with col2:
-            if '季度' in filtered_df.columns and '销售额' in filtered_df.columns:
-                quarterly_sales = filtered_df.groupby('季度')['销售额'].sum().reset_index()
-                quarterly_sales['季度'] = quarterly_sales['季度'].astype(str)
-                
-                fig_quarterly = px.bar(quarterly_sales, x='季度', y='销售额', title="季度销售对比")
-                st.plotly_chart(fig_quarterly, use_container_width=True)
+            if chart_enabled('quarterly_sales', df.columns):
+                renderer.show(
+                    chart_renderer(st.empty(), "quarterly_sales",
+                                   lambda data: px.bar(data, x='季度', y='销售额', title="季度销售对比")),
+                    lambda: planner.aggregate_by_period('quarter'),
+                    lambda: estimate_by_period(filtered_sample, 'quarter'))
+        
+        if chart_enabled('time_metrics', df.columns):
+            time_views = {
+                "滚动销售额": ('rolling', 'rolling'),
+                "累计销售额": ('cumulative', 'rolling'),
+                "月度环比/同比": ('month', 'month'),
+                "季度环比/同比": ('quarter', 'quarter')
+            }
+            time_view = st.radio("时间分析", list(time_views), horizontal=True, key="time_view")
+            view, metrics_key = time_views[time_view]
+            time_slot = st.empty()
+            
+            def render_time_metrics(time_metrics, approximate):
+                if approximate:
+                    time_slot.caption("⏳ 时间分析计算中…")
+                elif time_metrics:
+                    fig_time = figure_cache.get_or_build(
+                        f"time_metrics:{view}", time_metrics[metrics_key],
+                        lambda data: create_time_metrics_chart(data, view), precision=GROWTH_PRECISION)
+                    time_slot.plotly_chart(fig_time, use_container_width=True)
+                else:
+                    time_slot.empty()
+            
+            renderer.defer(render_time_metrics, lambda: get_time_metrics(filtered_rows.result(), filter_key))
     
     with tab2:
         col1, col2 = st.columns(2)
         
         with col1:
-            if '产品类别' in filtered_df.columns and '销售额' in filtered_df.columns:
-                category_sales = filtered_df.groupby('产品类别')['销售额'].sum().reset_index()
-                fig_pie = px.pie(category_sales, values='销售额', names='产品类别', title="产品类别销售占比")
-                st.plotly_chart(fig_pie, use_container_width=True)
+            if chart_enabled('category_sales', df.columns):
+                renderer.show(
+                    chart_renderer(st.empty(), "category_sales",
+                                   lambda data: px.pie(data, values='销售额', names='产品类别', title="产品类别销售占比")),
+                    lambda: planner.groupby_sum('产品类别', ['销售额']).reset_index(),
+                    lambda: estimate_groupby(filtered_sample, '产品类别', ['销售额']).reset_index())
         
         with col2:
-            if '产品名称' in filtered_df.columns and '数量' in filtered_df.columns:
-                product_sales = filtered_df.groupby('产品名称')['数量'].sum().sort_values(ascending=True).tail(10)
-                fig_bar = px.bar(x=product_sales.values, y=product_sales.index, orientation='h', title="产品销量排行 (Top 10)")
-                st.plotly_chart(fig_bar, use_container_width=True)
+            if chart_enabled('product_sales', df.columns):
+                k_col, drill_col = st.columns(2)
+                with k_col:
+                    top_n = st.number_input("排行数量", min_value=1, max_value=TOPK_CONFIG['max_k'],
+                                            value=TOPK_CONFIG['k'], key="top_k")
+                with drill_col:
+                    # 下钻选项取自维度字典与已选的产品类别，无需等待层级汇总
+                    if (TOPK_CONFIG['mode'] == 'exact' and '产品类别' in df.columns
+                            and '产品类别' in dataset_dictionaries):
+                        drill_categories = selected_categories or dataset_dictionaries['产品类别'].values
+                        drill_category = st.selectbox("下钻产品类别", ["全部"] + sorted(drill_categories),
+                                                      key="top_k_category")
+                    else:
+                        drill_category = "全部"
+                product_slot = st.empty()
+                
+                def render_product_sales(rankings, approximate):
+                    if approximate:
+                        product_slot.caption("⏳ 产品排行计算中…")
+                        return
+                    hierarchy, product_totals = rankings
+                    # 部分选择取前K项，无需对全部产品排序
+                    if drill_category == "全部":
+                        product_sales = top_k(product_totals, top_n)
+                        title = f"产品销量排行 (Top {top_n})"
+                        if TOPK_CONFIG['mode'] == 'approximate':
+                            title += " (近似)"
+                    else:
+                        product_sales = drilldown_top_k(hierarchy, (drill_category,), top_n)
+                        title = f"{drill_category} 产品销量排行 (Top {top_n})"
+                    product_sales = product_sales.iloc[::-1]
+                    fig_bar = figure_cache.get_or_build(
+                        f"product_sales:{title}", product_sales,
+                        lambda data: px.bar(x=data.values, y=data.index, orientation='h', title=title))
+                    product_slot.plotly_chart(fig_bar, use_container_width=True)
+                
+                renderer.defer(render_product_sales, lambda: get_product_rankings(filtered_rows.result(), filter_key))
     
     with tab3:
         col1, col2 = st.columns(2)
         
         with col1:
-            if '地区' in filtered_df.columns and '销售额' in filtered_df.columns:
-                region_sales = filtered_df.groupby('地区')['销售额'].sum().reset_index()
-                fig_region = px.bar(region_sales, x='地区', y='销售额', title="各地区销售情况")
-                st.plotly_chart(fig_region, use_container_width=True)
+            if chart_enabled('region_sales', df.columns):
+                renderer.show(
+                    chart_renderer(st.empty(), "region_sales",
+                                   lambda data: px.bar(data, x='地区', y='销售额', title="各地区销售情况")),
+                    lambda: planner.groupby_sum('地区', ['销售额']).reset_index(),
+                    lambda: estimate_groupby(filtered_sample, '地区', ['销售额']).reset_index())
         
         with col2:
-            if '地区' in filtered_df.columns:
-                region_orders = filtered_df.groupby('地区').size().reset_index(name='订单数')
-                fig_orders = px.scatter(region_orders, x='地区', y='订单数', size='订单数', title="各地区订单数量")
-                st.plotly_chart(fig_orders, use_container_width=True)
+            if chart_enabled('region_orders', df.columns):
+                renderer.show(
+                    chart_renderer(st.empty(), "region_orders",
+                                   lambda data: px.scatter(data, x='地区', y='订单数', size='订单数', title="各地区订单数量")),
+                    lambda: planner.groupby_sum('地区', [], count_name='订单数').reset_index(),
+                    lambda: estimate_groupby(filtered_sample, '地区', [], count_name='订单数').reset_index())
     
     with tab4:
         col1, col2 = st.columns(2)
         
         with col1:
-            if '客户类型' in filtered_df.columns and '销售额' in filtered_df.columns:
-                customer_sales = filtered_df.groupby('客户类型')['销售额'].sum().reset_index()
-                fig_customer = px.pie(customer_sales, values='销售额', names='客户类型', title="客户类型销售占比")
-                st.plotly_chart(fig_customer, use_container_width=True)
+            if chart_enabled('customer_sales', df.columns):
+                renderer.show(
+                    chart_renderer(st.empty(), "customer_sales",
+                                   lambda data: px.pie(data, values='销售额', names='客户类型', title="客户类型销售占比")),
+                    lambda: planner.groupby_sum('客户类型', ['销售额']).reset_index(),
+                    lambda: estimate_groupby(filtered_sample, '客户类型', ['销售额']).reset_index())
         
         with col2:
-            if '支付方式' in filtered_df.columns:
-                payment_methods = filtered_df['支付方式'].value_counts().reset_index()
-                payment_methods.columns = ['支付方式', '使用次数']
-                fig_payment = px.bar(payment_methods, x='支付方式', y='使用次数', title="支付方式使用情况")
-                st.plotly_chart(fig_payment, use_container_width=True)
+            if chart_enabled('payment_methods', df.columns):
+                renderer.show(
+                    chart_renderer(st.empty(), "payment_methods",
+                                   lambda data: px.bar(data, x='支付方式', y='使用次数', title="支付方式使用情况")),
+                    lambda: (planner.groupby_sum('支付方式', [], count_name='使用次数')
+                             .sort_values('使用次数', ascending=False).reset_index()),
+                    lambda: (estimate_groupby(filtered_sample, '支付方式', [], count_name='使用次数')
+                             .sort_values('使用次数', ascending=False).reset_index()))
+    
+    # 精确结果替换估算结果
+    renderer.finish()
+    filtered_df = filtered_rows.result()
+    
+    # 本次运行的查询计划：所选路径、各路径的估计耗时与实际耗时
+    if PLANNER_CONFIG['show_plans'] and planner.plans:
+        with st.sidebar:
+            with st.expander("🧭 查询计划", expanded=False):
+                st.dataframe(pd.DataFrame([{
+                    '查询': plan['query'],
+                    '路径': PATH_LABELS[plan['path']],
+                    '估计行数': plan['estimated_rows'],
+                    '实际行数': plan['rows'],
+                    '估计(ms)': plan['estimated_ms'][plan['path']],
+                    '实际(ms)': plan['actual_ms']
+                } for plan in planner.plans]), use_container_width=True, hide_index=True)
     
     # 数据表格
     with st.expander("📋 数据详情", expanded=False):
         st.dataframe(filtered_df, use_container_width=True, height=400)
     
-    # 数据统计
+    # 数据统计：数值统计与各分类字段的高频取值由数据概况逐列一次计算，按筛选状态缓存
     st.subheader("📊 数据统计")
+    profile = profile_frame(filtered_df, [col for col in filtered_df.columns if col != DAY_KEY], key=filter_key)
     col1, col2 = st.columns(2)
     
     with col1:
         st.write("**数值型数据统计:**")
-        numeric_cols = filtered_df.select_dtypes(include=[np.number]).columns
+        numeric_cols = filtered_df.select_dtypes(include=[np.number]).columns.drop(DAY_KEY, errors='ignore')
         if len(numeric_cols) > 0:
             # 格式化数值统计表格
-            stats_df = filtered_df[numeric_cols].describe()
+            stats_df = profile.numeric_table(numeric_cols)
             # 格式化数值，保留2位小数
             stats_df = stats_df.round(2)
             # 使用更紧凑的表格样式
@@ -370,12 +646,13 @@ if not df.empty:
             # 为每个分类字段创建单独的统计表格
             for col in categorical_cols:
                 with st.expander(f"📊 {col} 统计", expanded=False):
-                    value_counts = filtered_df[col].value_counts()
+                    col_counts = profile.top_values(col)
+                    unique_count = profile.columns[col]['distinct']
                     total_count = len(filtered_df)
                     
                     # 创建统计表格
                     stats_data = []
-                    for value, count in value_counts.head(10).items():  # 显示前10个
+                    for value, count in col_counts.items():  # 显示前N个
                         percentage = (count / total_count) * 100
                         stats_data.append({
                             '值': str(value)[:30] + '...' if len(str(value)) > 30 else str(value),
@@ -397,12 +674,11 @@ if not df.empty:
                         )
                         
                         # 显示汇总信息
-                        unique_count = value_counts.nunique()
                         st.caption(f"📈 总计: {total_count} 条记录 | 唯一值: {unique_count} 个")
                         
                         # 如果有更多数据，显示提示
-                        if len(value_counts) > 10:
-                            st.caption(f"💡 显示前10个值，共{len(value_counts)}个唯一值")
+                        if unique_count > len(col_counts):
+                            st.caption(f"💡 显示前{len(col_counts)}个值，共{unique_count}个唯一值")
                     else:
                         st.info("该字段没有数据")
         else:
@@ -411,6 +687,23 @@ if not df.empty:
 else:
     st.error("无法加载数据，请检查数据源或文件格式。")
 
+# 内存使用（管理视图）：各数据集的明细、派生列、样本与缓存结果的占用
+if MEMORY_CONFIG['admin_view']:
+    with st.sidebar:
+        with st.expander("🧠 内存使用", expanded=False):
+            used, budget = memory_manager.used, memory_manager.budget
+            st.progress(min(used / budget, 1.0), text=f"{used / MB:,.1f} / {budget / MB:,.0f} MB")
+            memory_usage = memory_manager.usage()
+            st.dataframe(memory_usage.groupby('数据集')[['内存(MB)', '派生列(MB)', '溢出文件(MB)']].sum(),
+                         use_container_width=True)
+            st.dataframe(memory_usage, use_container_width=True, hide_index=True)
+            st.caption(f"累计淘汰 {memory_manager.evictions} 次")
+
 # 页脚
 st.markdown("---")
-st.markdown("📊 BI数据分析系统 | 基于 Streamlit 构建 | 版本 1.0") 
\ No newline at end of file
+st.markdown("📊 BI数据分析系统 | 基于 Streamlit 构建 | 版本 1.0")
+
+# 后台导入任务运行期间定时刷新进度，页面其余内容已完成渲染
+if data_source == "上传文件" and ingest_job is not None and ingest_job.running:
+    time.sleep(JOB_CONFIG['poll_interval'])
+    st.rerun() 
\ No newline at end of file
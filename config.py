@@ -15,9 +15,114 @@ PAGE_CONFIG = {
 REQUIRED_FIELDS = ['日期', '销售额']
 OPTIONAL_FIELDS = ['产品类别', '产品名称', '数量', '地区', '客户类型', '支付方式']
 
+# 数据字段模式定义
+# dtype: datetime / float / int / string；format: 日期格式；
+# categories: 允许的取值列表，None 表示不限制
+DATA_SCHEMA = {
+    '日期': {"dtype": "datetime", "format": "%Y-%m-%d"},
+    '销售额': {"dtype": "float"},
+    '产品类别': {"dtype": "string", "categories": None},
+    '产品名称': {"dtype": "string", "categories": None},
+    '数量': {"dtype": "int"},
+    '地区': {"dtype": "string", "categories": None},
+    '客户类型': {"dtype": "string", "categories": None},
+    '支付方式': {"dtype": "string", "categories": None}
+}
+
+# 数据校验配置
+VALIDATION_CONFIG = {
+    "sample_size": 10000  # 需要逐值解析的检查只在该数量的抽样行上进行
+}
+
 # 支持的文件格式
 SUPPORTED_FILE_TYPES = ['csv', 'xlsx', 'xls']
 
+# 并行聚合配置
+PARALLEL_CONFIG = {
+    "enabled": True,
+    "executor": "thread",        # thread: 线程池; process: 进程池
+    "max_workers": None,         # None 表示使用全部CPU核数
+    "partition_by": "rows",      # rows: 按固定行数切片（不复制数据）; month: 按月份分区（需复制各分区数据）
+    "partition_rows": 500000,    # 按行切片时每个分区的行数
+    "min_rows": 1000000          # 数据行数达到该值时才并行
+}
+
+# 计算引擎配置
+ENGINE_CONFIG = {
+    "backend": "pandas",       # pandas; polars: 筛选、分组聚合与统计使用Polars惰性多线程执行（需另行安装polars，未安装时退回pandas）
+    "arrow_cache_entries": 8   # Polars 引擎缓存已转换为 Arrow 的数据框数量
+}
+
+# 后台导入任务配置
+JOB_CONFIG = {
+    "max_workers": 2,          # 同时解析上传文件的任务数
+    "chunk_rows": 200000,      # CSV按块解析的行数，每块更新一次进度并检查取消
+    "poll_interval": 0.5       # 任务运行期间页面刷新进度的间隔（秒）
+}
+
+# 预聚合配置
+AGGREGATE_CONFIG = {
+    "dimensions": ['日期键', '产品类别', '产品名称', '地区', '客户类型', '支付方式'],
+    # 日期 × 维度的二维预聚合，日期范围与该维度的筛选/分组可直接由其回答
+    "cubes": [['日期键', '产品类别'], ['日期键', '地区'], ['日期键', '客户类型'], ['日期键', '支付方式']]
+}
+
+# 日历维度配置
+CALENDAR_CONFIG = {
+    "fiscal_year_start_month": 1  # 财年起始月份，1表示与自然年一致
+}
+
+# 时间分析配置
+TIME_ANALYTICS_CONFIG = {
+    "measure": "销售额",
+    "rolling_windows": [7, 30]  # 滚动窗口天数
+}
+
+# Top-K排行配置
+TOPK_CONFIG = {
+    "k": 10,
+    "max_k": 50,
+    "mode": "exact",           # exact: 精确部分选择; approximate: 逐块更新的Space-Saving摘要（不支持下钻）
+    "sketch_capacity": 1000,   # 近似模式下摘要保留的候选项数量
+    "chunk_rows": 262144       # 近似模式下每次读入摘要的明细行数
+}
+
+# 渐进式渲染配置：先显示分层样本的估算结果，精确结果算完后替换
+SAMPLING_CONFIG = {
+    "enabled": True,
+    "min_rows": 500000,          # 数据行数达到该值时才先显示估算结果
+    "sample_rows": 50000,        # 目标样本行数，按各层行数比例分配
+    "min_per_stratum": 2,        # 每层至少抽取的行数（用于估计层内方差）
+    "strata_period": "month",    # 分层的时间粒度
+    "strata_columns": ['地区'],  # 分层字段
+    "z": 1.96,                   # 置信区间分位数（95%）
+    "refine_workers": 2          # 后台计算精确结果的线程数
+}
+
+# 监控文件夹配置（增量追加数据源）
+WATCH_FOLDER_CONFIG = {
+    "path": "data/incoming",       # 监控的追加文件目录
+    "store_path": "data/store",    # 本地数据集存储目录（按年/月分区）
+    "file_types": ['csv', 'xlsx', 'xls'],
+    "settle_seconds": 2,           # 文件修改后需稳定该秒数才接入（避免读取仍在写入的文件）
+    "default_months": 3,           # 首次打开时读取的最近月数（日期范围的默认值）
+    "compact_parts": 8,            # 同一月份的分区文件达到该数量时合并为一个文件
+    "load_columns": None           # 仪表盘读取的列，None 表示按显示的图表与生效的筛选条件推导（见 CHART_COLUMNS）
+}
+
+# 仪表盘图表 -> 所需字段；所需字段齐全时才显示该图表，删除条目即可隐藏图表
+CHART_COLUMNS = {
+    "monthly_sales": ['日期', '销售额'],
+    "quarterly_sales": ['日期', '销售额'],
+    "time_metrics": ['日期', '销售额'],
+    "category_sales": ['产品类别', '销售额'],
+    "product_sales": ['产品名称', '数量'],
+    "region_sales": ['地区', '销售额'],
+    "region_orders": ['地区'],
+    "customer_sales": ['客户类型', '销售额'],
+    "payment_methods": ['支付方式']
+}
+
 # 图表配置
 CHART_CONFIG = {
     "height": 400,
@@ -25,10 +130,21 @@ CHART_CONFIG = {
     "color_scale": "Blues"
 }
 
+# 图表渲染配置
+RENDER_CONFIG = {
+    "webgl_threshold": 1000,       # 散点/折线轨迹超过该数据点数时切换为WebGL渲染
+    "float_precision": 2,          # 图表数值保留的小数位数
+    "figure_cache_entries": 128    # 按聚合数据指纹缓存的图表数量
+}
+
 # 筛选器配置
 FILTER_CONFIG = {
     "max_selections": 10,
-    "default_all": True
+    "default_all": True,
+    "max_options": 50,     # 取值数不超过该值的字段直接列出全部取值，否则通过检索选择
+    "top_values": 20,      # 未输入检索词时列出的高频取值数
+    "search_limit": 50,    # 检索结果的最大数量
+    "search_cache_entries": 256  # 每个维度字典缓存的检索结果数量
 }
 
 # 示例数据配置
@@ -44,6 +160,60 @@ SAMPLE_DATA_CONFIG = {
     "quantity_range": (1, 10)
 }
 
+# 默认数据集快照配置（服务启动预热）
+SNAPSHOT_CONFIG = {
+    "enabled": True,
+    "path": "data/snapshot",
+    "version": 3  # 预处理或预聚合逻辑变化时递增，使旧快照失效
+}
+
+# 内存预算配置：明细、派生列、分层样本与缓存结果的总占用超出预算时淘汰最久未访问的条目
+MEMORY_CONFIG = {
+    "enabled": True,
+    "budget_mb": 2048,            # 进程内全局内存预算（MB）
+    "spill_path": "data/spill",   # 溢出文件目录（列式文件，进程退出时删除）
+    "result_cache_entries": 20,   # 结果缓存（产品排行、时间分析）每类保留的筛选状态数
+    "admin_view": True            # 在侧边栏显示内存使用情况
+}
+
+# 查询规划配置：按数据集统计信息估算预聚合、行索引与全表扫描三种执行路径的代价，选择代价最低者
+PLANNER_CONFIG = {
+    "enabled": True,               # 关闭时总是全表扫描
+    "costs": {                     # 单位操作的估计耗时（纳秒），可对照查询计划日志中的实际耗时调整
+        "query": 1000000.0,        # 每次查询的固定开销（各路径相同，只影响估计耗时与实际耗时的对照）
+        "scan": 25.0,              # 全表扫描：每行每个取值筛选条件
+        "scan_range": 3.0,         # 全表扫描：每行每个日期范围条件
+        "probe": 30.0,             # 行索引：每个候选行每个筛选条件
+        "take": 12.0,              # 取出选中行：每行每列
+        "group": 50.0,             # 分组求和：每行
+        "cube": 100.0,             # 预聚合：每个聚合行每个条件
+        "index_build": 120.0       # 建立行索引：每行每个字段
+    },
+    "index_amortize": 20,          # 行索引的建立代价按该次数的查询分摊
+    "index_cache_entries": 8,      # 缓存行索引的数据集数量
+    "default_selectivity": 0.5,    # 没有统计信息的筛选条件的估计选择率
+    "log_path": None,              # 查询计划与实际耗时日志（JSON Lines，如 "data/planner_log.jsonl"），None 表示不写入
+    "log_max_mb": 10,              # 日志超过该大小时轮转为 .1 文件（只保留一份）
+    "show_plans": True             # 在侧边栏显示本次运行的查询计划
+}
+
+# 数据概况配置（数据统计与摘要报告）
+PROFILE_CONFIG = {
+    "top_n": 10,             # 分类字段保留的高频取值数，其余取值只记录合计频次
+    "parallel": True,        # 数据行数达到并行阈值（PARALLEL_CONFIG['min_rows']）时各列并行计算
+    "cache_entries": 32      # 按数据指纹缓存的概况数量
+}
+
+# 负载测试配置（loadtest.py）
+LOADTEST_CONFIG = {
+    "dataset_rows": [10000, 100000],   # 上传文件的行数，每个规模分别测试
+    "sessions": [1, 4, 8],             # 同时在线的模拟会话数
+    "iterations": 1,                   # 每个会话重复执行脚本化操作的次数
+    "start_date": "2021-01-01",        # 生成上传文件的日期范围
+    "end_date": "2023-12-31",
+    "timeout": 300                     # 单次运行的超时时间（秒）
+}
+
 # 主题配置
 THEME_CONFIG = {
     "primary_color": "#1f77b4",
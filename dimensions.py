@@ -0,0 +1,351 @@
+"""
+BI系统维度表模块
+包含日历维度表：日期相关特征按唯一日期计算一次，事实表只保存整数日期键
+"""
+
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from config import CALENDAR_CONFIG, FILTER_CONFIG
+
+# 事实表中的日期键列（自1970-01-01起的天数）
+DAY_KEY = '日期键'
+
+# 缺失日期的日期键，日历维度表与按时间粒度的汇总均不包含该键
+MISSING_DAY_KEY = np.iinfo(np.int32).min
+
+# 时间粒度 -> 日历表中的整数编码列
+PERIOD_COLUMNS = {
+    'day': DAY_KEY,
+    'week': '星期',
+    'iso_week': 'ISO周',
+    'month': '月份',
+    'quarter': '季度',
+    'year': '年份',
+    'fiscal': '财年期间'
+}
+
+WEEKDAY_NAMES = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+
+def date_to_key(dates):
+    """
+    将日期转换为整数日期键
+
+    Args:
+        dates (pd.Series | array-like): 日期序列
+
+    Returns:
+        np.ndarray: int32 日期键数组，缺失日期为 MISSING_DAY_KEY
+    """
+    values = pd.to_datetime(dates)
+    values = values.values if hasattr(values, 'values') else np.asarray(values)
+    missing = pd.isna(values)
+    keys = values.astype('datetime64[D]').astype(np.int64)
+    keys[missing] = MISSING_DAY_KEY
+    return keys.astype(np.int32)
+
+
+def key_to_date(keys):
+    """
+    将整数日期键还原为日期
+
+    Args:
+        keys (array-like): 日期键
+
+    Returns:
+        pd.DatetimeIndex: 日期
+    """
+    return pd.to_datetime(np.asarray(keys, dtype=np.int64), unit='D')
+
+
+@lru_cache(maxsize=32)
+def build_calendar(start_key, end_key, fiscal_year_start_month=None):
+    """
+    构建日历维度表
+
+    每个日期一行，以日期键为索引，所有时间属性均为紧凑的整数编码：
+    月份为 YYYYMM，季度为 YYYYQ，ISO周为 YYYYWW，财年期间为 FYYYPP。
+    财年以结束年份命名，例如4月开始的财年中 2023-04 属于 FY2024 第1期。
+
+    Args:
+        start_key (int): 起始日期键
+        end_key (int): 结束日期键（含）
+        fiscal_year_start_month (int): 财年起始月份，默认取 CALENDAR_CONFIG
+
+    Returns:
+        pd.DataFrame: 日历维度表（结果会被缓存，请勿修改）
+    """
+    if fiscal_year_start_month is None:
+        fiscal_year_start_month = CALENDAR_CONFIG['fiscal_year_start_month']
+
+    keys = np.arange(start_key, end_key + 1, dtype=np.int32)
+    dates = key_to_date(keys)
+    year = dates.year.values.astype(np.int32)
+    month = dates.month.values.astype(np.int32)
+    iso = dates.isocalendar()
+
+    fiscal_offset = (month - fiscal_year_start_month) % 12
+    fiscal_year = year + (month >= fiscal_year_start_month).astype(np.int32) if fiscal_year_start_month != 1 else year
+
+    calendar = pd.DataFrame({
+        '日期': dates,
+        '年份': year.astype(np.int16),
+        '季度': year * 10 + (month - 1) // 3 + 1,
+        '月份': year * 100 + month,
+        'ISO周': iso['year'].values.astype(np.int32) * 100 + iso['week'].values.astype(np.int32),
+        '星期': dates.dayofweek.values.astype(np.int8),
+        '财年期间': fiscal_year * 100 + fiscal_offset + 1
+    }, index=pd.Index(keys, name=DAY_KEY))
+
+    return calendar
+
+
+def get_calendar(day_keys):
+    """
+    获取覆盖给定日期键范围的日历维度表
+
+    Args:
+        day_keys (array-like): 日期键（缺失日期的键不计入范围）
+
+    Returns:
+        pd.DataFrame: 日历维度表
+    """
+    day_keys = np.asarray(day_keys)
+    day_keys = day_keys[day_keys != MISSING_DAY_KEY]
+    if len(day_keys) == 0:
+        return build_calendar(0, -1)
+    return build_calendar(int(day_keys.min()), int(day_keys.max()))
+
+
+def period_codes(day_keys, period):
+    """
+    通过日历维度表把日期键映射为指定时间粒度的整数编码
+
+    Args:
+        day_keys (array-like): 日期键
+        period (str): 时间粒度，见 PERIOD_COLUMNS
+
+    Returns:
+        np.ndarray: 整数编码数组，缺失日期的编码为 MISSING_DAY_KEY
+    """
+    day_keys = np.asarray(day_keys)
+    if period == 'day':
+        return day_keys
+
+    calendar = get_calendar(day_keys)
+    column = calendar[PERIOD_COLUMNS[period]].values
+    missing = day_keys == MISSING_DAY_KEY
+    if not missing.any():
+        return column[day_keys - calendar.index[0]]
+    codes = np.full(len(day_keys), MISSING_DAY_KEY, dtype=np.int64)
+    codes[~missing] = column[day_keys[~missing] - calendar.index[0]]
+    return codes
+
+
+def period_labels(codes, period):
+    """
+    将时间粒度整数编码转换为显示标签
+
+    Args:
+        codes (array-like): 整数编码
+        period (str): 时间粒度
+
+    Returns:
+        list: 标签列表
+    """
+    codes = np.asarray(codes, dtype=np.int64)
+    if period == 'day':
+        return [d.strftime('%Y-%m-%d') for d in key_to_date(codes)]
+    elif period == 'week':
+        return [WEEKDAY_NAMES[c] for c in codes]
+    elif period == 'iso_week':
+        return [f"{c // 100}-W{c % 100:02d}" for c in codes]
+    elif period == 'month':
+        return [f"{c // 100}-{c % 100:02d}" for c in codes]
+    elif period == 'quarter':
+        return [f"{c // 10}Q{c % 10}" for c in codes]
+    elif period == 'year':
+        return [str(c) for c in codes]
+    elif period == 'fiscal':
+        return [f"FY{c // 100}-P{c % 100:02d}" for c in codes]
+    else:
+        raise ValueError(f"不支持的时间粒度: {period}")
+
+
+def rollup_by_period(daily, period):
+    """
+    将以日期键为索引的日聚合结果汇总到指定时间粒度
+
+    Args:
+        daily (pd.DataFrame | pd.Series): 以日期键为索引的可加聚合结果
+        period (str): 时间粒度
+
+    Returns:
+        pd.DataFrame | pd.Series: 以时间标签为索引、按时间排序的汇总结果（不含缺失日期）
+    """
+    missing = daily.index.values == MISSING_DAY_KEY
+    if missing.any():
+        daily = daily[~missing]
+    if len(daily) == 0:
+        result = daily.iloc[:0].copy()
+        result.index = pd.Index([], name=PERIOD_COLUMNS[period])
+        return result
+
+    result = daily.groupby(period_codes(daily.index.values, period)).sum()
+    result.index = pd.Index(period_labels(result.index.values, period), name=PERIOD_COLUMNS[period])
+    return result
+
+
+def aggregate_by_period(df, period, value_col='销售额'):
+    """
+    按时间粒度汇总指标：先按日期键聚合，再通过日历维度表上卷
+
+    Args:
+        df (pd.DataFrame): 含日期键列的数据框
+        period (str): 时间粒度
+        value_col (str): 求和的指标列
+
+    Returns:
+        pd.DataFrame: 两列数据框 [时间标签列, value_col]
+    """
+    from engine import groupby_sum
+
+    daily = groupby_sum(df, DAY_KEY, [value_col])[value_col]
+    return rollup_by_period(daily, period).reset_index()
+
+
+class DimensionDictionary:
+    """
+    维度字典
+
+    保存字段的全部取值及出现次数（按次数降序），并建立前缀/子串检索索引，
+    筛选控件只需展示高频取值与检索结果，无需在每次运行时扫描明细列；
+    检索结果按检索词缓存，重新运行时相同的检索词无需再次匹配。
+    新增数据通过 update() 合并，已有取值的检索索引直接复用。
+    """
+
+    def __init__(self, counts):
+        """
+        Args:
+            counts (pd.Series): 以取值为索引的出现次数
+        """
+        counts = counts[counts.index.notna()]
+        labels = np.array([str(v).lower() for v in counts.index], dtype=object)
+        self._build(counts, labels, np.argsort(labels, kind='stable'))
+
+    def _build(self, counts, labels, order):
+        # counts 与 labels 按取值加入的先后排列，order 为标签按字典序排列的位置
+        self._counts = counts
+        self._labels = labels
+        self._order = order
+        # 检索索引：小写标签按字典序排列（保持对象数组），前缀检索为二分查找
+        self._sorted_labels = labels[order]
+        # 子串检索使用的标签序列只构建一次
+        self._label_series = pd.Series(labels)
+        self._search_cache = {}
+
+        by_count = np.argsort(-counts.to_numpy(dtype='float64'), kind='stable')
+        self.counts = counts.iloc[by_count]
+        self.values = self.counts.index.tolist()
+        # 各取值按出现次数的名次，检索结果按名次排序
+        self._rank = np.empty(len(counts), dtype=np.int64)
+        self._rank[by_count] = np.arange(len(counts))
+
+    def __len__(self):
+        return len(self.values)
+
+    def __getstate__(self):
+        # 只序列化取值、次数与标签的排列，其余检索结构加载时重新构建
+        return {'counts': self._counts, 'labels': self._labels, 'order': self._order}
+
+    def __setstate__(self, state):
+        self._build(state['counts'], state['labels'], state['order'])
+
+    @property
+    def nbytes(self):
+        """取值、次数与检索索引的内存占用"""
+        # 内存管理模块依赖本模块，在此处导入
+        from memory import frame_nbytes
+
+        arrays = (self._order, self._sorted_labels, self._rank)
+        return frame_nbytes(self._counts) + frame_nbytes(self._label_series) + sum(a.nbytes for a in arrays)
+
+    def update(self, counts):
+        """
+        合并新增数据的出现次数：已有取值只累加次数，只为新取值建立检索索引
+
+        Args:
+            counts (pd.Series): 新增数据中以取值为索引的出现次数
+
+        Returns:
+            DimensionDictionary: 合并后的维度字典（原字典不变，可继续被其他会话使用）
+        """
+        counts = counts[counts.index.notna()]
+        positions = self._counts.index.get_indexer(counts.index)
+        known = positions >= 0
+
+        totals = self._counts.to_numpy().astype(np.result_type(self._counts.dtype, counts.dtype))
+        totals[positions[known]] += counts.to_numpy()[known]
+        added = counts[~known]
+        merged = pd.Series(np.concatenate([totals, added.to_numpy()]),
+                           index=self._counts.index.append(added.index), name=self._counts.name)
+
+        # 新标签排序后插入已排序的标签，已有标签无需重新排序
+        added_labels = np.array([str(v).lower() for v in added.index], dtype=object)
+        added_order = np.argsort(added_labels, kind='stable')
+        insert_at = np.searchsorted(self._sorted_labels, added_labels[added_order], side='right')
+        order = np.insert(self._order, insert_at, added_order + len(self._labels))
+
+        result = DimensionDictionary.__new__(DimensionDictionary)
+        result._build(merged, np.concatenate([self._labels, added_labels]), order)
+        return result
+
+    def top(self, n):
+        """
+        出现次数最多的取值
+
+        Args:
+            n (int): 数量
+
+        Returns:
+            list: 取值列表
+        """
+        return self.values[:n]
+
+    def search(self, query, limit):
+        """
+        检索取值：先返回前缀匹配，不足时补充子串匹配，各自按出现次数降序
+
+        Args:
+            query (str): 检索词（不区分大小写）
+            limit (int): 最多返回的数量
+
+        Returns:
+            list: 取值列表
+        """
+        query = query.strip().lower()
+        if not query:
+            return self.top(limit)
+
+        cached = self._search_cache.get((query, limit))
+        if cached is not None:
+            return list(cached)
+
+        lo = np.searchsorted(self._sorted_labels, query, side='left')
+        hi = np.searchsorted(self._sorted_labels, query + '\uffff', side='left')
+        matches = np.sort(self._rank[self._order[lo:hi]])[:limit]
+
+        if len(matches) < limit:
+            contains = np.sort(self._rank[self._label_series.str.contains(query, regex=False).values])
+            contains = contains[~np.isin(contains, matches)]
+            matches = np.concatenate([matches, contains[:limit - len(matches)]])
+
+        result = [self.values[i] for i in matches]
+        if len(self._search_cache) >= FILTER_CONFIG['search_cache_entries']:
+            # 超出数量时整体清空（字典在会话间共享，避免逐条淘汰时的并发修改）
+            self._search_cache.clear()
+        self._search_cache[(query, limit)] = tuple(result)
+        return result
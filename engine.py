@@ -0,0 +1,324 @@
+"""
+BI系统计算引擎模块
+筛选、分组聚合、汇总统计、数值列概况、频次统计与日期解析可在 pandas 或 Polars 上执行（见 ENGINE_CONFIG），
+输入与输出均为 pandas 对象；Polars 只在内部使用，以惰性查询多线程执行，只把较小的结果转换回 pandas
+"""
+
+import threading
+import weakref
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from config import ENGINE_CONFIG
+import parallel
+
+# Polars 在首次选用时才导入（导入耗时较长，使用 pandas 引擎时无需加载），未安装时为 None
+pl = None
+_polars_loaded = False
+_polars_lock = threading.Lock()
+
+_warned = False
+
+# 数据框 -> 已转换为 Arrow 的列（按对象缓存，数据框被回收时删除）
+_arrow_cache = OrderedDict()
+_arrow_lock = threading.Lock()
+
+# describe() 输出的统计量顺序
+DESCRIBE_INDEX = ['count', 'mean', 'std', 'min', '25%', '50%', '75%', 'max']
+
+# profile() 输出的统计量：describe() 的统计量加上缺失数与唯一值数
+PROFILE_INDEX = DESCRIBE_INDEX + ['nulls', 'distinct']
+
+QUANTILES = [('25%', 0.25), ('50%', 0.5), ('75%', 0.75)]
+
+
+def _load_polars():
+    global pl, _polars_loaded
+    if _polars_loaded:
+        return pl
+    with _polars_lock:
+        if not _polars_loaded:
+            try:
+                import polars
+                pl = polars
+            except ImportError:
+                pass
+            _polars_loaded = True
+    return pl
+
+
+def get_backend():
+    """
+    当前使用的计算引擎，选用 polars 时在此导入
+
+    Returns:
+        str: 'pandas' 或 'polars'；配置为 polars 但未安装时退回 pandas
+    """
+    global _warned
+    backend = ENGINE_CONFIG['backend']
+    if backend == 'polars' and _load_polars() is None:
+        if not _warned:
+            print("⚠️  未安装 polars，计算引擎退回 pandas")
+            _warned = True
+        return 'pandas'
+    return backend
+
+
+def _drop_arrow(key):
+    with _arrow_lock:
+        entry = _arrow_cache.get(key)
+        if entry is not None and entry[0]() is None:
+            del _arrow_cache[key]
+
+
+def _to_polars(df, columns):
+    """
+    数据框的指定列转换为 Polars 惰性查询
+
+    各数据框已转换的列按对象缓存（数据框登记后不再修改），同一数据集上的后续查询无需再次转换；
+    缓存的数据框数量见 ENGINE_CONFIG['arrow_cache_entries']。
+    """
+    columns = list(columns)
+    key = id(df)
+    with _arrow_lock:
+        entry = _arrow_cache.get(key)
+        if entry is None or entry[0]() is not df:
+            entry = (weakref.ref(df), {})
+            _arrow_cache[key] = entry
+            weakref.finalize(df, _drop_arrow, key)
+        _arrow_cache.move_to_end(key)
+        while len(_arrow_cache) > ENGINE_CONFIG['arrow_cache_entries']:
+            _arrow_cache.popitem(last=False)
+        converted = entry[1]
+        missing = [col for col in dict.fromkeys(columns) if col not in converted]
+
+    if missing:
+        frame = pl.from_pandas(df[missing])
+        with _arrow_lock:
+            converted.update({col: frame.get_column(col) for col in missing})
+    return pl.DataFrame([converted[col] for col in columns]).lazy()
+
+
+def groupby_sum(df, by, measures, count_name=None, sort=True):
+    """
+    分组求和（可选计数），结果与 parallel.groupby_sum 一致
+
+    Args:
+        df (pd.DataFrame): 数据框
+        by (str | list): 分组字段
+        measures (list): 求和的指标列
+        count_name (str): 计数列名，为空时不计数
+        sort (bool): 是否按分组值排序；为否时省去对全部分组的排序，结果顺序不确定
+
+    Returns:
+        pd.DataFrame: 以分组值为索引的结果
+    """
+    measures = list(measures)
+    if get_backend() != 'polars':
+        return parallel.groupby_sum(df, by, measures, count_name, sort)
+
+    keys = by if isinstance(by, list) else [by]
+    aggs = [pl.col(m).sum() for m in measures]
+    if count_name:
+        aggs.append(pl.len().cast(pl.Int64).alias(count_name))
+
+    query = _to_polars(df, keys + measures).drop_nulls(keys).group_by(keys).agg(aggs)
+    if sort:
+        query = query.sort(keys)
+    result = query.collect().to_pandas().set_index(by)
+    # 与 pandas 分组求和保持一致的数据类型（如可空整数列求和仍为可空整数）
+    for m in measures:
+        if pd.api.types.is_extension_array_dtype(df[m]):
+            result[m] = result[m].astype(df[m].dtype)
+    return result
+
+
+def summary_stats(df, measure, distinct_cols=()):
+    """
+    计算指标的和、计数、最小/最大值与若干字段的去重集合，结果与 parallel.summary_stats 一致
+
+    Args:
+        df (pd.DataFrame): 数据框
+        measure (str): 指标列
+        distinct_cols (list): 需要去重计数的字段
+
+    Returns:
+        dict: 包含 count、sum、non_null、min、max 以及 distinct（字段 -> 取值集合）
+    """
+    if get_backend() != 'polars':
+        return parallel.summary_stats(df, measure, distinct_cols)
+
+    distinct_cols = [col for col in distinct_cols if col in df.columns]
+    has_measure = measure in df.columns
+    lf = _to_polars(df, ([measure] if has_measure else []) + distinct_cols)
+
+    stats = {'count': len(df), 'distinct': {}}
+    if has_measure:
+        values = pl.col(measure)
+        row = lf.select([
+            values.sum().alias('sum'),
+            values.count().alias('non_null'),
+            values.min().alias('min'),
+            values.max().alias('max')
+        ]).collect().row(0, named=True)
+        stats.update(row)
+        stats['non_null'] = int(stats['non_null'])
+        if stats['non_null'] == 0:
+            stats['min'] = stats['max'] = float('nan')
+
+    # 各字段的去重查询一并提交，由 Polars 并行执行
+    if distinct_cols:
+        uniques = pl.collect_all([lf.select(pl.col(col).drop_nulls().unique()) for col in distinct_cols])
+        for col, frame in zip(distinct_cols, uniques):
+            stats['distinct'][col] = set(frame.get_column(col).to_list())
+    return stats
+
+
+def _numeric_profile(series):
+    # 排序一次即可得到最小/最大值、分位数与唯一值数
+    values = series.to_numpy(dtype='float64', na_value=np.nan)
+    values = np.sort(values[~np.isnan(values)])
+    n = len(values)
+    stats = {'count': n, 'nulls': len(series) - n,
+             'distinct': int(np.count_nonzero(np.diff(values)) + 1) if n else 0}
+    if n > 0:
+        stats['mean'] = values.mean()
+        stats['std'] = values.std(ddof=1) if n > 1 else np.nan
+        stats['min'] = values[0]
+        for stat, q in QUANTILES:
+            # 线性插值，与 pandas describe() 一致
+            position = q * (n - 1)
+            low = int(position)
+            high = min(low + 1, n - 1)
+            stats[stat] = values[low] + (values[high] - values[low]) * (position - low)
+        stats['max'] = values[-1]
+    return [stats.get(stat, np.nan) for stat in PROFILE_INDEX]
+
+
+def profile(df, columns):
+    """
+    数值列的概况：describe() 的统计量（分位数为线性插值）及缺失数与唯一值数
+
+    Args:
+        df (pd.DataFrame): 数据框
+        columns (list): 数值列
+
+    Returns:
+        pd.DataFrame: 以统计量（PROFILE_INDEX）为索引、列为字段的统计表
+    """
+    columns = list(columns)
+    if get_backend() != 'polars':
+        return pd.DataFrame({col: _numeric_profile(df[col]) for col in columns},
+                            index=PROFILE_INDEX, columns=columns, dtype='float64')
+
+    # 所有列的全部统计量在一个查询中计算
+    exprs = []
+    for i, col in enumerate(columns):
+        values = pl.col(col).cast(pl.Float64)
+        stats = [
+            values.count().cast(pl.Float64),
+            values.mean(),
+            values.std(),
+            values.min(),
+            values.quantile(0.25, 'linear'),
+            values.quantile(0.5, 'linear'),
+            values.quantile(0.75, 'linear'),
+            values.max(),
+            values.null_count().cast(pl.Float64),
+            values.drop_nulls().n_unique().cast(pl.Float64)
+        ]
+        exprs.extend(expr.alias(f'{i}:{stat}') for expr, stat in zip(stats, PROFILE_INDEX))
+    row = _to_polars(df, columns).select(exprs).collect().row(0, named=True) if columns else {}
+    return pd.DataFrame(
+        {col: [row[f'{i}:{stat}'] for stat in PROFILE_INDEX] for i, col in enumerate(columns)},
+        index=PROFILE_INDEX, columns=columns, dtype='float64'
+    )
+
+
+def filter_mask(df, filters=None, ranges=None):
+    """
+    筛选条件对应的布尔掩码
+
+    Args:
+        df (pd.DataFrame): 数据框
+        filters (dict): 字段 -> 取值列表，字段取值在列表中的行满足条件
+        ranges (dict): 字段 -> (起, 止)，含两端
+
+    Returns:
+        np.ndarray: 满足全部条件的行为 True
+    """
+    filters = filters or {}
+    ranges = ranges or {}
+    if get_backend() != 'polars' or not (filters or ranges):
+        mask = np.ones(len(df), dtype=bool)
+        for field, values in filters.items():
+            mask &= df[field].isin(values).values
+        for field, (start, end) in ranges.items():
+            values = df[field].values
+            mask &= (values >= start) & (values <= end)
+        return mask
+
+    conditions = [pl.col(field).is_in(list(values)) for field, values in filters.items()]
+    conditions += [pl.col(field).is_between(start, end) for field, (start, end) in ranges.items()]
+    condition = conditions[0]
+    for other in conditions[1:]:
+        condition = condition & other
+    return (
+        _to_polars(df, list(filters) + list(ranges))
+        .select(condition.fill_null(False).alias('mask'))
+        .collect()
+        .get_column('mask')
+        .to_numpy()
+    )
+
+
+def value_counts(series):
+    """
+    频次统计，按频次降序，结果与 pandas value_counts() 一致（同频次取值的先后顺序可能不同）
+
+    Args:
+        series (pd.Series): 数据列
+
+    Returns:
+        pd.Series: 以取值为索引的频次
+    """
+    if get_backend() != 'polars':
+        return series.value_counts()
+
+    name = series.name
+    counts = (
+        pl.from_pandas(series.rename('value')).to_frame().lazy()
+        .drop_nulls()
+        .group_by('value')
+        .agg(pl.len().cast(pl.Int64).alias('count'))
+        .sort('count', descending=True)
+        .collect()
+    )
+    return pd.Series(
+        counts.get_column('count').to_numpy(),
+        index=pd.Index(counts.get_column('value').to_list(), name=name),
+        name='count'
+    )
+
+
+def parse_dates(values, date_format):
+    """
+    按指定格式解析日期，格式不匹配时抛出 ValueError
+
+    Args:
+        values (pd.Series): 日期列
+        date_format (str): 日期格式
+
+    Returns:
+        pd.Series: datetime64[ns] 类型的日期列
+    """
+    if get_backend() != 'polars' or values.dtype != object:
+        return pd.to_datetime(values, format=date_format)
+
+    try:
+        parsed = pl.from_pandas(values).str.to_datetime(date_format, time_unit='ns')
+    except (pl.exceptions.PolarsError, TypeError) as e:
+        raise ValueError(str(e)) from e
+    return pd.Series(parsed.to_numpy(), index=values.index, name=values.name)
@@ -0,0 +1,318 @@
+"""
+BI系统数据接入模块
+提供监控本地文件夹、增量追加数据的数据源，数据按年/月分区存储在本地
+"""
+
+import glob
+import hashlib
+import io
+import json
+import os
+import threading
+import time
+
+import pandas as pd
+
+from config import WATCH_FOLDER_CONFIG, AGGREGATE_CONFIG, SNAPSHOT_CONFIG
+from dimensions import key_to_date
+from memory import memory_manager
+from sampling import build_stratified_sample, SAMPLE_COLUMNS
+from storage import PartitionedStore, DERIVED_COLUMNS
+from utils import (
+    validate_data, preprocess_data, read_data_file,
+    compute_aggregates, merge_aggregates, build_dimension_dictionaries
+)
+
+# 判断已接入的文件是否只在末尾追加时比较的开头字节数
+HEAD_BYTES = 65536
+
+
+def _head_digest(path, size):
+    """文件开头（至多 HEAD_BYTES 字节，不超过 size）的摘要"""
+    with open(path, 'rb') as f:
+        return hashlib.blake2b(f.read(min(size, HEAD_BYTES)), digest_size=16).hexdigest()
+
+
+class WatchedFolderSource:
+    """
+    监控文件夹数据源
+
+    每次调用 refresh() 时只解析目录中新出现的追加文件（CSV文件在末尾追加的行也只读取新增部分），
+    校验通过后按月分区追加到本地存储，并增量更新预聚合结果与维度字典（与分区列表一起保存，
+    重启时直接加载，无需扫描分区）。明细数据不常驻内存，
+    load() 只读取日期范围涉及的分区与需要的列。
+
+    已接入文件的清单（大小、修改时间、已读取的字节位置）与分区列表一起提交；
+    其余方式修改过的文件视为不可变而跳过，仍在写入的文件等写入稳定后再接入。
+    """
+
+    def __init__(self, folder=None, store_path=None, file_types=None):
+        """
+        Args:
+            folder (str): 监控的追加文件目录
+            store_path (str): 本地数据集存储目录
+            file_types (list): 识别的文件扩展名
+        """
+        self.folder = folder or WATCH_FOLDER_CONFIG['path']
+        self.store_path = store_path or WATCH_FOLDER_CONFIG['store_path']
+        self.file_types = file_types or WATCH_FOLDER_CONFIG['file_types']
+
+        self.aggregates = {}
+        self.dictionaries = {}
+        self.errors = {}
+        self._window = None
+        self._ingested = {}
+        self._lock = threading.RLock()
+
+        os.makedirs(self.folder, exist_ok=True)
+        self.store = PartitionedStore(self.store_path)
+        self._load_store()
+
+    @property
+    def manifest_path(self):
+        # 旧版单独保存的文件清单，现保存在分区清单的元数据中
+        return os.path.join(self.store_path, 'manifest.json')
+
+    @property
+    def row_count(self):
+        return self.store.row_count
+
+    @property
+    def file_count(self):
+        return len(self._ingested)
+
+    def date_bounds(self):
+        """
+        数据集的日期范围（取自分区统计信息，无需读取数据）
+
+        Returns:
+            tuple | None: (最早日期, 最晚日期)，无数据时为 None
+        """
+        bounds = self.store.date_bounds()
+        if bounds is None:
+            return None
+        return tuple(key_to_date(list(bounds)).date)
+
+    def default_range(self, months=None):
+        """
+        默认读取的日期范围：最近若干个自然月（取自分区统计信息，无需读取数据）
+
+        Args:
+            months (int): 月数，默认取 WATCH_FOLDER_CONFIG['default_months']
+
+        Returns:
+            tuple | None: (起始日期, 结束日期)，无数据时为 None
+        """
+        bounds = self.date_bounds()
+        if bounds is None:
+            return None
+        months = months or WATCH_FOLDER_CONFIG['default_months']
+        start = (pd.Timestamp(bounds[1]).to_period('M') - (months - 1)).start_time.date()
+        return max(start, bounds[0]), bounds[1]
+
+    def load(self, start_key=None, end_key=None, columns=None):
+        """
+        读取日期范围内的数据（只读取需要的列），
+        最近一次读取的结果缓存到范围或列变化或下次追加；超出内存预算时缓存的结果被丢弃，访问时从分区存储重新读取
+
+        Args:
+            start_key (int): 起始日期键（含），为空表示不限
+            end_key (int): 结束日期键（含），为空表示不限
+            columns (list): 需要的列（日期列总会读取），默认取 WATCH_FOLDER_CONFIG['load_columns']，None 表示全部
+
+        Returns:
+            pd.DataFrame: 预处理后的数据框
+        """
+        if columns is None:
+            columns = WATCH_FOLDER_CONFIG['load_columns']
+        key = (start_key, end_key, tuple(columns) if columns is not None else None, self.store.version)
+        with self._lock:
+            if self._window is None or self._window['key'] != key:
+                self._release_window()
+                reload = lambda: self.store.read(start_key, end_key, columns=columns)
+                data = memory_manager.manage(reload(), 'watched', '明细', reload=reload)
+                self._window = {'key': key, 'data': data, 'sample': None}
+            return self._window['data'].get()
+
+    @property
+    def sample(self):
+        """最近一次 load() 结果的分层样本（按需构建，随读取结果一起缓存）"""
+        with self._lock:
+            if self._window is None:
+                return None
+            if self._window['sample'] is None:
+                self._window['sample'] = memory_manager.manage(
+                    build_stratified_sample(self._window['data'].get()), 'watched', '样本',
+                    derived_columns=DERIVED_COLUMNS + SAMPLE_COLUMNS)
+            return self._window['sample'].get()
+
+    def _release_window(self):
+        """注销缓存的读取结果"""
+        if self._window is not None:
+            for handle in (self._window['data'], self._window['sample']):
+                if handle is not None:
+                    memory_manager.release(handle.key)
+            self._window = None
+
+    def _state_fingerprint(self):
+        # 预聚合配置或预处理/预聚合逻辑（快照版本）变化时，保存的预聚合结果失效
+        payload = json.dumps([AGGREGATE_CONFIG, SNAPSHOT_CONFIG['version']], sort_keys=True)
+        return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+    def _state(self, aggregates, dictionaries):
+        """与分区列表一起保存的预聚合结果与维度字典，重启时无需扫描分区"""
+        return {'fingerprint': self._state_fingerprint(), 'aggregates': aggregates, 'dictionaries': dictionaries}
+
+    def _load_store(self):
+        """从本地存储恢复文件清单、预聚合结果与维度字典；保存的结果不可用时逐个分区重建"""
+        if 'files' in self.store.metadata:
+            self._ingested = dict(self.store.metadata['files'])
+        elif os.path.exists(self.manifest_path):
+            # 旧版单独保存的文件清单 {文件名: [大小, 修改时间]}，迁移到分区清单中
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                self._ingested = {
+                    name: {'size': size, 'mtime': mtime, 'offset': size, 'head': None}
+                    for name, (size, mtime) in json.load(f).items()
+                }
+            self.store.update_metadata({'files': self._ingested})
+            os.remove(self.manifest_path)
+
+        state = self.store.load_state()
+        if state is not None and state['fingerprint'] == self._state_fingerprint():
+            self.aggregates, self.dictionaries = state['aggregates'], state['dictionaries']
+        else:
+            for chunk in self.store.iter_parts():
+                merge_aggregates(self.aggregates, compute_aggregates(chunk))
+            self.dictionaries = build_dimension_dictionaries(aggregates=self.aggregates)
+            if self.store.parts:
+                self.store.save_state(self._state(self.aggregates, self.dictionaries))
+        memory_manager.track('预聚合', 'watched', self.aggregates, 'watched')
+        memory_manager.track('维度字典', 'watched', self.dictionaries, 'watched')
+
+    def _append(self, chunk, files):
+        """追加一批预处理后的数据到分区存储（与文件清单一起提交）并更新预聚合结果与维度字典"""
+        with self._lock:
+            if len(chunk) == 0:
+                self.store.append(chunk, metadata={'files': files})
+                self._ingested = files
+                return
+
+            # 合并结果与本批数据、文件清单一起提交，提交成功后才替换内存中的结果
+            chunk_aggregates = compute_aggregates(chunk)
+            aggregates = merge_aggregates(dict(self.aggregates), chunk_aggregates)
+            dictionaries = build_dimension_dictionaries(aggregates=chunk_aggregates, base=self.dictionaries)
+            self.store.append(chunk, metadata={'files': files}, state=self._state(aggregates, dictionaries))
+            self._ingested = files
+            self._release_window()
+            self.aggregates, self.dictionaries = aggregates, dictionaries
+            memory_manager.track('预聚合', 'watched', self.aggregates, 'watched')
+            memory_manager.track('维度字典', 'watched', self.dictionaries, 'watched')
+
+    def _skip(self, name, signature, message):
+        """记录被跳过的文件（文件再次变化前不再检查），在页面上显示为警告"""
+        self.errors[name] = {'signature': signature, 'errors': [message]}
+
+    def _scan(self):
+        """
+        列出需要接入的文件
+
+        Returns:
+            list: (文件路径, 文件大小与修改时间, 起始读取位置) 列表，按文件名排序
+        """
+        files = []
+        for ext in self.file_types:
+            files.extend(glob.glob(os.path.join(self.folder, f'*.{ext}')))
+
+        now = time.time()
+        pending = []
+        for path in sorted(files):
+            name = os.path.basename(path)
+            stat = os.stat(path)
+            signature = [stat.st_size, stat.st_mtime]
+            record = self._ingested.get(name)
+            if record is not None and [record['size'], record['mtime']] == signature:
+                continue
+            if self.errors.get(name, {}).get('signature') == signature:
+                continue
+            if now - stat.st_mtime < WATCH_FOLDER_CONFIG['settle_seconds']:
+                # 文件仍在写入，等大小与修改时间稳定后再接入
+                continue
+
+            offset = 0
+            if record is not None:
+                if not self._is_append(path, record, stat.st_size):
+                    self._skip(name, signature, "文件在接入后被修改（不是在末尾追加），已跳过；新数据请放入新文件")
+                    continue
+                offset = record['offset']
+            pending.append((path, signature, offset))
+        return pending
+
+    def _is_append(self, path, record, size):
+        """已接入的CSV文件只在末尾追加了内容（已读取部分的开头未变）"""
+        if not path.lower().endswith('.csv') or size < record['offset']:
+            return False
+        return record['head'] is None or _head_digest(path, record['offset']) == record['head']
+
+    def _read_new_rows(self, path, size, offset):
+        """读取文件中 [offset, size) 范围内新增的行（CSV沿用文件首行的表头）"""
+        if offset == 0:
+            return read_data_file(path)
+        with open(path, 'rb') as f:
+            header = f.readline()
+            f.seek(offset)
+            data = f.read(size - offset)
+        return read_data_file(io.BytesIO(header + data), os.path.basename(path))
+
+    def pending_files(self):
+        """
+        列出尚未接入的追加文件（含末尾追加了新行的CSV文件）
+
+        Returns:
+            list: 文件路径列表，按文件名排序
+        """
+        with self._lock:
+            return [path for path, _, _ in self._scan()]
+
+    def refresh(self):
+        """
+        接入目录中新增的追加文件
+
+        多个会话共用同一个数据源，查找、读取、追加与提交文件清单在同一把锁内完成，
+        同一文件只会被接入一次。
+
+        Returns:
+            int: 本次新增的行数
+        """
+        new_rows = 0
+        with self._lock:
+            for path, signature, offset in self._scan():
+                name = os.path.basename(path)
+                size = signature[0]
+                try:
+                    raw = self._read_new_rows(path, size, offset)
+                except Exception as e:
+                    self.errors[name] = {'signature': signature, 'errors': [f"文件读取错误: {e}"]}
+                    continue
+
+                is_valid, errors = validate_data(raw)
+                if not is_valid:
+                    self.errors[name] = {'signature': signature, 'errors': errors}
+                    continue
+
+                try:
+                    chunk = preprocess_data(raw)
+                except Exception as e:
+                    self.errors[name] = {'signature': signature, 'errors': [f"数据预处理错误: {e}"]}
+                    continue
+                files = {**self._ingested, name: {
+                    'size': size,
+                    'mtime': signature[1],
+                    'offset': size,
+                    'head': _head_digest(path, size)
+                }}
+                self._append(chunk, files)
+                self.errors.pop(name, None)
+                new_rows += len(chunk)
+
+        return new_rows
+
@@ -0,0 +1,169 @@
+"""
+BI系统后台任务模块
+上传文件在后台线程中解析、校验与预处理，支持进度查询与取消
+"""
+
+import io
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from config import JOB_CONFIG
+from memory import memory_manager, frame_nbytes
+from sampling import build_stratified_sample, SAMPLE_COLUMNS
+from storage import DERIVED_COLUMNS
+from utils import read_data_file, validate_data, preprocess_data, compute_aggregates, build_dimension_dictionaries
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+class JobCancelled(Exception):
+    """导入任务已被取消"""
+
+
+def get_job_executor():
+    """
+    获取进程内共享的任务执行器（与并行聚合的执行器分开，避免相互占满）
+
+    Returns:
+        ThreadPoolExecutor: 线程池
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=JOB_CONFIG['max_workers'], thread_name_prefix='bi-ingest')
+        return _executor
+
+
+class IngestJob:
+    """
+    上传文件导入任务
+
+    状态依次为 pending -> running -> done / failed / cancelled。
+    进度（已解析字节数与行数）在每读完一块数据后更新，取消请求也在此时生效。
+    解析结果与分层样本登记到内存管理器，超出内存预算时可能被溢出到磁盘，访问时透明重新加载。
+    """
+
+    def __init__(self, data, filename, file_id=None):
+        """
+        Args:
+            data (bytes): 文件内容
+            filename (str): 文件名，用于判断格式
+            file_id (str): 上传文件标识
+        """
+        self.filename = filename
+        self.file_id = file_id
+        self.total_bytes = len(data)
+        self.bytes_read = 0
+        self.rows = 0
+        self.status = 'pending'
+        self.error = None
+        self.aggregates = None
+        self.dictionaries = None
+        self.future = None
+        self._result = None
+        self._sample = None
+        self._buffer = io.BytesIO(data)
+        self._cancel_event = threading.Event()
+
+    @property
+    def running(self):
+        return self.status in ('pending', 'running')
+
+    @property
+    def dataset(self):
+        """内存管理中的数据集标识"""
+        return f"upload:{self.file_id}"
+
+    @property
+    def result(self):
+        """预处理后的数据框，任务未完成时为 None"""
+        return self._result.get() if self._result is not None else None
+
+    @property
+    def sample(self):
+        """分层样本，任务未完成时为 None"""
+        return self._sample.get() if self._sample is not None else None
+
+    @property
+    def progress(self):
+        """已解析字节数占比 (0~1)"""
+        if self.total_bytes == 0:
+            return 1.0
+        return min(self.bytes_read / self.total_bytes, 1.0)
+
+    def cancel(self):
+        """请求取消任务；尚未开始的任务直接取消，运行中的任务在下一块数据读完后停止"""
+        self._cancel_event.set()
+        if self.future is not None and self.future.cancel():
+            self.status = 'cancelled'
+            self._buffer = None
+
+    def _check_cancelled(self):
+        if self._cancel_event.is_set():
+            raise JobCancelled()
+
+    def _on_chunk(self, rows):
+        self.rows = rows
+        if self._buffer is not None:
+            self.bytes_read = self._buffer.tell()
+        self._check_cancelled()
+
+    def run(self):
+        """执行导入：读取 -> 校验 -> 预处理 -> 构建预聚合、分层样本与维度字典"""
+        try:
+            self._check_cancelled()
+            self.status = 'running'
+            # 文件内容至少要能放入内存预算，否则不必开始解析
+            memory_manager.check_fits(self.total_bytes, self.filename)
+
+            df = read_data_file(self._buffer, self.filename,
+                                chunksize=JOB_CONFIG['chunk_rows'], on_chunk=self._on_chunk)
+            self.bytes_read = self.total_bytes
+            self.rows = len(df)
+            self._check_cancelled()
+
+            is_valid, errors = validate_data(df)
+            if not is_valid:
+                raise ValueError(f"数据校验失败: {'; '.join(errors)}")
+            self._check_cancelled()
+
+            result = preprocess_data(df)
+            del df
+            memory_manager.check_fits(frame_nbytes(result), self.filename)
+            self._check_cancelled()
+
+            sample = build_stratified_sample(result)
+            self.aggregates = compute_aggregates(result)
+            self.dictionaries = build_dimension_dictionaries(result, self.aggregates)
+            # 任务对象被回收（如会话结束或上传了新文件）时自动注销
+            self._sample = memory_manager.manage(sample, self.dataset, '样本', owner=self,
+                                                 derived_columns=DERIVED_COLUMNS + SAMPLE_COLUMNS)
+            self._result = memory_manager.manage(result, self.dataset, '明细', owner=self)
+            memory_manager.track('预聚合', self.dataset, self.aggregates, self.dataset, owner=self)
+            memory_manager.track('维度字典', self.dataset, self.dictionaries, self.dataset, owner=self)
+            self.status = 'done'
+        except JobCancelled:
+            self.status = 'cancelled'
+        except Exception as e:
+            self.error = str(e)
+            self.status = 'failed'
+        finally:
+            self._buffer = None
+
+
+def submit_ingest_job(data, filename, file_id=None):
+    """
+    提交后台导入任务
+
+    Args:
+        data (bytes): 文件内容
+        filename (str): 文件名
+        file_id (str): 上传文件标识
+
+    Returns:
+        IngestJob: 任务句柄
+    """
+    job = IngestJob(data, filename, file_id)
+    job.future = get_job_executor().submit(job.run)
+    return job
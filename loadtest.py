@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+"""
+BI数据分析系统负载测试脚本
+在本地通过 Streamlit 的应用测试接口无界面地运行 app.py，模拟多个会话同时执行脚本化操作
+（上传文件、切换地区、全选/清空、修改日期范围），统计每次重新运行的延迟分位数、吞吐量与进程内存
+
+用法: python loadtest.py [--rows 10000 100000] [--sessions 1 4 8] [--iterations 1] [--output report.json]
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from unittest.mock import MagicMock
+
+import numpy as np
+import pandas as pd
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, APP_DIR)
+
+from config import LOADTEST_CONFIG, SAMPLE_DATA_CONFIG  # noqa: E402
+
+# 包装脚本：上传控件返回会话状态中指定的文件，后台任务轮询改为由测试脚本驱动
+WRAPPER_SCRIPT = f'''
+import io
+import os
+import sys
+
+sys.path.insert(0, {APP_DIR!r})
+
+import streamlit as st
+import config
+import loadtest
+
+config.JOB_CONFIG['poll_interval'] = 0
+
+
+class _Upload(io.BytesIO):
+    def __init__(self, path, file_id):
+        super().__init__(loadtest.read_upload(path))
+        self.name = os.path.basename(path)
+        self.file_id = file_id
+
+
+def _file_uploader(*args, **kwargs):
+    path = st.session_state.get('_loadtest_upload')
+    return _Upload(path, st.session_state['_loadtest_file_id']) if path else None
+
+
+st.file_uploader = _file_uploader
+st.rerun = lambda: None
+
+_app_path = os.path.join({APP_DIR!r}, 'app.py')
+with open(_app_path, encoding='utf-8') as _f:
+    exec(compile(_f.read(), _app_path, 'exec'))
+'''
+
+_uploads = {}
+_uploads_lock = threading.Lock()
+
+
+def read_upload(path):
+    """读取上传文件内容（进程内缓存，模拟浏览器已上传到服务器的文件）"""
+    with _uploads_lock:
+        if path not in _uploads:
+            with open(path, 'rb') as f:
+                _uploads[path] = f.read()
+        return _uploads[path]
+
+
+def generate_upload_file(rows, directory):
+    """
+    生成指定行数的上传文件（CSV）
+
+    Args:
+        rows (int): 行数
+        directory (str): 输出目录
+
+    Returns:
+        str: 文件路径
+    """
+    rng = np.random.default_rng(rows)
+    config = SAMPLE_DATA_CONFIG
+    dates = pd.date_range(LOADTEST_CONFIG['start_date'], LOADTEST_CONFIG['end_date'], freq='D')
+    df = pd.DataFrame({
+        '日期': rng.choice(dates.strftime('%Y-%m-%d'), rows),
+        '产品类别': rng.choice(config['categories'], rows),
+        '产品名称': rng.choice(config['products'], rows),
+        '销售额': rng.integers(*config['sales_range'], rows),
+        '数量': rng.integers(*config['quantity_range'], rows),
+        '地区': rng.choice(config['regions'], rows),
+        '客户类型': rng.choice(config['customer_types'], rows),
+        '支付方式': rng.choice(config['payment_methods'], rows)
+    }).sort_values('日期', kind='stable')
+
+    path = os.path.join(directory, f'loadtest_{rows}.csv')
+    df.to_csv(path, index=False)
+    return path
+
+
+def install_shared_runtime():
+    """
+    安装进程内共享的模拟运行时
+
+    应用测试接口每次运行都会设置并清除全局运行时，多个会话并发运行时会互相干扰；
+    这里让其只作用于一个占位类，所有会话共用同一个运行时，缓存也像真实服务一样在会话间共享。
+    """
+    from streamlit.runtime import Runtime
+    from streamlit.runtime.caching.storage.dummy_cache_storage import MemoryCacheStorageManager
+    from streamlit.runtime.media_file_manager import MediaFileManager
+    from streamlit.runtime.memory_media_file_storage import MemoryMediaFileStorage
+    from streamlit.testing.v1 import app_test
+
+    class _DetachedRuntime:
+        _instance = None
+
+    app_test.Runtime = _DetachedRuntime
+
+    runtime = MagicMock(spec=Runtime)
+    runtime.media_file_mgr = MediaFileManager(MemoryMediaFileStorage("/mock/media"))
+    runtime.cache_storage_manager = MemoryCacheStorageManager()
+    Runtime._instance = runtime
+
+
+class Session:
+    """一个模拟会话，记录每次重新运行的操作名称与耗时"""
+
+    def __init__(self, session_id, upload_path, timeout):
+        from streamlit.testing.v1 import AppTest
+
+        self.session_id = session_id
+        self.upload_path = upload_path
+        self.timeout = timeout
+        self.records = []
+        self.upload_seconds = None
+        self.errors = []
+        self.app = AppTest.from_string(WRAPPER_SCRIPT, default_timeout=timeout)
+
+    def _timed(self, action, step):
+        start = time.perf_counter()
+        self.app = step() or self.app
+        self.records.append((action, time.perf_counter() - start))
+        if self.app.exception:
+            self.errors.append(f"{action}: {self.app.exception[0].message}")
+
+    def _widget(self, kind, key):
+        return getattr(self.app, kind)(key)
+
+    def _interact(self, regions, date_range):
+        self._timed('切换地区', lambda: self._widget('multiselect', 'regions_multiselect').set_value(regions).run())
+        self._timed('全选', lambda: self._widget('button', 'select_all_regions').click().run())
+        self._timed('清空', lambda: self._widget('button', 'clear_all_regions').click().run())
+        self._timed('修改日期', lambda: self._widget('date_input', 'date_range').set_value(date_range).run())
+
+    def _upload(self, iteration):
+        self.app.session_state['_loadtest_upload'] = self.upload_path
+        self.app.session_state['_loadtest_file_id'] = f'{self.session_id}-{iteration}'
+        start = time.perf_counter()
+        self._timed('上传文件', lambda: self.app.sidebar.selectbox[0].set_value("上传文件").run())
+
+        # 后台解析期间每次轮询也是一次重新运行
+        while not self._upload_ready():
+            if time.perf_counter() - start > self.timeout:
+                self.errors.append("上传文件: 等待解析超时")
+                return
+            time.sleep(0.05)
+            self._timed('解析进度', lambda: self.app.run())
+        self.upload_seconds = time.perf_counter() - start
+
+    def _upload_ready(self):
+        state = self.app.session_state
+        return 'upload_dataset' in state and state['upload_dataset'].file_id == state['_loadtest_file_id']
+
+    def run(self, iterations):
+        """执行脚本化操作：打开页面 -> 示例数据上的交互 -> 上传文件 -> 上传数据上的交互"""
+        try:
+            self._timed('打开页面', lambda: self.app.run())
+            for iteration in range(iterations):
+                regions = list(SAMPLE_DATA_CONFIG['regions'][:2])
+                self._interact(regions, (date(2023, 3, 1), date(2023, 5, 31)))
+                self._upload(iteration)
+                end = date.fromisoformat(LOADTEST_CONFIG['end_date'])
+                self._interact(regions, (end - timedelta(days=30), end))
+                self._timed('切换数据源', lambda: self.app.sidebar.selectbox[0].set_value("示例数据").run())
+        except Exception as e:
+            self.errors.append(f"{type(e).__name__}: {e}")
+        return self
+
+
+def process_memory():
+    """
+    进程内存占用
+
+    Returns:
+        dict: 当前常驻内存与峰值常驻内存（MB），无法获取时为 None
+    """
+    current = None
+    try:
+        with open('/proc/self/statm') as f:
+            current = int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1024 / 1024
+    except (OSError, ValueError, AttributeError):
+        pass
+
+    peak = None
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux 以KB为单位，macOS 以字节为单位
+        peak = peak / 1024 / 1024 if sys.platform == 'darwin' else peak / 1024
+    return {'rss_mb': current, 'peak_rss_mb': peak}
+
+
+def latency_summary(latencies):
+    """
+    延迟分位数（毫秒）
+
+    Args:
+        latencies (list): 耗时（秒）
+
+    Returns:
+        dict: 次数与 p50/p95/p99/最大值
+    """
+    if not latencies:
+        return {'count': 0}
+    values = np.asarray(latencies) * 1000
+    return {
+        'count': len(values),
+        'p50_ms': round(float(np.percentile(values, 50)), 1),
+        'p95_ms': round(float(np.percentile(values, 95)), 1),
+        'p99_ms': round(float(np.percentile(values, 99)), 1),
+        'max_ms': round(float(values.max()), 1)
+    }
+
+
+def run_level(upload_path, rows, sessions, iterations, timeout):
+    """
+    以指定并发会话数运行一轮测试
+
+    Returns:
+        dict: 本轮的延迟、吞吐量与内存统计
+    """
+    workers = [Session(i, upload_path, timeout) for i in range(sessions)]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=sessions) as executor:
+        list(executor.map(lambda session: session.run(iterations), workers))
+    elapsed = time.perf_counter() - start
+
+    records = [record for session in workers for record in session.records]
+    by_action = {}
+    for action, seconds in records:
+        by_action.setdefault(action, []).append(seconds)
+    uploads = [s.upload_seconds for s in workers if s.upload_seconds is not None]
+
+    return {
+        'rows': rows,
+        'sessions': sessions,
+        'elapsed_s': round(elapsed, 2),
+        'throughput_rps': round(len(records) / elapsed, 2) if elapsed > 0 else None,
+        'reruns': latency_summary([seconds for _, seconds in records]),
+        'actions': {action: latency_summary(values) for action, values in by_action.items()},
+        'upload_ready': latency_summary(uploads),
+        'memory': process_memory(),
+        'errors': [error for s in workers for error in s.errors]
+    }
+
+
+def print_level(result):
+    """打印一轮测试结果"""
+    reruns = result['reruns']
+    memory = result['memory']
+    print(f"\n📊 {result['rows']:,} 行 × {result['sessions']} 个会话: "
+          f"{reruns.get('count', 0)} 次运行, 用时 {result['elapsed_s']} 秒, 吞吐量 {result['throughput_rps']} 次/秒")
+    if reruns.get('count'):
+        print(f"   全部运行  p50 {reruns['p50_ms']} ms | p95 {reruns['p95_ms']} ms | p99 {reruns['p99_ms']} ms")
+    for action, summary in result['actions'].items():
+        print(f"   {action:<6} p50 {summary['p50_ms']} ms | p95 {summary['p95_ms']} ms | "
+              f"p99 {summary['p99_ms']} ms ({summary['count']} 次)")
+    if result['upload_ready'].get('count'):
+        print(f"   上传至可用 p50 {result['upload_ready']['p50_ms']} ms | p95 {result['upload_ready']['p95_ms']} ms")
+    if memory['rss_mb'] is not None or memory['peak_rss_mb'] is not None:
+        print(f"   进程内存: 当前 {memory['rss_mb'] or 0:,.0f} MB, 峰值 {memory['peak_rss_mb'] or 0:,.0f} MB")
+    for error in result['errors'][:5]:
+        print(f"   ❌ {error}")
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="BI数据分析系统负载测试")
+    parser.add_argument('--rows', type=int, nargs='+', default=LOADTEST_CONFIG['dataset_rows'], help="上传文件的行数")
+    parser.add_argument('--sessions', type=int, nargs='+', default=LOADTEST_CONFIG['sessions'], help="并发会话数")
+    parser.add_argument('--iterations', type=int, default=LOADTEST_CONFIG['iterations'], help="每个会话的重复次数")
+    parser.add_argument('--output', help="将结果写入JSON文件")
+    args = parser.parse_args()
+
+    # 应用中的相对路径（快照、监控文件夹）以应用目录为基准
+    os.chdir(APP_DIR)
+    install_shared_runtime()
+
+    print("🚀 BI数据分析系统负载测试")
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        for rows in args.rows:
+            upload_path = generate_upload_file(rows, directory)
+            for sessions in args.sessions:
+                result = run_level(upload_path, rows, sessions, args.iterations, LOADTEST_CONFIG['timeout'])
+                print_level(result)
+                results.append(result)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"\n✅ 结果已写入 {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,443 @@
+"""
+BI系统内存管理模块
+按数据集登记明细、派生列、分层样本与缓存结果的内存占用，总占用超出全局预算时按最近访问时间淘汰：
+数据框溢出到本地列式文件（或丢弃可重新读取的数据），下次访问时透明重新加载；缓存结果直接清除，下次访问时重新计算
+"""
+
+import atexit
+import itertools
+import os
+import shutil
+import tempfile
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from datetime import datetime
+from functools import partial
+
+import pandas as pd
+
+from config import MEMORY_CONFIG
+from storage import DERIVED_COLUMNS
+
+MB = 1024 * 1024
+
+# 估算对象列内存占用时抽取的行数
+NBYTES_SAMPLE_ROWS = 10000
+
+
+class MemoryBudgetExceeded(ValueError):
+    """数据超出全局内存预算"""
+
+
+def frame_nbytes(frame, columns=None):
+    """
+    数据框（或其部分列）的内存占用，包括字符串等对象列的实际大小；
+    行数较多时对象列按等间隔抽取的行估算，避免逐个测量全部字符串
+
+    Args:
+        frame (pd.DataFrame | pd.Series): 数据
+        columns (list): 只统计这些列（不含索引），为空表示全部
+
+    Returns:
+        int: 字节数
+    """
+    if isinstance(frame, pd.Series):
+        frame = frame.to_frame()
+    include_index = columns is None
+    if columns is not None:
+        frame = frame[[col for col in columns if col in frame.columns]]
+
+    usage = frame.memory_usage(index=False, deep=False)
+    object_cols = [col for col in frame.columns if frame[col].dtype == object]
+    if object_cols:
+        rows = len(frame)
+        if rows > NBYTES_SAMPLE_ROWS:
+            sampled = frame[object_cols].iloc[::rows // NBYTES_SAMPLE_ROWS]
+            usage[object_cols] = sampled.memory_usage(index=False, deep=True) * rows / len(sampled)
+        else:
+            usage[object_cols] = frame[object_cols].memory_usage(index=False, deep=True)
+
+    nbytes = usage.sum()
+    if include_index:
+        nbytes += frame.index.memory_usage(deep=True)
+    return int(nbytes)
+
+
+def estimate_nbytes(value):
+    """
+    估算缓存结果的内存占用（数据框、数组或带 nbytes 属性的对象，及其组成的元组/列表/字典）
+
+    Args:
+        value: 缓存的结果
+
+    Returns:
+        int: 字节数
+    """
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return frame_nbytes(value)
+    if hasattr(value, 'nbytes'):
+        return int(value.nbytes)
+    if isinstance(value, dict):
+        return sum(estimate_nbytes(v) for v in value.values())
+    if isinstance(value, (list, tuple)):
+        return sum(estimate_nbytes(v) for v in value)
+    return 0
+
+
+class ManagedFrame:
+    """
+    受内存管理的数据框句柄
+
+    调用方持有句柄而不是数据框本身，通过 get() 取得数据；数据被淘汰后
+    get() 会从溢出文件（或 reload 函数）重新加载，对调用方透明。
+    """
+
+    def __init__(self, manager, key, frame, dataset, kind, reload=None, derived_columns=None):
+        self.manager = manager
+        self.key = key
+        self.dataset = dataset
+        self.kind = kind
+        self.reload = reload
+        self.nbytes = frame_nbytes(frame)
+        self.derived_nbytes = frame_nbytes(frame, derived_columns if derived_columns is not None else DERIVED_COLUMNS)
+        self.spill_file = None
+        self.last_access = time.time()
+        self._frame = frame
+
+    @property
+    def resident(self):
+        return self._frame is not None
+
+    @property
+    def evictable(self):
+        return True
+
+    def get(self):
+        """
+        获取数据框，已被淘汰时重新加载
+
+        Returns:
+            pd.DataFrame: 数据框（进程内共享对象，调用方不应修改）
+        """
+        return self.manager._access(self)
+
+    def _load(self):
+        if self.reload is not None:
+            return self.reload()
+        if self.spill_file.endswith('.parquet'):
+            return pd.read_parquet(self.spill_file)
+        return pd.read_pickle(self.spill_file)
+
+    def _evict(self, spill_dir):
+        """淘汰数据：可重新读取的数据直接丢弃，其余写入溢出文件（数据不会被修改，只写一次）"""
+        if self.reload is None and self.spill_file is None:
+            path = os.path.join(spill_dir, f'{self.key}.parquet')
+            try:
+                self._frame.to_parquet(path)
+            except Exception:
+                # 列式文件不支持的对象列（如混合类型）退回 pickle
+                if os.path.exists(path):
+                    os.remove(path)
+                path = os.path.join(spill_dir, f'{self.key}.pkl')
+                self._frame.to_pickle(path)
+            self.spill_file = path
+        self._frame = None
+
+    def _discard(self):
+        self._frame = None
+        if self.spill_file is not None and os.path.exists(self.spill_file):
+            os.remove(self.spill_file)
+        self.spill_file = None
+
+
+class CachedResult:
+    """登记的缓存结果（如 st.cache_data 函数的返回值），淘汰时调用 clear 清除整个缓存"""
+
+    def __init__(self, key, name, value, dataset, clear=None, nbytes=None):
+        self.key = key
+        self.name = name
+        self.dataset = dataset
+        self.kind = name
+        self.clear = clear
+        self.nbytes = estimate_nbytes(value) if nbytes is None else int(nbytes)
+        self.derived_nbytes = 0
+        self.spill_file = None
+        self.last_access = time.time()
+        self.resident = True
+
+    @property
+    def evictable(self):
+        return self.clear is not None
+
+    def _evict(self, spill_dir):
+        self.clear()
+        self.resident = False
+
+    def _discard(self):
+        self.resident = False
+
+
+class MemoryManager:
+    """
+    进程内内存管理器
+
+    登记的条目按最近访问时间排序；登记新条目或重新加载已淘汰的数据后，
+    若常驻内存的总占用超出预算，从最久未访问的条目开始淘汰，直到回到预算以内。
+    """
+
+    def __init__(self, budget_mb=None, spill_path=None, enabled=None):
+        """
+        Args:
+            budget_mb (float): 全局内存预算（MB），默认取 MEMORY_CONFIG
+            spill_path (str): 溢出文件目录，默认取 MEMORY_CONFIG
+            enabled (bool): 是否执行预算，默认取 MEMORY_CONFIG；关闭时只统计不淘汰
+        """
+        self.budget = int((budget_mb or MEMORY_CONFIG['budget_mb']) * MB)
+        self.spill_path = spill_path or MEMORY_CONFIG['spill_path']
+        self.enabled = MEMORY_CONFIG['enabled'] if enabled is None else enabled
+        self.evictions = 0
+        self._entries = {}
+        self._cache_keys = {}
+        self._spill_dir = None
+        self._ids = itertools.count(1)
+        self._lock = threading.RLock()
+
+    @property
+    def used(self):
+        """常驻内存的总占用（字节）"""
+        with self._lock:
+            return sum(entry.nbytes for entry in self._entries.values() if entry.resident)
+
+    def _get_spill_dir(self):
+        # 每个进程使用独立的溢出目录，进程退出时删除
+        if self._spill_dir is None:
+            os.makedirs(self.spill_path, exist_ok=True)
+            self._spill_dir = tempfile.mkdtemp(prefix=f'{os.getpid()}-', dir=self.spill_path)
+            atexit.register(shutil.rmtree, self._spill_dir, ignore_errors=True)
+        return self._spill_dir
+
+    def check_fits(self, nbytes, name):
+        """
+        检查数据能否放入预算（即使淘汰其他全部条目），不能时抛出异常
+
+        Args:
+            nbytes (int): 字节数
+            name (str): 数据名称，用于错误信息
+
+        Raises:
+            MemoryBudgetExceeded: 超出全局内存预算
+        """
+        if self.enabled and nbytes > self.budget:
+            raise MemoryBudgetExceeded(
+                f"{name} 需要约 {nbytes / MB:,.0f} MB 内存，超出内存预算 {self.budget / MB:,.0f} MB")
+
+    def manage(self, frame, dataset, kind, reload=None, owner=None, derived_columns=None):
+        """
+        登记数据框
+
+        Args:
+            frame (pd.DataFrame): 数据框（登记后不应再修改）
+            dataset (str): 所属数据集标识
+            kind (str): 数据类别，如 '明细'、'样本'
+            reload (callable): 无参数的重新读取函数；为空时淘汰的数据写入溢出文件
+            owner (object): 持有句柄的对象，被回收时自动注销
+            derived_columns (list): 计入派生列占用的列，默认为预处理派生的列
+
+        Returns:
+            ManagedFrame: 句柄
+        """
+        with self._lock:
+            entry = ManagedFrame(self, f'frame-{next(self._ids)}', frame, dataset, kind, reload, derived_columns)
+            self._entries[entry.key] = entry
+            self._enforce(keep=entry)
+        if owner is not None:
+            weakref.finalize(owner, self.release, entry.key)
+        return entry
+
+    def track(self, name, key, value, dataset, clear=None, max_entries=None, owner=None, nbytes=None):
+        """
+        登记缓存结果的内存占用
+
+        Args:
+            name (str): 缓存名称（同一缓存函数的结果共用）
+            key (hashable): 缓存键
+            value: 缓存的结果
+            dataset (str): 所属数据集标识
+            clear (callable): 清除整个缓存的函数；为空时只统计不淘汰
+            max_entries (int): 缓存自身的最大条目数，超出时最早登记的条目视为已被缓存淘汰
+            owner (object): 持有结果的对象，被回收时自动注销
+            nbytes (int): 结果的内存占用，为空时按 estimate_nbytes 估算
+        """
+        with self._lock:
+            entry_key = f'{name}:{key}'
+            self._entries.pop(entry_key, None)
+            entry = CachedResult(entry_key, name, value, dataset, clear, nbytes)
+            self._entries[entry_key] = entry
+
+            keys = self._cache_keys.setdefault(name, [])
+            if entry_key in keys:
+                keys.remove(entry_key)
+            keys.append(entry_key)
+            while max_entries and len(keys) > max_entries:
+                self._entries.pop(keys.pop(0), None)
+
+            self._enforce(keep=entry)
+        if owner is not None:
+            weakref.finalize(owner, self.release, entry_key)
+
+    def touch(self, name, key):
+        """
+        刷新缓存结果的最近访问时间（缓存命中时由调用方调用，命中的结果不会重新登记）
+
+        Args:
+            name (str): 缓存名称
+            key (hashable): 缓存键
+        """
+        with self._lock:
+            entry = self._entries.get(f'{name}:{key}')
+            if entry is None:
+                return
+            entry.last_access = time.time()
+            keys = self._cache_keys.get(name, [])
+            if entry.key in keys:
+                keys.remove(entry.key)
+                keys.append(entry.key)
+
+    def release(self, key):
+        """
+        注销条目并删除其溢出文件
+
+        Args:
+            key (str): 条目键
+        """
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                entry._discard()
+
+    def _access(self, entry):
+        with self._lock:
+            entry.last_access = time.time()
+            if entry._frame is None:
+                entry._frame = entry._load()
+                self._enforce(keep=entry)
+            return entry._frame
+
+    def _enforce(self, keep=None):
+        """超出预算时按最近访问时间淘汰条目（不淘汰 keep）"""
+        if not self.enabled:
+            return
+        used = self.used
+        if used <= self.budget:
+            return
+
+        candidates = sorted(
+            (entry for entry in self._entries.values() if entry.resident and entry.evictable and entry is not keep),
+            key=lambda entry: entry.last_access
+        )
+        for entry in candidates:
+            if used <= self.budget:
+                break
+            if entry.key not in self._entries:
+                # 已随同一缓存的其他结果一起清除
+                continue
+            if isinstance(entry, CachedResult):
+                # 清除缓存函数的全部结果
+                for cached_key in self._cache_keys.pop(entry.name, []):
+                    cached = self._entries.pop(cached_key, None)
+                    if cached is not None and cached.resident:
+                        used -= cached.nbytes
+                entry._evict(None)
+            else:
+                entry._evict(self._get_spill_dir())
+                used -= entry.nbytes
+            self.evictions += 1
+
+    def usage(self):
+        """
+        各条目的内存占用
+
+        Returns:
+            pd.DataFrame: 数据集、类别、状态、内存、派生列、溢出文件大小与最近访问时间
+        """
+        with self._lock:
+            entries = sorted(self._entries.values(), key=lambda entry: (entry.dataset, entry.kind))
+            rows = [{
+                '数据集': entry.dataset,
+                '类别': entry.kind,
+                '状态': '内存' if entry.resident else ('已溢出' if entry.spill_file else '已淘汰'),
+                '内存(MB)': round(entry.nbytes / MB, 2) if entry.resident else 0.0,
+                '派生列(MB)': round(entry.derived_nbytes / MB, 2) if entry.resident else 0.0,
+                '溢出文件(MB)': round(os.path.getsize(entry.spill_file) / MB, 2)
+                if entry.spill_file and os.path.exists(entry.spill_file) else 0.0,
+                '最近访问': datetime.fromtimestamp(entry.last_access).strftime('%H:%M:%S')
+            } for entry in entries]
+        return pd.DataFrame(rows, columns=['数据集', '类别', '状态', '内存(MB)', '派生列(MB)', '溢出文件(MB)', '最近访问'])
+
+
+memory_manager = MemoryManager()
+
+
+class ResultCache:
+    """
+    进程内共享的计算结果缓存：每类结果以缓存键保存，超出条目数时淘汰最久未访问的结果
+
+    与 st.cache_data 不同，可在渐进式渲染的后台线程中使用（不依赖 Streamlit 脚本上下文）。
+    结果登记到内存管理器，超出内存预算时该类结果被整体清除，下次访问重新计算。
+    """
+
+    def __init__(self, manager, max_entries=None):
+        self.manager = manager
+        self.max_entries = max_entries or MEMORY_CONFIG['result_cache_entries']
+        self._results = {}
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, name, key, dataset, compute):
+        """
+        获取缓存的结果，不存在时计算并缓存
+
+        Args:
+            name (str): 结果类别（同时作为内存管理器中的缓存名称）
+            key (hashable): 缓存键
+            dataset (str): 所属数据集标识
+            compute (callable): 无参数的计算函数
+
+        Returns:
+            object: 计算结果
+        """
+        with self._lock:
+            results = self._results.setdefault(name, OrderedDict())
+            hit = key in results
+            if hit:
+                results.move_to_end(key)
+                result = results[key]
+        if hit:
+            self.manager.touch(name, key)
+            return result
+
+        result = compute()
+        with self._lock:
+            results = self._results.setdefault(name, OrderedDict())
+            results[key] = result
+            while len(results) > self.max_entries:
+                results.popitem(last=False)
+        self.manager.track(name, key, result, dataset, clear=partial(self.clear, name), max_entries=self.max_entries)
+        return result
+
+    def clear(self, name=None):
+        """
+        清除缓存的结果
+
+        Args:
+            name (str): 结果类别，为空时清除全部
+        """
+        with self._lock:
+            if name is None:
+                self._results.clear()
+            else:
+                self._results.pop(name, None)
+
+
+result_cache = ResultCache(memory_manager)
@@ -0,0 +1,182 @@
+"""
+BI系统并行聚合模块
+将数据集分区后在线程池或进程池中计算部分聚合（和、计数、最小/最大值、去重集合），
+再合并为最终结果
+"""
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from config import PARALLEL_CONFIG
+from dimensions import DAY_KEY, period_codes
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """
+    获取进程内共享的执行器
+
+    Returns:
+        concurrent.futures.Executor: 线程池或进程池
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            max_workers = PARALLEL_CONFIG['max_workers'] or os.cpu_count() or 1
+            if PARALLEL_CONFIG['executor'] == 'process':
+                _executor = ProcessPoolExecutor(max_workers=max_workers)
+            else:
+                _executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='bi-agg')
+        return _executor
+
+
+def should_parallelize(df):
+    """
+    判断数据集是否走并行聚合
+
+    Args:
+        df (pd.DataFrame): 数据框
+
+    Returns:
+        bool: 是否并行
+    """
+    return PARALLEL_CONFIG['enabled'] and len(df) >= PARALLEL_CONFIG['min_rows']
+
+
+def partition_frame(df):
+    """
+    将数据集分区
+
+    按 PARALLEL_CONFIG['partition_by'] 分区：'month' 按月份分区，
+    'rows' 按固定行数切分为连续的切片（不复制数据）。
+    分区方式与工作线程数无关，合并顺序固定，结果不随并发度变化。
+
+    Args:
+        df (pd.DataFrame): 数据框
+
+    Returns:
+        list: 分区数据框列表
+    """
+    if PARALLEL_CONFIG['partition_by'] == 'month' and DAY_KEY in df.columns:
+        codes = period_codes(df[DAY_KEY].values, 'month')
+        return [part for _, part in df.groupby(codes, sort=True)]
+
+    size = PARALLEL_CONFIG['partition_rows']
+    return [df.iloc[start:start + size] for start in range(0, len(df), size)]
+
+
+def map_partitions(df, func, *args):
+    """
+    在每个分区上执行函数
+
+    Args:
+        df (pd.DataFrame): 数据框
+        func (callable): 分区函数，签名为 func(part, *args)，进程池模式下需可序列化
+        *args: 传给分区函数的其他参数
+
+    Returns:
+        list: 各分区的结果，顺序与分区顺序一致
+    """
+    parts = partition_frame(df)
+    if len(parts) <= 1:
+        return [func(part, *args) for part in parts]
+
+    executor = get_executor()
+    futures = [executor.submit(func, part, *args) for part in parts]
+    return [future.result() for future in futures]
+
+
+def _partial_groupby(part, by, measures, count_name, sort=True):
+    grouped = part.groupby(by, observed=True, sort=sort)
+    result = grouped[measures].sum() if measures else pd.DataFrame(index=grouped.size().index)
+    if count_name:
+        result[count_name] = grouped.size()
+    return result
+
+
+def groupby_sum(df, by, measures, count_name=None, sort=True):
+    """
+    分组求和（可选计数），数据量较大时按分区并行计算后合并
+
+    Args:
+        df (pd.DataFrame): 数据框
+        by (str | list): 分组字段
+        measures (list): 求和的指标列
+        count_name (str): 计数列名，为空时不计数
+        sort (bool): 是否按分组值排序；为否时省去对全部分组的排序，结果顺序不确定
+
+    Returns:
+        pd.DataFrame: 以分组值为索引的结果
+    """
+    measures = list(measures)
+    if not should_parallelize(df):
+        return _partial_groupby(df, by, measures, count_name, sort)
+
+    partials = [p for p in map_partitions(df, _partial_groupby, by, measures, count_name, sort) if len(p) > 0]
+    if not partials:
+        return _partial_groupby(df.iloc[:0], by, measures, count_name, sort)
+
+    levels = list(range(partials[0].index.nlevels))
+    return pd.concat(partials).groupby(level=levels, sort=sort).sum()
+
+
+def _partial_stats(part, measure, distinct_cols):
+    stats = {'count': len(part), 'distinct': {}}
+    if measure in part.columns:
+        values = part[measure]
+        stats.update({
+            'sum': values.sum(),
+            'non_null': int(values.count()),
+            'min': values.min(),
+            'max': values.max()
+        })
+    for col in distinct_cols:
+        stats['distinct'][col] = set(part[col].dropna().unique())
+    return stats
+
+
+def merge_stats(partials):
+    """
+    合并各分区的部分统计量
+
+    Args:
+        partials (list): _partial_stats 的结果列表
+
+    Returns:
+        dict: 合并后的统计量
+    """
+    merged = {'count': sum(p['count'] for p in partials), 'distinct': {}}
+    with_values = [p for p in partials if 'sum' in p and p['non_null'] > 0]
+    if partials and 'sum' in partials[0]:
+        merged['sum'] = sum(p['sum'] for p in partials)
+        merged['non_null'] = sum(p['non_null'] for p in partials)
+        merged['min'] = min(p['min'] for p in with_values) if with_values else np.nan
+        merged['max'] = max(p['max'] for p in with_values) if with_values else np.nan
+    for p in partials:
+        for col, values in p['distinct'].items():
+            merged['distinct'].setdefault(col, set()).update(values)
+    return merged
+
+
+def summary_stats(df, measure, distinct_cols=()):
+    """
+    计算指标的和、计数、最小/最大值与若干字段的去重数量，数据量较大时并行
+
+    Args:
+        df (pd.DataFrame): 数据框
+        measure (str): 指标列
+        distinct_cols (list): 需要去重计数的字段
+
+    Returns:
+        dict: 包含 count、sum、non_null、min、max 以及 distinct（字段 -> 取值集合）
+    """
+    distinct_cols = [col for col in distinct_cols if col in df.columns]
+    if not should_parallelize(df):
+        return merge_stats([_partial_stats(df, measure, distinct_cols)])
+    return merge_stats(map_partitions(df, _partial_stats, measure, distinct_cols))
@@ -0,0 +1,459 @@
+"""
+BI系统查询规划模块
+位于筛选控件与图表之间：按数据集统计信息（维度字典中的取值频次、日期键预聚合）估算筛选条件的选择率，
+比较预聚合、行索引与全表扫描三种执行路径的代价并选择最低者，记录所选计划与实际耗时以便调整代价参数
+"""
+
+import json
+import os
+import threading
+import time
+import weakref
+from collections import OrderedDict, deque
+
+import numpy as np
+import pandas as pd
+
+from config import PLANNER_CONFIG
+from dimensions import DAY_KEY, MISSING_DAY_KEY, rollup_by_period
+from engine import groupby_sum, filter_mask
+from memory import memory_manager
+
+# 执行路径 -> 显示名称；selection 表示复用本次运行中已选出的行
+PATH_LABELS = {
+    'cube': '预聚合',
+    'index': '行索引',
+    'scan': '全表扫描',
+    'selection': '已选中行'
+}
+
+# 进程内最近的查询计划（所有会话）
+recent_plans = deque(maxlen=200)
+
+_log_lock = threading.Lock()
+_indexes = OrderedDict()
+_indexes_lock = threading.Lock()
+
+
+class RowIndex:
+    """
+    数据集的行索引
+
+    每个字段保存按取值排序的行号（同一取值的行号升序排列），取值的行号区间由二分查找得到；
+    日期键按同样方式排序，日期范围对应一段连续区间。字段的索引在首次使用时建立。
+    """
+
+    def __init__(self, df):
+        """
+        Args:
+            df (pd.DataFrame): 数据集（只保存弱引用，数据集被替换或重新加载后索引失效）
+        """
+        self._frame = weakref.ref(df)
+        self.rows = len(df)
+        self._fields = {}
+        self._lock = threading.Lock()
+
+    def matches(self, df):
+        return self._frame() is df
+
+    def has(self, field):
+        return field in self._fields
+
+    @property
+    def nbytes(self):
+        return sum(order.nbytes + keys.nbytes for order, keys, _ in self._fields.values())
+
+    def _build(self, df, field):
+        with self._lock:
+            if field not in self._fields:
+                if field == DAY_KEY:
+                    codes, uniques = df[DAY_KEY].values, None
+                else:
+                    codes, uniques = pd.factorize(df[field])
+                    uniques = pd.Index(uniques)
+                order = np.argsort(codes, kind='stable')
+                self._fields[field] = (order, codes[order], uniques)
+            return self._fields[field]
+
+    def positions(self, df, field, values=None, key_range=None):
+        """
+        满足条件的行号（升序）
+
+        Args:
+            df (pd.DataFrame): 数据集
+            field (str): 字段
+            values (list): 字段取值之一即满足条件
+            key_range (tuple): 日期键范围 (起, 止)，含两端，field 为日期键时使用
+
+        Returns:
+            np.ndarray: 行号
+        """
+        order, sorted_codes, uniques = self._build(df, field)
+        if key_range is not None:
+            lo = np.searchsorted(sorted_codes, key_range[0], side='left')
+            hi = np.searchsorted(sorted_codes, key_range[1], side='right')
+            return np.sort(order[lo:hi])
+
+        codes = uniques.get_indexer(list(values))
+        codes = codes[codes >= 0]
+        lo = np.searchsorted(sorted_codes, codes, side='left')
+        hi = np.searchsorted(sorted_codes, codes, side='right')
+        parts = [order[a:b] for a, b in zip(lo, hi)]
+        if len(parts) == 1:
+            return parts[0]
+        return np.sort(np.concatenate(parts)) if parts else np.zeros(0, dtype=np.int64)
+
+
+def get_row_index(dataset_key, df):
+    """
+    获取数据集的行索引（按数据集标识缓存，数据集对象变化时重新建立）
+
+    Args:
+        dataset_key (str): 数据集标识
+        df (pd.DataFrame): 数据集
+
+    Returns:
+        RowIndex: 行索引
+    """
+    with _indexes_lock:
+        index = _indexes.get(dataset_key)
+        if index is None or not index.matches(df):
+            index = RowIndex(df)
+            _indexes[dataset_key] = index
+        _indexes.move_to_end(dataset_key)
+        while len(_indexes) > PLANNER_CONFIG['index_cache_entries']:
+            _indexes.popitem(last=False)
+        return index
+
+
+def clear_row_indexes():
+    """清除全部行索引（内存预算不足时由内存管理器调用）"""
+    with _indexes_lock:
+        _indexes.clear()
+
+
+def _describe(by, measures, count_name, predicates):
+    target = '、'.join(list(measures) + ([count_name] if count_name else [])) or '明细'
+    query = f"{target} 按 {by}" if by else target
+    if predicates:
+        query += f" | 筛选: {'、'.join('日期' if field == DAY_KEY else field for field in predicates)}"
+    return query
+
+
+class QueryPlanner:
+    """
+    查询规划器
+
+    每次运行按当前筛选条件创建一个实例。rows() 返回筛选后的明细，groupby_sum() 返回分组求和结果，
+    两者都先估算各可用路径的代价再执行代价最低的路径；选出的行在本次运行中复用。
+    """
+
+    def __init__(self, df, aggregates=None, dictionaries=None, dataset_key=None):
+        """
+        Args:
+            df (pd.DataFrame): 预处理后的数据集
+            aggregates (dict): compute_aggregates 的结果，可为空（此时不能走预聚合路径）
+            dictionaries (dict): 字段 -> DimensionDictionary，用于估算选择率
+            dataset_key (str): 数据集标识，用于缓存行索引与记录日志
+        """
+        self.df = df
+        self.aggregates = aggregates or {}
+        self.dictionaries = dictionaries or {}
+        self.dataset_key = dataset_key
+        self.predicates = {}
+        self.plans = []
+        self._selection = None
+        self._rows = None
+        self._lock = threading.Lock()
+
+    def where(self, filters=None, date_range=None):
+        """
+        设置筛选条件
+
+        Args:
+            filters (dict): 字段 -> 取值列表，空列表或全选表示不筛选
+            date_range (tuple): 日期键范围 (起, 止)，含两端；为空或覆盖全部数据时不筛选
+
+        Returns:
+            QueryPlanner: self
+        """
+        self.predicates = {
+            field: list(values) for field, values in (filters or {}).items()
+            if values and not self._covers_all(field, values)
+        }
+        if date_range is not None and date_range[0] is not None:
+            bounds = self._date_bounds()
+            if bounds is None or date_range[0] > bounds[0] or date_range[1] < bounds[1]:
+                self.predicates[DAY_KEY] = (int(date_range[0]), int(date_range[1]))
+        self._selection = None
+        self._rows = None
+        return self
+
+    def _covers_all(self, field, values):
+        """取值覆盖字段的全部取值且字段没有缺失值时，该条件不筛掉任何行（如默认全选）"""
+        dictionary = self.dictionaries.get(field)
+        if dictionary is None or len(values) < len(dictionary):
+            return False
+        return dictionary.counts.sum() == self._total_rows() and set(dictionary.values) <= set(values)
+
+    def _date_bounds(self):
+        # 有预聚合时取其日期范围（监控文件夹的预聚合覆盖全部数据，明细只是日期窗口）；不含缺失日期
+        if DAY_KEY in self.aggregates:
+            keys = self.aggregates[DAY_KEY].index.values
+        elif DAY_KEY in self.df.columns:
+            keys = self.df[DAY_KEY].values
+        else:
+            return None
+        keys = keys[keys != MISSING_DAY_KEY]
+        if len(keys) == 0:
+            return None
+        return keys.min(), keys.max()
+
+    # ---- 选择率估算 ----
+
+    def _selectivity(self, field):
+        """单个筛选条件的估计选择率（取值频次来自维度字典，日期范围来自日期键预聚合）"""
+        condition = self.predicates[field]
+        if field == DAY_KEY:
+            if DAY_KEY in self.aggregates:
+                counts = self.aggregates[DAY_KEY]['订单数']
+                total = counts.sum()
+                if total > 0:
+                    keys = counts.index
+                    return float(counts[(keys >= condition[0]) & (keys <= condition[1])].sum() / total)
+            bounds = self._date_bounds()
+            if bounds is None:
+                return PLANNER_CONFIG['default_selectivity']
+            overlap = min(condition[1], bounds[1]) - max(condition[0], bounds[0]) + 1
+            return max(overlap, 0) / (bounds[1] - bounds[0] + 1)
+
+        dictionary = self.dictionaries.get(field)
+        if dictionary is None or dictionary.counts.sum() == 0:
+            return PLANNER_CONFIG['default_selectivity']
+        counts = dictionary.counts
+        return float(counts.reindex(condition).fillna(0).sum() / counts.sum())
+
+    def _total_rows(self):
+        # 选择率相对于预聚合覆盖的全部数据（监控文件夹的明细只是其中的日期窗口）
+        if DAY_KEY in self.aggregates:
+            return int(self.aggregates[DAY_KEY]['订单数'].sum())
+        return len(self.df)
+
+    def estimate_rows(self):
+        """
+        估计满足全部筛选条件的行数（各条件按相互独立估算）
+
+        Returns:
+            float: 估计行数
+        """
+        selectivity = 1.0
+        for field in self.predicates:
+            selectivity *= self._selectivity(field)
+        return self._total_rows() * selectivity
+
+    # ---- 代价估算 ----
+
+    def _cube_table(self, by, measures):
+        """能回答查询的最小预聚合表；预聚合表的额外维度只能是日期键（必填字段，无缺失）"""
+        needed = set(self.predicates) | ({by} if by else set())
+        best = None
+        for key, table in self.aggregates.items():
+            dims = set(key) if isinstance(key, tuple) else {key}
+            if not needed <= dims or not dims - needed <= {DAY_KEY}:
+                continue
+            if not all(m in table.columns for m in measures) or '订单数' not in table.columns:
+                continue
+            if best is None or len(table) < len(best[1]):
+                best = (key, table)
+        return best
+
+    def _indexed_fields(self):
+        return [field for field in self.predicates if field in self.df.columns]
+
+    def _row_costs(self, columns, group):
+        """行索引与全表扫描路径的代价（纳秒），不可用的路径不在结果中"""
+        costs = PLANNER_CONFIG['costs']
+        rows = len(self.df)
+        selected = min(self.estimate_rows(), rows) if self._selection is None else len(self._selection)
+        # 没有筛选条件时直接使用数据集，无需取出行
+        take = columns * costs['take'] if self.predicates else 0
+        fetch = selected * (take + (costs['group'] if group else 0))
+
+        if self._selection is not None:
+            return {'selection': fetch}
+
+        predicates = len(self.predicates)
+        scan = sum(costs['scan_range'] if field == DAY_KEY else costs['scan'] for field in self.predicates)
+        result = {'scan': rows * scan + fetch}
+        fields = self._indexed_fields()
+        if fields:
+            index = get_row_index(self.dataset_key, self.df)
+            driving = min(self._selectivity(field) for field in fields) * self._total_rows()
+            build = sum(rows * costs['index_build'] for field in fields if not index.has(field))
+            result['index'] = (driving * predicates * costs['probe']
+                               + build / PLANNER_CONFIG['index_amortize'] + fetch)
+        return result
+
+    def _plan(self, by, measures, count_name):
+        costs = {}
+        cube = None
+        if by is not None:
+            cube = self._cube_table(by, measures)
+            if cube is not None:
+                costs['cube'] = len(cube[1]) * (len(self.predicates) + 1) * PLANNER_CONFIG['costs']['cube']
+        columns = len(set(list(measures) + ([by] if by else [])))
+        costs.update(self._row_costs(columns or len(self.df.columns), group=by is not None))
+        costs = {name: cost + PLANNER_CONFIG['costs']['query'] for name, cost in costs.items()}
+        if not PLANNER_CONFIG['enabled']:
+            path = 'selection' if 'selection' in costs else 'scan'
+        else:
+            path = min(costs, key=costs.get)
+        return path, costs, cube
+
+    # ---- 执行 ----
+
+    def _select(self, path):
+        """按指定路径选出满足条件的行号（本次运行内缓存）"""
+        with self._lock:
+            if self._selection is not None:
+                return self._selection
+            df = self.df
+            if not self.predicates:
+                selection = np.arange(len(df))
+            elif path == 'index':
+                selection = self._select_by_index()
+            else:
+                # 全表扫描由计算引擎执行（Polars 引擎下多线程）
+                filters = {field: condition for field, condition in self.predicates.items() if field != DAY_KEY}
+                ranges = {DAY_KEY: self.predicates[DAY_KEY]} if DAY_KEY in self.predicates else None
+                selection = np.flatnonzero(filter_mask(df, filters, ranges))
+            self._selection = selection
+            return selection
+
+    def _predicate_mask(self, field, condition, values):
+        if field == DAY_KEY:
+            return (values >= condition[0]) & (values <= condition[1])
+        return pd.Series(values).isin(condition).values
+
+    def _select_by_index(self):
+        """以选择率最低的条件通过行索引取出候选行，其余条件只在候选行上检查"""
+        df = self.df
+        index = get_row_index(self.dataset_key, df)
+        driving = min(self._indexed_fields(), key=self._selectivity)
+        condition = self.predicates[driving]
+        if driving == DAY_KEY:
+            positions = index.positions(df, DAY_KEY, key_range=condition)
+        else:
+            positions = index.positions(df, driving, values=condition)
+        memory_manager.track('行索引', self.dataset_key, index, self.dataset_key, clear=clear_row_indexes)
+
+        for field, condition in self.predicates.items():
+            if field != driving and len(positions) > 0:
+                positions = positions[self._predicate_mask(field, condition, df[field].values[positions])]
+        return positions
+
+    def _take(self, selection, columns=None):
+        """取出选中的行（只取需要的列）；全部行都被选中时直接使用数据集，不复制"""
+        if len(selection) == len(self.df):
+            return self.df
+        if columns is None:
+            return self.df.take(selection)
+        return pd.DataFrame({col: self.df[col].take(selection) for col in columns})
+
+    def _log(self, query, path, costs, rows, seconds):
+        plan = {
+            'time': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'dataset': self.dataset_key,
+            'query': query,
+            'path': path,
+            'estimated_rows': round(self.estimate_rows()),
+            'rows': int(rows),
+            'estimated_ms': {name: round(cost / 1e6, 3) for name, cost in costs.items()},
+            'actual_ms': round(seconds * 1000, 3)
+        }
+        with self._lock:
+            self.plans.append(plan)
+        recent_plans.append(plan)
+
+        log_path = PLANNER_CONFIG['log_path']
+        if log_path:
+            try:
+                with _log_lock:
+                    os.makedirs(os.path.dirname(log_path) or '.', exist_ok=True)
+                    if (os.path.exists(log_path)
+                            and os.path.getsize(log_path) >= PLANNER_CONFIG['log_max_mb'] * 1024 * 1024):
+                        os.replace(log_path, log_path + '.1')
+                    with open(log_path, 'a', encoding='utf-8') as f:
+                        f.write(json.dumps(plan, ensure_ascii=False) + '\n')
+            except OSError:
+                pass
+
+    def rows(self):
+        """
+        筛选后的明细（本次运行内缓存）
+
+        Returns:
+            pd.DataFrame: 满足全部条件的行，保持原有顺序与索引
+        """
+        if self._rows is not None:
+            return self._rows
+        path, costs, _ = self._plan(None, [], None)
+        start = time.perf_counter()
+        selection = self._select(path)
+        rows = self._take(selection)
+        self._rows = rows
+        self._log(_describe(None, [], None, self.predicates), path, costs, len(rows), time.perf_counter() - start)
+        return rows
+
+    def groupby_sum(self, by, measures, count_name=None):
+        """
+        分组求和（可选计数），结果与对筛选后明细调用 engine.groupby_sum 一致
+
+        Args:
+            by (str): 分组字段
+            measures (list): 求和的指标列
+            count_name (str): 计数列名，为空时不计数
+
+        Returns:
+            pd.DataFrame: 以分组值为索引、按分组值排序的结果
+        """
+        measures = list(measures)
+        path, costs, cube = self._plan(by, measures, count_name)
+        start = time.perf_counter()
+        if path == 'cube':
+            result, rows = self._groupby_cube(cube[1], by, measures, count_name)
+        else:
+            selection = self._select(path)
+            result = groupby_sum(self._take(selection, [by] + measures), by, measures, count_name)
+            rows = len(selection)
+        self._log(_describe(by, measures, count_name, self.predicates), path, costs, rows,
+                  time.perf_counter() - start)
+        return result
+
+    def aggregate_by_period(self, period, value_col='销售额'):
+        """
+        按时间粒度汇总指标，结果与 dimensions.aggregate_by_period 一致
+
+        Args:
+            period (str): 时间粒度
+            value_col (str): 求和的指标列
+
+        Returns:
+            pd.DataFrame: 两列数据框 [时间标签列, value_col]
+        """
+        daily = self.groupby_sum(DAY_KEY, [value_col])[value_col]
+        return rollup_by_period(daily, period).reset_index()
+
+    def _groupby_cube(self, table, by, measures, count_name):
+        """在预聚合表上应用筛选条件并按分组字段上卷，同时返回满足条件的明细行数（用于对照估计行数）"""
+        mask = np.ones(len(table), dtype=bool)
+        for field, condition in self.predicates.items():
+            mask &= self._predicate_mask(field, condition, table.index.get_level_values(field).values)
+        columns = measures + ['订单数'] if count_name else measures
+        selected = table.loc[mask, columns]
+        rows = int(table['订单数'].values[mask].sum())
+        if table.index.nlevels > 1:
+            selected = selected.groupby(level=by, sort=True).sum()
+        if count_name:
+            selected = selected.rename(columns={'订单数': count_name})
+        return selected, rows
@@ -0,0 +1,255 @@
+"""
+BI系统数据概况模块
+数值列的矩与分位数、缺失数、唯一值数由计算引擎计算（见 ENGINE_CONFIG），分类列逐列一次得到高频取值（只保留前N个），
+各列可在共享执行器中并行计算；结果按数据集键或数据指纹缓存，大小与唯一值数量无关
+"""
+
+import hashlib
+import sys
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from config import PROFILE_CONFIG
+import engine
+import parallel
+
+# 内存管理器中的缓存名称
+MEMORY_NAME = '数据概况'
+
+
+def _is_numeric(dtype):
+    return pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_bool_dtype(dtype)
+
+
+def _numeric_profiles(df, columns):
+    # 计算引擎返回以统计量为索引的统计表，转换为各列的概况
+    table = engine.profile(df, columns)
+    profiles = {}
+    for col in columns:
+        stats = table[col]
+        profiles[col] = {
+            'kind': 'numeric',
+            'count': int(stats['count']),
+            'nulls': int(stats['nulls']),
+            'distinct': int(stats['distinct']),
+            **{stat: float(stats[stat]) for stat in engine.DESCRIBE_INDEX[1:]}
+        }
+    return profiles
+
+
+def _categorical_profile(series, top_n):
+    # 一次哈希编码得到缺失数、唯一值数与各取值的频次，只保留频次最高的 top_n 个取值
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        codes, uniques = series.cat.codes.to_numpy(), series.cat.categories
+    else:
+        codes, uniques = pd.factorize(series)
+    valid = codes[codes >= 0]
+    counts = np.bincount(valid, minlength=len(uniques))
+    present = np.flatnonzero(counts)
+
+    if len(present) > top_n:
+        # 第 top_n 大的频次为门槛，高于门槛的全部保留，等于门槛的按首次出现的先后补足
+        threshold = np.partition(counts[present], len(present) - top_n)[len(present) - top_n]
+        above = present[counts[present] > threshold]
+        tied = present[counts[present] == threshold][:top_n - len(above)]
+        top = np.concatenate([above, tied])
+    else:
+        top = present
+    # 按频次降序，同频次按首次出现的先后
+    top = top[np.lexsort((top, -counts[top]))]
+
+    return {
+        'kind': 'categorical',
+        'count': len(valid),
+        'nulls': len(codes) - len(valid),
+        'distinct': len(present),
+        'top': pd.Series(counts[top], index=pd.Index(np.asarray(uniques)[top], name=series.name), name='count'),
+        'other': int(len(valid) - counts[top].sum())
+    }
+
+
+def _datetime_profile(series):
+    values = series.dropna()
+    return {
+        'kind': 'datetime',
+        'count': len(values),
+        'nulls': len(series) - len(values),
+        'min': values.min() if len(values) else pd.NaT,
+        'max': values.max() if len(values) else pd.NaT
+    }
+
+
+def profile_column(series, top_n):
+    """
+    计算单列的概况
+
+    Args:
+        series (pd.Series): 数据列
+        top_n (int): 分类列保留的高频取值数
+
+    Returns:
+        dict: 列概况，'kind' 为 numeric / categorical / datetime
+    """
+    dtype = series.dtype
+    if pd.api.types.is_datetime64_any_dtype(dtype):
+        return _datetime_profile(series)
+    if _is_numeric(dtype):
+        return _numeric_profiles(series.to_frame(), [series.name])[series.name]
+    return _categorical_profile(series, top_n)
+
+
+def _column_profiles(df, columns, top_n):
+    return {col: profile_column(df[col], top_n) for col in columns}
+
+
+def frame_fingerprint(df):
+    """
+    数据框的指纹：列名与类型，以及全部行的内容（一次向量化哈希）
+
+    Args:
+        df (pd.DataFrame): 数据框
+
+    Returns:
+        str: 指纹
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(repr((list(df.columns), [str(dtype) for dtype in df.dtypes])).encode('utf-8'))
+    digest.update(pd.util.hash_pandas_object(df, index=True).values.tobytes())
+    return digest.hexdigest()
+
+
+class DataProfile:
+    """
+    数据集概况：行数与各列概况
+
+    分类列只保留前 top_n 个高频取值及其余取值的合计频次，
+    占用的内存只与列数和 top_n 有关，与数据行数及唯一值数量无关。
+    """
+
+    def __init__(self, rows, columns, top_n):
+        self.rows = rows
+        self.columns = columns
+        self.top_n = top_n
+
+    def columns_of(self, kind):
+        """
+        指定类型的列
+
+        Args:
+            kind (str): numeric / categorical / datetime
+
+        Returns:
+            list: 列名
+        """
+        return [col for col, profile in self.columns.items() if profile['kind'] == kind]
+
+    def numeric_table(self, columns=None):
+        """
+        数值列的描述统计表，形状与 pandas describe() 一致
+
+        Args:
+            columns (list): 数值列，为空表示全部
+
+        Returns:
+            pd.DataFrame: 以统计量为索引、列为字段的统计表
+        """
+        columns = self.columns_of('numeric') if columns is None else list(columns)
+        return pd.DataFrame(
+            {col: [self.columns[col][stat] for stat in engine.DESCRIBE_INDEX] for col in columns},
+            index=engine.DESCRIBE_INDEX, columns=columns, dtype='float64'
+        )
+
+    def top_values(self, column):
+        """
+        分类列的高频取值
+
+        Args:
+            column (str): 分类列
+
+        Returns:
+            pd.Series: 以取值为索引、按频次降序的频次（最多 top_n 个）
+        """
+        return self.columns[column]['top']
+
+    @property
+    def nbytes(self):
+        nbytes = 0
+        for profile in self.columns.values():
+            nbytes += sys.getsizeof(profile)
+            if profile['kind'] == 'categorical':
+                nbytes += int(profile['top'].memory_usage(index=True, deep=True))
+        return nbytes
+
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def profile_frame(df, columns=None, top_n=None, key=None):
+    """
+    计算数据集概况（按数据集键或数据指纹缓存）
+
+    数值列由计算引擎计算：Polars 引擎在一个查询中完成全部数值列，pandas 引擎逐列排序一次；
+    其余各列只遍历一次。数据集达到并行阈值时（见 PARALLEL_CONFIG）各项在共享执行器中并行计算。
+
+    Args:
+        df (pd.DataFrame): 数据框
+        columns (list): 计算概况的列，为空表示全部
+        top_n (int): 分类列保留的高频取值数，默认取 PROFILE_CONFIG['top_n']
+        key (hashable): 数据集的缓存键（如数据集标识与筛选条件），为空时使用 frame_fingerprint
+
+    Returns:
+        DataProfile: 数据集概况
+    """
+    # 内存管理模块依赖本模块，在此处导入
+    from memory import memory_manager
+
+    columns = list(df.columns) if columns is None else [col for col in columns if col in df.columns]
+    if top_n is None:
+        top_n = PROFILE_CONFIG['top_n']
+    if key is None:
+        key = frame_fingerprint(df[columns])
+    cache_key = (key, tuple(columns), top_n)
+
+    with _cache_lock:
+        profile = _cache.get(cache_key)
+        if profile is not None:
+            _cache.move_to_end(cache_key)
+    if profile is not None:
+        memory_manager.touch(MEMORY_NAME, cache_key)
+        return profile
+
+    numeric = [col for col in columns if _is_numeric(df[col].dtype)]
+    if engine.get_backend() == 'polars':
+        tasks = [(_numeric_profiles, df, numeric)] if numeric else []
+    else:
+        tasks = [(_numeric_profiles, df, [col]) for col in numeric]
+    tasks += [(_column_profiles, df, [col], top_n) for col in columns if col not in numeric]
+
+    if PROFILE_CONFIG['parallel'] and len(tasks) > 1 and parallel.should_parallelize(df):
+        executor = parallel.get_executor()
+        futures = [executor.submit(*task) for task in tasks]
+        parts = [future.result() for future in futures]
+    else:
+        parts = [task[0](*task[1:]) for task in tasks]
+    results = {}
+    for part in parts:
+        results.update(part)
+    profile = DataProfile(len(df), {col: results[col] for col in columns}, top_n)
+
+    with _cache_lock:
+        _cache[cache_key] = profile
+        while len(_cache) > PROFILE_CONFIG['cache_entries']:
+            _cache.popitem(last=False)
+    # 超出内存预算时整个缓存被清除
+    memory_manager.track(MEMORY_NAME, cache_key, profile, '共享', clear=clear_profiles,
+                         max_entries=PROFILE_CONFIG['cache_entries'])
+    return profile
+
+
+def clear_profiles():
+    with _cache_lock:
+        _cache.clear()
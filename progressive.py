@@ -0,0 +1,120 @@
+"""
+BI系统渐进式渲染模块
+先用分层样本的估算结果填充页面，精确结果在后台线程中计算，完成后替换估算结果
+"""
+
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from config import SAMPLING_CONFIG
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_refine_executor():
+    """
+    获取进程内共享的精确计算执行器（与并行聚合的执行器分开，避免等待分区结果时占满线程）
+
+    Returns:
+        ThreadPoolExecutor: 线程池
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=SAMPLING_CONFIG['refine_workers'],
+                                           thread_name_prefix='bi-refine')
+        return _executor
+
+
+def should_estimate(df, sample):
+    """
+    判断是否先显示估算结果
+
+    Args:
+        df (pd.DataFrame): 完整数据集
+        sample (pd.DataFrame): 分层样本，可为空
+
+    Returns:
+        bool: 是否渐进式渲染
+    """
+    return (SAMPLING_CONFIG['enabled'] and sample is not None
+            and len(df) >= SAMPLING_CONFIG['min_rows'] and len(sample) < len(df))
+
+
+class ProgressiveRenderer:
+    """
+    渐进式渲染器
+
+    启用时 show() 立即渲染估算结果，并把精确计算提交到后台线程；
+    finish() 依次等待精确结果并在原位置重新渲染。未启用时 show() 直接渲染精确结果。
+    提交的后台任务保存在 futures 中，会话重新运行（如筛选条件变化）时取消上次运行尚未开始的任务。
+    """
+
+    def __init__(self, enabled, stale=None):
+        """
+        Args:
+            enabled (bool): 是否先显示估算结果
+            stale (list): 同一会话上次运行提交的后台任务，尚未开始的被取消
+        """
+        self.enabled = enabled
+        self.futures = []
+        self._pending = []
+        for future in stale or []:
+            future.cancel()
+
+    def submit(self, fn):
+        """
+        提交一个后台任务；未启用时直接执行
+
+        Args:
+            fn (callable): 任务，不应调用 Streamlit
+
+        Returns:
+            Future: 任务结果
+        """
+        if not self.enabled:
+            future = Future()
+            future.set_result(fn())
+            return future
+        future = get_refine_executor().submit(fn)
+        self.futures.append(future)
+        return future
+
+    def show(self, render, exact, approximate=None):
+        """
+        渲染一个指标或图表
+
+        Args:
+            render (callable): render(data, approximate)，将结果写入页面上固定的占位元素
+            exact (callable): 计算精确结果；启用时在后台线程中执行，不应调用 Streamlit
+            approximate (callable): 由样本计算估算结果，为空时直接渲染精确结果
+        """
+        if not self.enabled or approximate is None:
+            render(exact(), False)
+            return
+        render(approximate(), True)
+        self._pending.append((self.submit(exact), render))
+
+    def defer(self, render, exact):
+        """
+        渲染一个没有估算结果的指标或图表：启用时精确计算在后台线程中执行，
+        先以 render(None, True) 显示占位内容，finish() 时替换为精确结果
+
+        Args:
+            render (callable): render(data, approximate)，将结果写入页面上固定的占位元素
+            exact (callable): 计算精确结果，不应调用 Streamlit
+        """
+        if not self.enabled:
+            render(exact(), False)
+            return
+        render(None, True)
+        self._pending.append((self.submit(exact), render))
+
+    def finish(self):
+        """等待全部精确结果并替换估算结果"""
+        pending, self._pending = self._pending, []
+        for future, render in pending:
+            render(future.result(), False)
+        # 任务均已完成，不再保留其结果
+        self.futures.clear()
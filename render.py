@@ -0,0 +1,209 @@
+"""
+BI系统图表渲染模块
+包含图表数据精简、大数据量轨迹切换WebGL，以及按聚合数据指纹缓存图表
+"""
+
+import hashlib
+import sys
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from config import RENDER_CONFIG
+
+# 需要精简的数值数组属性
+NUMERIC_PROPERTIES = ['x', 'y', 'z', 'values']
+
+# 估算图表内存占用时统计的数组属性，对象数组抽取的元素数
+ARRAY_PROPERTIES = NUMERIC_PROPERTIES + ['labels', 'parents', 'ids', 'text', 'hovertext', 'customdata']
+NBYTES_SAMPLE_VALUES = 100
+
+
+def compact_array(values, precision=None):
+    """
+    精简数值数组：整数值的浮点数组转为整数，其余按精度四舍五入，
+    减少序列化后JSON中的数字位数
+
+    Args:
+        values (array-like): 数值数组
+        precision (int): 保留的小数位数，默认取 RENDER_CONFIG['float_precision']
+
+    Returns:
+        array-like: 精简后的数组，非浮点数组原样返回
+    """
+    if precision is None:
+        precision = RENDER_CONFIG['float_precision']
+    if values is None or isinstance(values, str):
+        return values
+
+    arr = np.asarray(values)
+    if arr.dtype.kind != 'f' or arr.ndim != 1:
+        return values
+
+    if np.isfinite(arr).all() and np.array_equal(arr, np.round(arr)):
+        return arr.astype(np.int64)
+    return np.round(arr, precision)
+
+
+def trace_length(trace):
+    """轨迹的数据点数量"""
+    for prop in ('x', 'y', 'values'):
+        values = getattr(trace, prop, None)
+        if values is not None:
+            return len(values)
+    return 0
+
+
+def optimize_figure(fig, webgl_threshold=None, precision=None):
+    """
+    优化图表：数据点较多的散点/折线轨迹切换为WebGL渲染(scattergl)，
+    并精简所有轨迹的数值数组
+
+    Args:
+        fig (go.Figure): 图表对象
+        webgl_threshold (int): 切换WebGL的数据点阈值，默认取 RENDER_CONFIG
+        precision (int): 数值保留的小数位数
+
+    Returns:
+        go.Figure: 优化后的图表对象
+    """
+    if fig is None:
+        return None
+    import plotly.graph_objects as go
+
+    if webgl_threshold is None:
+        webgl_threshold = RENDER_CONFIG['webgl_threshold']
+
+    traces = []
+    converted = False
+    for trace in fig.data:
+        if trace.type == 'scatter' and trace_length(trace) > webgl_threshold:
+            props = trace.to_plotly_json()
+            props.pop('type', None)
+            trace = go.Scattergl(props, skip_invalid=True)
+            converted = True
+        traces.append(trace)
+
+    if converted:
+        fig = go.Figure(data=traces, layout=fig.layout)
+
+    for trace in fig.data:
+        for prop in NUMERIC_PROPERTIES:
+            if prop in trace and trace[prop] is not None:
+                trace[prop] = compact_array(trace[prop], precision)
+        marker = trace['marker'] if 'marker' in trace else None
+        if marker is not None and 'size' in marker and marker.size is not None and not np.isscalar(marker.size):
+            marker.size = compact_array(marker.size, precision)
+
+    return fig
+
+
+def figure_nbytes(fig):
+    """
+    估算图表的内存占用：各轨迹数组属性（含标记的大小与颜色）的大小之和，无需序列化图表
+
+    Args:
+        fig (go.Figure): 图表对象
+
+    Returns:
+        int: 字节数
+    """
+    arrays = []
+    for trace in fig.data:
+        props = trace.to_plotly_json()
+        marker = props.get('marker') or {}
+        arrays.extend(props.get(prop) for prop in ARRAY_PROPERTIES)
+        arrays.extend(marker.get(prop) for prop in ('size', 'color'))
+
+    total = 0
+    for values in arrays:
+        if values is None or isinstance(values, str) or np.isscalar(values):
+            continue
+        arr = np.asarray(values).ravel()
+        total += arr.nbytes
+        if arr.dtype == object and len(arr) > 0:
+            # 字符串等对象按等间隔抽取的元素估算实际大小
+            sampled = arr[::max(1, len(arr) // NBYTES_SAMPLE_VALUES)]
+            total += int(sum(sys.getsizeof(v) for v in sampled) * len(arr) / len(sampled))
+    return total
+
+
+def data_fingerprint(data):
+    """
+    计算聚合数据的指纹
+
+    Args:
+        data (pd.DataFrame | pd.Series): 图表使用的聚合数据
+
+    Returns:
+        str: 指纹
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    if isinstance(data, pd.DataFrame):
+        digest.update(repr(list(data.columns)).encode('utf-8'))
+    else:
+        digest.update(repr(data.name).encode('utf-8'))
+    digest.update(pd.util.hash_pandas_object(data, index=True).values.tobytes())
+    return digest.hexdigest()
+
+
+class FigureCache:
+    """
+    图表缓存：以 (图表名称, 聚合数据指纹) 为键保存已优化的图表对象
+
+    聚合结果未变化时直接复用图表，不再重新构建；相同图表序列化后的内容
+    完全一致，Streamlit 对重复的大消息只发送引用，不会重复传输。
+    缓存的图表按轨迹数组的大小登记到内存管理器，超出内存预算时整个缓存被清除。
+    """
+
+    # 内存管理器中的缓存名称
+    MEMORY_NAME = '图表'
+
+    def __init__(self, max_entries=None):
+        self.max_entries = max_entries or RENDER_CONFIG['figure_cache_entries']
+        self._figures = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_build(self, name, data, build, precision=None):
+        """
+        获取缓存的图表，不存在时构建并缓存
+
+        Args:
+            name (str): 图表名称（含影响图表外观的参数）
+            data (pd.DataFrame | pd.Series): 聚合数据
+            build (callable): 以 data 为参数构建图表的函数
+            precision (int): 数值保留的小数位数，默认取 RENDER_CONFIG
+
+        Returns:
+            go.Figure: 图表对象
+        """
+        # 内存管理模块依赖本模块，在此处导入
+        from memory import memory_manager
+
+        key = (name, data_fingerprint(data))
+        with self._lock:
+            fig = self._figures.get(key)
+            if fig is not None:
+                self._figures.move_to_end(key)
+        if fig is not None:
+            memory_manager.touch(self.MEMORY_NAME, key)
+            return fig
+
+        fig = optimize_figure(build(data), precision=precision)
+
+        with self._lock:
+            self._figures[key] = fig
+            while len(self._figures) > self.max_entries:
+                self._figures.popitem(last=False)
+        memory_manager.track(self.MEMORY_NAME, key, fig, '共享', clear=self.clear,
+                             max_entries=self.max_entries, nbytes=figure_nbytes(fig))
+        return fig
+
+    def clear(self):
+        with self._lock:
+            self._figures.clear()
+
+
+figure_cache = FigureCache()
@@ -3,23 +3,31 @@
 BI数据分析系统启动脚本
 """
 
-import subprocess
+import importlib.util
 import sys
 import os
 
+from config import SERVER_CONFIG
+
+REQUIRED_MODULES = ['streamlit', 'pandas', 'plotly', 'numpy']
+
+# Streamlit 命令行参数形式的服务器配置（server_port 对应 server.port），取自 SERVER_CONFIG
+SERVER_OPTIONS = {
+    "server_port": SERVER_CONFIG['port'],
+    "server_address": SERVER_CONFIG['address'],
+    "server_enableCORS": SERVER_CONFIG['enable_cors'],
+    "server_enableXsrfProtection": SERVER_CONFIG['enable_xsrf_protection']
+}
+
 def check_dependencies():
-    """检查依赖是否已安装"""
-    try:
-        import streamlit
-        import pandas
-        import plotly
-        import numpy
-        print("✅ 所有依赖已安装")
-        return True
-    except ImportError as e:
-        print(f"❌ 缺少依赖: {e}")
+    """检查依赖是否已安装（只查找模块，不导入）"""
+    missing = [name for name in REQUIRED_MODULES if importlib.util.find_spec(name) is None]
+    if missing:
+        print(f"❌ 缺少依赖: {', '.join(missing)}")
         print("请运行: pip install -r requirements.txt")
         return False
+    print("✅ 所有依赖已安装")
+    return True
 
 def main():
     """主函数"""
@@ -34,18 +42,21 @@ def main():
         print("❌ 找不到app.py文件")
         sys.exit(1)
     
-    # 启动Streamlit应用
+    # 在当前进程内启动Streamlit服务器，避免再启动一个解释器重复导入依赖
     try:
         print("🌐 正在启动Web服务器...")
-        print("📱 请在浏览器中访问: http://localhost:8501")
+        print(f"📱 请在浏览器中访问: http://{SERVER_OPTIONS['server_address']}:{SERVER_OPTIONS['server_port']}")
         print("⏹️  按 Ctrl+C 停止服务器")
         print("-" * 50)
         
-        subprocess.run([
-            sys.executable, "-m", "streamlit", "run", "app.py",
-            "--server.port", "8501",
-            "--server.address", "localhost"
-        ])
+        from streamlit.web import bootstrap
+        from warmup import start_background_warmup
+        
+        # 服务器启动的同时在后台预热默认数据集与图表库
+        start_background_warmup()
+        
+        bootstrap.load_config_options(flag_options=SERVER_OPTIONS)
+        bootstrap.run('app.py', 'streamlit run app.py', [], SERVER_OPTIONS)
     except KeyboardInterrupt:
         print("\n👋 服务器已停止")
     except Exception as e:
@@ -53,4 +64,4 @@ def main():
         sys.exit(1)
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
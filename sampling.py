@@ -0,0 +1,191 @@
+"""
+BI系统抽样模块
+在数据接入时按日期与地区构建分层样本，用于在精确结果算出之前快速给出估算值与置信区间
+"""
+
+import numpy as np
+import pandas as pd
+
+from config import SAMPLING_CONFIG
+from dimensions import DAY_KEY, period_codes, rollup_by_period
+
+# 样本附加列：所属层、层总行数、层样本数、权重（层总行数 / 层样本数）
+STRATUM = '_层'
+STRATUM_SIZE = '_层行数'
+STRATUM_SAMPLE_SIZE = '_层样本数'
+WEIGHT = '_权重'
+SAMPLE_COLUMNS = [STRATUM, STRATUM_SIZE, STRATUM_SAMPLE_SIZE, WEIGHT]
+
+
+def stratum_ids(df):
+    """
+    计算每行所属的层（月份 × 分层字段）
+
+    Args:
+        df (pd.DataFrame): 数据框
+
+    Returns:
+        np.ndarray: 从0开始编号的层编号
+    """
+    if len(df) == 0:
+        return np.zeros(0, dtype=np.int64)
+
+    keys = []
+    if DAY_KEY in df.columns:
+        keys.append(period_codes(df[DAY_KEY].values, SAMPLING_CONFIG['strata_period']))
+    for col in SAMPLING_CONFIG['strata_columns']:
+        if col in df.columns:
+            keys.append(pd.factorize(df[col], use_na_sentinel=False)[0])
+
+    if not keys:
+        return np.zeros(len(df), dtype=np.int64)
+    if len(keys) == 1:
+        return pd.factorize(keys[0])[0]
+    return pd.MultiIndex.from_arrays(keys).factorize()[0]
+
+
+def build_stratified_sample(df, sample_rows=None, seed=0):
+    """
+    构建按比例分配的分层随机样本
+
+    每层至少抽取 SAMPLING_CONFIG['min_per_stratum'] 行（不足时取全部），
+    数据量不超过目标样本量时样本即全量，估算结果与精确值一致。
+
+    Args:
+        df (pd.DataFrame): 预处理后的数据框
+        sample_rows (int): 目标样本行数，默认取 SAMPLING_CONFIG['sample_rows']
+        seed (int): 随机种子
+
+    Returns:
+        pd.DataFrame: 样本，附加层编号、层行数、层样本数与权重列
+    """
+    if sample_rows is None:
+        sample_rows = SAMPLING_CONFIG['sample_rows']
+
+    total = len(df)
+    ids = stratum_ids(df)
+    sizes = np.bincount(ids) if total > 0 else np.array([], dtype=np.int64)
+
+    if total <= sample_rows:
+        keep = np.arange(total)
+        sample_sizes = sizes
+    else:
+        sample_sizes = np.round(sample_rows * sizes / total).astype(np.int64)
+        sample_sizes = np.minimum(np.maximum(sample_sizes, SAMPLING_CONFIG['min_per_stratum']), sizes)
+
+        # 层内按随机键排序，取每层排名靠前的 n_h 行
+        rng = np.random.default_rng(seed)
+        order = np.lexsort((rng.random(total), ids))
+        sorted_ids = ids[order]
+        starts = np.concatenate(([0], np.cumsum(sizes)[:-1]))
+        rank = np.arange(total) - starts[sorted_ids]
+        keep = np.sort(order[rank < sample_sizes[sorted_ids]])
+
+    sample = df.iloc[keep].reset_index(drop=True)
+    sample_ids = ids[keep]
+    sample[STRATUM] = sample_ids
+    sample[STRATUM_SIZE] = sizes[sample_ids]
+    sample[STRATUM_SAMPLE_SIZE] = sample_sizes[sample_ids]
+    sample[WEIGHT] = sample[STRATUM_SIZE] / sample[STRATUM_SAMPLE_SIZE]
+    return sample
+
+
+def estimate_total(sample, values=None, mask=None, z=None):
+    """
+    分层估计总量及置信区间半宽
+
+    Args:
+        sample (pd.DataFrame): 完整的分层样本（不要先按筛选条件截取）
+        values (str | None): 求和的指标列，为空时估计行数
+        mask (array-like): 筛选条件对应的布尔掩码，为空表示全部
+        z (float): 置信区间的分位数，默认取 SAMPLING_CONFIG['z']
+
+    Returns:
+        tuple: (估计值, 置信区间半宽)
+    """
+    if z is None:
+        z = SAMPLING_CONFIG['z']
+    if len(sample) == 0:
+        return 0.0, 0.0
+
+    y = sample[values].to_numpy(dtype='float64', na_value=0.0) if values else np.ones(len(sample))
+    if mask is not None:
+        y = np.where(np.asarray(mask), y, 0.0)
+
+    frame = pd.DataFrame({'y': y, 'y2': y * y, STRATUM: sample[STRATUM].values})
+    grouped = frame.groupby(STRATUM)
+    sums = grouped['y'].sum()
+    squares = grouped['y2'].sum()
+    sizes = sample.groupby(STRATUM)[STRATUM_SIZE].first()
+    n = sample.groupby(STRATUM)[STRATUM_SAMPLE_SIZE].first()
+
+    estimate = (sizes / n * sums).sum()
+    variance_h = (squares - sums ** 2 / n) / (n - 1)
+    variance_h = variance_h.where(n > 1, 0.0).clip(lower=0)
+    variance = (sizes ** 2 * (1 - n / sizes) * variance_h / n).sum()
+    return float(estimate), float(z * np.sqrt(variance))
+
+
+def estimate_groupby(sample, by, measures, count_name=None):
+    """
+    按分组估计各组总量（加权求和），结果形状与 parallel.groupby_sum 一致
+
+    Args:
+        sample (pd.DataFrame): 已按筛选条件截取的分层样本
+        by (str | list): 分组字段
+        measures (list): 求和的指标列
+        count_name (str): 计数列名，为空时不计数
+
+    Returns:
+        pd.DataFrame: 以分组值为索引的估计结果
+    """
+    weights = sample[WEIGHT]
+    weighted = pd.DataFrame({m: sample[m] * weights for m in measures}, index=sample.index)
+    if count_name:
+        weighted[count_name] = weights
+    by_values = [sample[col] for col in by] if isinstance(by, list) else sample[by]
+    return weighted.groupby(by_values, observed=True).sum()
+
+
+
+def estimate_by_period(sample, period, value_col='销售额'):
+    """
+    按时间粒度估计指标总量，结果形状与 dimensions.aggregate_by_period 一致
+
+    Args:
+        sample (pd.DataFrame): 已按筛选条件截取的分层样本
+        period (str): 时间粒度
+        value_col (str): 求和的指标列
+
+    Returns:
+        pd.DataFrame: 两列数据框 [时间标签列, value_col]
+    """
+    daily = estimate_groupby(sample, DAY_KEY, [value_col])[value_col]
+    return rollup_by_period(daily, period).reset_index()
+
+def estimate_kpis(sample):
+    """
+    由分层样本估算关键绩效指标，键名与 utils.calculate_kpis 一致
+
+    订单数由各层行数直接得到，是精确值；去重数量取样本中出现的取值数，为下界。
+
+    Args:
+        sample (pd.DataFrame): 完整的分层样本
+
+    Returns:
+        dict: KPI字典，另含 '总销售额误差'（置信区间半宽）
+    """
+    kpis = {'总订单数': int(sample.groupby(STRATUM)[STRATUM_SIZE].first().sum()) if len(sample) else 0}
+
+    if '销售额' in sample.columns:
+        total, margin = estimate_total(sample, '销售额')
+        kpis['总销售额'] = total
+        kpis['总销售额误差'] = margin
+        if kpis['总订单数'] > 0:
+            kpis['平均订单金额'] = total / kpis['总订单数']
+
+    for col, name in [('客户类型', '客户类型数'), ('地区', '地区数'), ('产品类别', '产品类别数')]:
+        if col in sample.columns:
+            kpis[name] = sample[col].nunique()
+
+    return kpis
@@ -13,7 +13,7 @@ if errorlevel 1 (
 
 REM 检查依赖是否安装
 echo 📦 检查依赖...
-python -c "import streamlit, pandas, plotly, numpy" >nul 2>&1
+python -c "import importlib.util, sys; sys.exit(any(importlib.util.find_spec(m) is None for m in ['streamlit', 'pandas', 'plotly', 'numpy']))" >nul 2>&1
 if errorlevel 1 (
     echo ⚠️  缺少依赖，正在安装...
     pip install -r requirements.txt
@@ -29,6 +29,6 @@ echo 🌐 正在启动Web服务器...
 echo 📱 请在浏览器中访问: http://localhost:8501
 echo ⏹️  按 Ctrl+C 停止服务器
 echo.
-streamlit run app.py --server.port 8501 --server.address localhost
+python run.py
 
 pause 
\ No newline at end of file
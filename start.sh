@@ -11,7 +11,7 @@ fi
 
 # 检查依赖是否安装
 echo "📦 检查依赖..."
-python3 -c "import streamlit, pandas, plotly, numpy" &> /dev/null
+python3 -c "import importlib.util, sys; sys.exit(any(importlib.util.find_spec(m) is None for m in ['streamlit', 'pandas', 'plotly', 'numpy']))" &> /dev/null
 if [ $? -ne 0 ]; then
     echo "⚠️  缺少依赖，正在安装..."
     pip3 install -r requirements.txt
@@ -27,4 +27,4 @@ echo "📱 请在浏览器中访问: http://localhost:8501"
 echo "⏹️  按 Ctrl+C 停止服务器"
 echo
 
-streamlit run app.py --server.port 8501 --server.address localhost 
\ No newline at end of file
+python3 run.py 
\ No newline at end of file
@@ -0,0 +1,305 @@
+"""
+BI系统分区存储模块
+将数据集按年/月分区写入本地列式文件并记录各分区文件的统计信息，
+读取时按日期范围裁剪分区，只读取需要的列
+"""
+
+import glob
+import json
+import os
+import re
+import threading
+import uuid
+
+import pandas as pd
+
+from config import WATCH_FOLDER_CONFIG
+from dimensions import DAY_KEY, MISSING_DAY_KEY, period_codes
+from utils import preprocess_data
+
+# 预处理阶段派生的列，落盘时不保存，加载时重新计算
+DERIVED_COLUMNS = [DAY_KEY]
+
+
+class PartitionedStore:
+    """
+    按年/月分区的本地数据集
+
+    目录布局为 {path}/{年}/{月}/part-NNNNNN.parquet（日期缺失的行存放在 {path}/unknown 下），partitions.json 记录每个分区文件的
+    行数、列名与日期键的最小/最大值，读取时据此跳过与日期范围不相交的文件。
+    调用方的元数据（如已接入文件的清单）与分区列表保存在同一个文件中，随追加一起原子提交；
+    调用方的派生状态（如预聚合结果）保存在 state.pkl 中，与分区列表不一致时视为不存在。
+    同一月份的分区文件达到 compact_parts 个时合并为一个文件，避免多次小批量追加后文件过多。
+    """
+
+    def __init__(self, path, compact_parts=None):
+        """
+        Args:
+            path (str): 存储目录
+            compact_parts (int): 同一月份合并分区文件的阈值，默认取 WATCH_FOLDER_CONFIG['compact_parts']
+        """
+        self.path = path
+        self.compact_parts = compact_parts or WATCH_FOLDER_CONFIG['compact_parts']
+        self.parts = []
+        self.metadata = {}
+        self.version = 0
+        self._state_token = None
+        self._lock = threading.Lock()
+
+        os.makedirs(self.path, exist_ok=True)
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+            # 旧版清单只有分区列表
+            if isinstance(manifest, list):
+                self.parts = manifest
+            else:
+                self.parts = manifest['parts']
+                self.metadata = manifest.get('metadata', {})
+                self._state_token = manifest.get('state')
+        # 分区文件编号只增不减，合并后的文件名不会与已有文件重复
+        self._next_part = max((int(re.search(r'part-(\d+)', part['path']).group(1)) for part in self.parts),
+                              default=0) + 1
+        self._migrate_flat_parts()
+
+    @property
+    def manifest_path(self):
+        return os.path.join(self.path, 'partitions.json')
+
+    @property
+    def state_path(self):
+        return os.path.join(self.path, 'state.pkl')
+
+    @property
+    def row_count(self):
+        return sum(part['rows'] for part in self.parts)
+
+    @property
+    def columns(self):
+        """全部分区文件中出现过的列（按首次出现的顺序）"""
+        columns = {}
+        for part in self.parts:
+            columns.update(dict.fromkeys(part['columns']))
+        return list(columns)
+
+    def date_bounds(self):
+        """
+        数据集的日期键范围（不含缺失日期）
+
+        Returns:
+            tuple | None: (最小日期键, 最大日期键)，无数据时为 None
+        """
+        parts = [part for part in self.parts if part['max_key'] != MISSING_DAY_KEY]
+        if not parts:
+            return None
+        return min(part['min_key'] for part in parts), max(part['max_key'] for part in parts)
+
+    @staticmethod
+    def _partition_dir(code):
+        if code == MISSING_DAY_KEY:
+            return 'unknown'
+        year, month = divmod(int(code), 100)
+        return f'{year:04d}/{month:02d}'
+
+    def _migrate_flat_parts(self):
+        """将旧版未分区的 part-*.parquet 文件重写为按月分区的布局"""
+        flat_parts = sorted(glob.glob(os.path.join(self.path, 'part-*.parquet')))
+        for path in flat_parts:
+            self.append(preprocess_data(pd.read_parquet(path)))
+            os.remove(path)
+
+    def _save_manifest(self, parts, metadata, state_token):
+        tmp_path = self.manifest_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'parts': parts, 'metadata': metadata, 'state': state_token}, f, ensure_ascii=False)
+        os.replace(tmp_path, self.manifest_path)
+
+    def _save_state(self, state):
+        # 状态文件先于清单写入：提交前中断时清单中的标识与状态文件不一致，状态视为不存在
+        token = uuid.uuid4().hex
+        pd.to_pickle({'token': token, 'state': state}, self.state_path + '.tmp')
+        os.replace(self.state_path + '.tmp', self.state_path)
+        return token
+
+    def _write_part(self, data, code, min_key, max_key):
+        # data 不含派生列，min_key/max_key 为其日期键范围
+        relative_path = f'{self._partition_dir(code)}/part-{self._next_part:06d}.parquet'
+        full_path = os.path.join(self.path, relative_path)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+
+        data.to_parquet(full_path, index=False)
+        self._next_part += 1
+        return {
+            'path': relative_path,
+            'rows': len(data),
+            'columns': list(data.columns),
+            'min_key': int(min_key),
+            'max_key': int(max_key)
+        }
+
+    def _compact(self, parts, codes):
+        """
+        将文件数达到阈值的月份合并为一个分区文件
+
+        Args:
+            parts (list): 分区列表
+            codes (iterable): 本次写入涉及的月份编码
+
+        Returns:
+            tuple: (合并后的分区列表, 被合并的分区文件)
+        """
+        replaced = []
+        for code in codes:
+            prefix = self._partition_dir(code) + '/'
+            month_parts = [part for part in parts if part['path'].startswith(prefix)]
+            if len(month_parts) < self.compact_parts:
+                continue
+
+            data = pd.concat([self._read_part(part) for part in month_parts], ignore_index=True)
+            merged = self._write_part(data, code, min(part['min_key'] for part in month_parts),
+                                      max(part['max_key'] for part in month_parts))
+            parts = [part for part in parts if not part['path'].startswith(prefix)] + [merged]
+            replaced.extend(month_parts)
+        return parts, replaced
+
+    def append(self, chunk, metadata=None, state=None):
+        """
+        追加一批预处理后的数据，按月份拆分写入各分区
+
+        分区文件先写入新文件名，再以替换清单文件的方式一次提交分区列表与元数据；
+        提交前中断时新文件不被引用，已有数据与元数据保持不变。
+        写入后文件数达到阈值的月份合并为一个文件，被合并的文件在清单提交后删除。
+
+        Args:
+            chunk (pd.DataFrame): 含日期键列的数据框
+            metadata (dict): 与本批数据一起提交的元数据（按键更新）
+            state (object): 与本批数据一起提交的派生状态（可序列化），为空时不变
+        """
+        if len(chunk) == 0 and not metadata and state is None:
+            return
+
+        with self._lock:
+            parts = list(self.parts)
+            replaced = []
+            if len(chunk) > 0:
+                codes = period_codes(chunk[DAY_KEY].values, 'month')
+                for code, part in chunk.groupby(codes, sort=True):
+                    keys = part[DAY_KEY]
+                    data = part.drop(columns=DERIVED_COLUMNS, errors='ignore')
+                    parts.append(self._write_part(data, code, keys.min(), keys.max()))
+                parts, replaced = self._compact(parts, sorted(set(codes)))
+
+            new_metadata = {**self.metadata, **(metadata or {})}
+            state_token = self._save_state(state) if state is not None else self._state_token
+            self._save_manifest(parts, new_metadata, state_token)
+            self.parts, self.metadata, self._state_token = parts, new_metadata, state_token
+            if len(chunk) > 0:
+                self.version += 1
+
+        for part in replaced:
+            os.remove(os.path.join(self.path, part['path']))
+
+    def save_state(self, state):
+        """
+        只提交派生状态（如从分区重建的预聚合结果）
+
+        Args:
+            state (object): 可序列化的状态
+        """
+        with self._lock:
+            state_token = self._save_state(state)
+            self._save_manifest(self.parts, self.metadata, state_token)
+            self._state_token = state_token
+
+    def load_state(self):
+        """
+        读取与分区列表一起提交的派生状态
+
+        Returns:
+            object | None: 状态，不存在或与分区列表不一致时为 None
+        """
+        if self._state_token is None or not os.path.exists(self.state_path):
+            return None
+        saved = pd.read_pickle(self.state_path)
+        if saved.get('token') != self._state_token:
+            return None
+        return saved['state']
+
+    def update_metadata(self, metadata):
+        """
+        只更新元数据（按键更新）
+
+        Args:
+            metadata (dict): 元数据
+        """
+        with self._lock:
+            new_metadata = {**self.metadata, **metadata}
+            self._save_manifest(self.parts, new_metadata, self._state_token)
+            self.metadata = new_metadata
+
+    def select(self, start_key=None, end_key=None):
+        """
+        按日期键范围裁剪分区文件
+
+        Args:
+            start_key (int): 起始日期键（含），为空表示不限
+            end_key (int): 结束日期键（含），为空表示不限
+
+        Returns:
+            list: 与范围相交的分区文件统计信息
+        """
+        return [
+            part for part in self.parts
+            if (start_key is None or part['max_key'] >= start_key)
+            and (end_key is None or part['min_key'] <= end_key)
+        ]
+
+    def _read_part(self, part, columns=None):
+        if columns is not None:
+            columns = [col for col in part['columns'] if col in columns or col == '日期']
+        return pd.read_parquet(os.path.join(self.path, part['path']), columns=columns)
+
+    def iter_parts(self, columns=None):
+        """
+        逐个读取分区文件，内存占用只取决于单个文件
+
+        Args:
+            columns (list): 需要的列，为空表示全部
+
+        Yields:
+            pd.DataFrame: 预处理后的分区数据
+        """
+        for part in list(self.parts):
+            yield preprocess_data(self._read_part(part, columns))
+
+    def read(self, start_key=None, end_key=None, columns=None):
+        """
+        读取日期范围内的数据，只打开相交的分区文件并只读取需要的列
+
+        Args:
+            start_key (int): 起始日期键（含），为空表示不限
+            end_key (int): 结束日期键（含），为空表示不限
+            columns (list): 需要的列（日期列总会读取），为空表示全部
+
+        Returns:
+            pd.DataFrame: 预处理后的数据框
+        """
+        parts = self.select(start_key, end_key)
+        frames = [self._read_part(part, columns) for part in parts]
+        if not frames:
+            empty_columns = [col for col in self.columns if columns is None or col in columns or col == '日期']
+            return preprocess_data(pd.DataFrame(columns=empty_columns or ['日期']))
+
+        df = preprocess_data(pd.concat(frames, ignore_index=True))
+
+        # 分区边界按月，范围两端所在分区还需按行过滤
+        if start_key is not None or end_key is not None:
+            keys = df[DAY_KEY]
+            mask = pd.Series(True, index=df.index)
+            if start_key is not None:
+                mask &= keys >= start_key
+            if end_key is not None:
+                mask &= keys <= end_key
+            if not mask.all():
+                df = df[mask].reset_index(drop=True)
+        return df
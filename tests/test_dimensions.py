@@ -0,0 +1,76 @@
+"""
+日历维度测试：缺失日期不产生 1970-01 等虚假时间段
+"""
+
+import numpy as np
+import pandas as pd
+
+from config import FILTER_CONFIG
+from dimensions import (
+    DAY_KEY, MISSING_DAY_KEY, DimensionDictionary, date_to_key, period_codes, rollup_by_period, aggregate_by_period
+)
+from utils import preprocess_data
+
+
+def test_date_to_key_missing():
+    keys = date_to_key(pd.Series(pd.to_datetime(['2023-01-02', None, '1970-01-01'])))
+    assert keys.dtype == np.int32
+    assert list(keys) == [19359, MISSING_DAY_KEY, 0]
+
+
+def test_period_codes_missing():
+    keys = np.array([19359, MISSING_DAY_KEY, 19390], dtype=np.int32)
+    assert list(period_codes(keys, 'month')) == [202301, MISSING_DAY_KEY, 202302]
+
+
+def test_rollup_excludes_missing():
+    daily = pd.Series([10.0, 5.0, 7.0], index=pd.Index([19359, MISSING_DAY_KEY, 19390], name=DAY_KEY))
+    monthly = rollup_by_period(daily, 'month')
+    assert list(monthly.index) == ['2023-01', '2023-02']
+    assert list(monthly.values) == [10.0, 7.0]
+
+
+def test_aggregate_by_period_with_missing_key():
+    df = pd.DataFrame({DAY_KEY: np.array([19359, MISSING_DAY_KEY], dtype=np.int32), '销售额': [10.0, 5.0]})
+    result = aggregate_by_period(df, 'quarter')
+    assert list(result['季度']) == ['2023Q1']
+
+
+def test_preprocess_keeps_missing_dates():
+    raw = pd.DataFrame({'日期': ['2023-01-02', 'not a date', None], '销售额': [10, 20, 30]})
+    raw['日期'] = pd.to_datetime(raw['日期'], errors='coerce')
+    df = preprocess_data(raw)
+    # 缺失日期的行计入总计，但不归入任何时间段
+    assert len(df) == 3
+    assert df['销售额'].sum() == 60
+    assert list(df[DAY_KEY] == MISSING_DAY_KEY) == [False, True, True]
+    monthly = aggregate_by_period(df, 'month')
+    assert list(monthly['月份']) == ['2023-01']
+    assert list(monthly['销售额']) == [10]
+
+
+def test_dictionary_search_repeatable(monkeypatch):
+    monkeypatch.setitem(FILTER_CONFIG, 'search_cache_entries', 2)
+    dictionary = DimensionDictionary(pd.Series([5, 3, 2, 1], index=['Apple', 'pineapple', 'apricot', 'Banana']))
+    # 前缀匹配在前，子串匹配补足，各自按出现次数降序
+    expected = {('ap', 10): ['Apple', 'apricot', 'pineapple'], ('an', 1): ['Banana'], ('p', 2): ['pineapple', 'Apple']}
+    for _ in range(3):
+        # 检索词数量超过缓存条目数，缓存被清空后结果不变
+        for (query, limit), result in expected.items():
+            assert dictionary.search(query, limit) == result
+    assert dictionary.search(' AP', 10) == expected[('ap', 10)]
+
+    # 调用方修改返回的列表不影响之后的检索结果
+    dictionary.search('ap', 10).clear()
+    assert dictionary.search('ap', 10) == expected[('ap', 10)]
+
+
+def test_dictionary_update_matches_rebuild():
+    old = pd.Series([5, 3, 2], index=['Apple', 'pineapple', 'apricot'])
+    new = pd.Series([4, 7, 1], index=['apricot', 'Apex', 'Banana'])
+    updated = DimensionDictionary(old).update(new)
+    rebuilt = DimensionDictionary(old.add(new, fill_value=0))
+    assert updated.counts.to_dict() == rebuilt.counts.to_dict()
+    assert updated.values == ['Apex', 'apricot', 'Apple', 'pineapple', 'Banana']
+    for query in ['ap', 'an', 'p', 'zz']:
+        assert updated.search(query, 10) == rebuilt.search(query, 10)
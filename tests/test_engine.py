@@ -0,0 +1,114 @@
+"""
+计算引擎测试：pandas 与 Polars 引擎对同一输入给出相同结果
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import engine
+from config import ENGINE_CONFIG
+from dimensions import DAY_KEY
+
+pytest.importorskip('polars')
+
+
+@pytest.fixture
+def df():
+    rng = np.random.default_rng(0)
+    rows = 2000
+    frame = pd.DataFrame({
+        '地区': rng.choice(['北京', '上海', '广州', None], rows),
+        '产品类别': rng.choice(['电子产品', '服装', '食品'], rows),
+        '销售额': rng.integers(100, 5000, rows).astype('float64'),
+        '数量': pd.array(rng.integers(1, 10, rows), dtype='Int64'),
+        DAY_KEY: rng.integers(19358, 19723, rows).astype(np.int32)
+    })
+    frame.loc[::13, '销售额'] = np.nan
+    frame.loc[::17, '数量'] = pd.NA
+    return frame
+
+
+def run_both(monkeypatch, func, *args):
+    """分别以 pandas 与 Polars 引擎执行"""
+    results = []
+    for backend in ('pandas', 'polars'):
+        monkeypatch.setitem(ENGINE_CONFIG, 'backend', backend)
+        results.append(func(*args))
+    return results
+
+
+@pytest.mark.parametrize('by, measures, count_name', [
+    ('地区', ['销售额'], None),
+    ('产品类别', ['销售额', '数量'], '订单数'),
+    (['地区', '产品类别'], ['销售额'], '订单数'),
+    (DAY_KEY, [], '订单数')
+])
+def test_groupby_sum(monkeypatch, df, by, measures, count_name):
+    expected, actual = run_both(monkeypatch, engine.groupby_sum, df, by, measures, count_name)
+    pd.testing.assert_frame_equal(actual, expected, check_index_type=False)
+
+
+def test_groupby_sum_unsorted(monkeypatch, df):
+    expected, actual = run_both(monkeypatch, engine.groupby_sum, df, ['产品类别', '地区'], ['销售额'], '订单数', False)
+    # 不排序时分组的先后顺序不确定
+    pd.testing.assert_frame_equal(actual.sort_index(), expected.sort_index(), check_index_type=False)
+
+
+def test_summary_stats(monkeypatch, df):
+    expected, actual = run_both(monkeypatch, engine.summary_stats, df, '销售额', ['地区', '产品类别'])
+    assert actual['count'] == expected['count']
+    assert actual['non_null'] == expected['non_null']
+    assert actual['sum'] == pytest.approx(expected['sum'])
+    assert actual['min'] == expected['min'] and actual['max'] == expected['max']
+    assert actual['distinct'] == expected['distinct']
+
+
+def test_profile(monkeypatch, df):
+    expected, actual = run_both(monkeypatch, engine.profile, df, ['销售额', '数量', DAY_KEY])
+    pd.testing.assert_frame_equal(actual, expected)
+    # 描述统计部分与 pandas describe() 一致
+    pd.testing.assert_frame_equal(expected.loc[engine.DESCRIBE_INDEX],
+                                  df[['销售额', '数量', DAY_KEY]].describe().astype('float64'))
+
+
+def test_value_counts(monkeypatch, df):
+    expected, actual = run_both(monkeypatch, engine.value_counts, df['地区'])
+    # 同频次取值的先后顺序可能不同
+    pd.testing.assert_series_equal(actual.sort_index(), expected.sort_index(), check_index_type=False)
+    assert list(actual.values) == list(expected.values)
+
+
+def test_parse_dates(monkeypatch):
+    values = pd.Series(['2023-01-05', '2023-12-31', '2024-02-29'], name='日期')
+    expected, actual = run_both(monkeypatch, engine.parse_dates, values, '%Y-%m-%d')
+    pd.testing.assert_series_equal(actual, expected)
+
+
+def test_parse_dates_invalid(monkeypatch):
+    values = pd.Series(['2023-01-05', 'x'])
+    for backend in ('pandas', 'polars'):
+        monkeypatch.setitem(ENGINE_CONFIG, 'backend', backend)
+        with pytest.raises(ValueError):
+            engine.parse_dates(values, '%Y-%m-%d')
+
+
+@pytest.mark.parametrize('filters, ranges', [
+    ({'地区': ['北京', '上海']}, None),
+    ({'地区': ['广州'], '产品类别': ['服装', '食品']}, {DAY_KEY: (19400, 19500)}),
+    ({}, {DAY_KEY: (19358, 19358)}),
+    ({}, None)
+])
+def test_filter_mask(monkeypatch, df, filters, ranges):
+    expected, actual = run_both(monkeypatch, engine.filter_mask, df, filters, ranges)
+    np.testing.assert_array_equal(actual, expected)
+
+
+def test_arrow_conversion_cached(monkeypatch, df):
+    monkeypatch.setitem(ENGINE_CONFIG, 'backend', 'polars')
+    engine.groupby_sum(df, '地区', ['销售额'])
+    converted = engine._arrow_cache[id(df)][1]
+    series = converted['销售额']
+    engine.filter_mask(df, {'地区': ['北京']})
+    assert converted['销售额'] is series
+    assert set(converted) == {'地区', '销售额'}
@@ -0,0 +1,17 @@
+"""
+数据概况测试：未提供缓存键时，任意一行不同的数据框不共用缓存的概况
+"""
+
+import numpy as np
+import pandas as pd
+
+from profiling import profile_frame
+
+
+def test_fingerprint_covers_every_row():
+    df = pd.DataFrame({'销售额': np.arange(5000, dtype='float64'), '地区': ['北京', '上海'] * 2500})
+    assert profile_frame(df).columns['销售额']['max'] == 4999
+
+    changed = df.copy()
+    changed.loc[1, '销售额'] = 1e9
+    assert profile_frame(changed).columns['销售额']['max'] == 1e9
@@ -0,0 +1,61 @@
+"""
+分区存储测试：同一月份的小文件合并后数据不变，派生状态只在与分区列表一致时加载，日期缺失的行单独存放
+"""
+
+import glob
+import os
+
+import pandas as pd
+
+from dimensions import DAY_KEY
+from storage import PartitionedStore
+from utils import preprocess_data
+
+
+def make_chunk(day, rows=3):
+    return preprocess_data(pd.DataFrame({
+        '日期': [day] * rows,
+        '销售额': [10.0] * rows,
+        '地区': ['北京'] * rows
+    }))
+
+
+def test_compacts_month_parts(tmp_path):
+    store = PartitionedStore(str(tmp_path), compact_parts=3)
+    for day in ['2024-01-01', '2024-01-02', '2024-02-01', '2024-01-03']:
+        store.append(make_chunk(day))
+
+    assert sorted(part['path'].split('/part')[0] for part in store.parts) == ['2024/01', '2024/02']
+    assert len(glob.glob(os.path.join(str(tmp_path), '2024', '01', '*.parquet'))) == 1
+
+    reopened = PartitionedStore(str(tmp_path), compact_parts=3)
+    df = reopened.read()
+    assert len(df) == 12
+    assert reopened.date_bounds() == store.date_bounds()
+
+    # 合并后新写入的文件不会覆盖已有文件
+    reopened.append(make_chunk('2024-01-04'))
+    assert len(reopened.read()) == 15
+
+
+def test_state_committed_with_parts(tmp_path):
+    store = PartitionedStore(str(tmp_path))
+    assert store.load_state() is None
+    store.append(make_chunk('2024-01-01'), state={'rows': 3})
+    store.append(make_chunk('2024-01-02'), metadata={'files': {}})
+    assert PartitionedStore(str(tmp_path)).load_state() == {'rows': 3}
+
+    # 状态文件与清单不一致（如提交清单前中断）时视为不存在
+    pd.to_pickle({'token': 'stale', 'state': {'rows': 0}}, store.state_path)
+    assert PartitionedStore(str(tmp_path)).load_state() is None
+
+
+def test_missing_dates_kept_out_of_date_range(tmp_path):
+    store = PartitionedStore(str(tmp_path))
+    chunk = preprocess_data(pd.DataFrame({'日期': ['2024-01-05', None], '销售额': [10.0, 20.0]}))
+    store.append(chunk)
+
+    assert sorted(part['path'].split('/part')[0] for part in store.parts) == ['2024/01', 'unknown']
+    assert store.date_bounds() == (chunk[DAY_KEY].iloc[0], chunk[DAY_KEY].iloc[0])
+    assert store.read()['销售额'].sum() == 30
+    assert store.read(*store.date_bounds())['销售额'].sum() == 10
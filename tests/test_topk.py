@@ -0,0 +1,47 @@
+"""
+Top-K排行测试：逐块更新的摘要在容量足够时与精确结果一致
+"""
+
+import numpy as np
+import pandas as pd
+
+from topk import top_k, approximate_top_k, build_hierarchy, drilldown_top_k
+
+
+def make_frame(rows=5000, products=40):
+    rng = np.random.default_rng(1)
+    frame = pd.DataFrame({
+        '产品名称': rng.choice([f'产品{i}' for i in range(products)], rows),
+        '数量': pd.array(rng.integers(1, 10, rows), dtype='Int64')
+    })
+    frame.loc[::11, '数量'] = pd.NA
+    frame.loc[::29, '产品名称'] = None
+    return frame
+
+
+def test_approximate_matches_exact_with_enough_capacity():
+    df = make_frame()
+    exact = top_k(df.groupby('产品名称')['数量'].sum().astype('float64'), 10)
+    result = approximate_top_k(df, '产品名称', '数量', k=10, capacity=100, chunk_rows=700)
+    assert list(result.index) == list(exact.index)
+    np.testing.assert_allclose(result['估计值'].values, exact.values)
+    assert (result['误差'] == 0).all()
+
+
+def test_approximate_bounds_with_small_capacity():
+    df = make_frame(products=200)
+    exact = df.groupby('产品名称')['数量'].sum().astype('float64')
+    result = approximate_top_k(df, '产品名称', '数量', k=5, capacity=50, chunk_rows=500)
+    true_values = exact.reindex(result.index).values
+    # 估计值不低于真实值，下界不高于真实值
+    assert (result['估计值'].values >= true_values - 1e-9).all()
+    assert (result['下界'].values <= true_values + 1e-9).all()
+
+
+def test_drilldown_on_unsorted_hierarchy():
+    df = make_frame()
+    df['产品类别'] = df['产品名称'].str[-1]
+    hierarchy = build_hierarchy(df, ['产品类别', '产品名称'], '数量')
+    exact = df.groupby(['产品类别', '产品名称'])['数量'].sum()
+    assert list(drilldown_top_k(hierarchy, (), 3).index) == list(top_k(exact.groupby(level=0).sum(), 3).index)
+    assert list(drilldown_top_k(hierarchy, ('1',), 2).index) == list(top_k(exact.xs('1'), 2).index)
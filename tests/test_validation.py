@@ -0,0 +1,22 @@
+"""
+数据校验测试：日期列在全量上检查，任意一行无法解析都会被报告
+"""
+
+import pandas as pd
+
+from utils import validate_data
+
+
+def test_single_bad_date_rejected():
+    dates = pd.date_range('2023-01-01', periods=50000, freq='min').strftime('%Y-%m-%d').tolist()
+    dates[41234] = '2023-13-45'
+    dates[7] = None
+    df = pd.DataFrame({'日期': dates, '销售额': 1.0})
+    valid, errors = validate_data(df, sample_size=100)
+    assert not valid
+    assert errors == ['日期字段格式不正确 (1 行无法解析)']
+
+
+def test_mixed_date_formats_accepted():
+    df = pd.DataFrame({'日期': ['2023-01-02', '2023/02/03', None], '销售额': [1.0, 2.0, 3.0]})
+    assert validate_data(df) == (True, [])
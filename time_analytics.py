@@ -0,0 +1,129 @@
+"""
+BI系统时间分析模块
+基于预聚合的日序列计算滚动窗口、累计及环比/同比指标
+"""
+
+import numpy as np
+import pandas as pd
+
+from config import TIME_ANALYTICS_CONFIG
+from dimensions import DAY_KEY, MISSING_DAY_KEY, key_to_date, rollup_by_period
+from utils import compute_aggregates
+
+# 时间粒度 -> 同比对应的期数
+YOY_LAGS = {
+    'month': 12,
+    'quarter': 4
+}
+
+
+def build_daily_series(df):
+    """
+    构建连续的日序列：经由 compute_aggregates 按日期键聚合，无数据的日期补0
+
+    Args:
+        df (pd.DataFrame): 含日期键列的数据框
+
+    Returns:
+        pd.DataFrame: 以日期键为索引的日聚合结果（销售额、数量、订单数）
+    """
+    if len(df) == 0 or DAY_KEY not in df.columns:
+        return pd.DataFrame(index=pd.Index([], name=DAY_KEY))
+
+    daily = compute_aggregates(df, dimensions=[DAY_KEY], cubes=[])[DAY_KEY]
+    # 缺失日期不属于任何一天
+    daily = daily[daily.index != MISSING_DAY_KEY]
+    if len(daily) == 0:
+        return daily.rename_axis(DAY_KEY)
+    full_range = np.arange(daily.index.min(), daily.index.max() + 1)
+    return daily.reindex(full_range, fill_value=0).rename_axis(DAY_KEY)
+
+
+def growth_rate(current, previous):
+    """
+    增长率，基期为0或缺失时为NaN
+
+    Args:
+        current (pd.Series): 本期值
+        previous (pd.Series): 基期值
+
+    Returns:
+        pd.Series: 增长率
+    """
+    previous = previous.where(previous != 0)
+    return (current - previous) / previous
+
+
+def rolling_metrics(daily, measure=None, windows=None):
+    """
+    计算滚动窗口与累计指标
+
+    Args:
+        daily (pd.DataFrame): build_daily_series 的结果
+        measure (str): 指标列，默认取 TIME_ANALYTICS_CONFIG['measure']
+        windows (list): 滚动窗口天数，默认取 TIME_ANALYTICS_CONFIG['rolling_windows']
+
+    Returns:
+        pd.DataFrame: 以日期为索引，包含当日值、各窗口滚动和与累计值
+    """
+    measure = measure or TIME_ANALYTICS_CONFIG['measure']
+    windows = windows or TIME_ANALYTICS_CONFIG['rolling_windows']
+
+    values = daily[measure]
+    result = pd.DataFrame({measure: values})
+    for window in windows:
+        result[f'{window}日滚动'] = values.rolling(window, min_periods=1).sum()
+    result[f'累计{measure}'] = values.cumsum()
+    result.index = key_to_date(result.index).rename('日期')
+    return result
+
+
+def period_over_period(daily, period, measure=None):
+    """
+    计算按月或按季度的环比与同比
+
+    Args:
+        daily (pd.DataFrame): build_daily_series 的结果
+        period (str): 时间粒度 ('month', 'quarter')
+        measure (str): 指标列
+
+    Returns:
+        pd.DataFrame: 以时间标签为索引，包含汇总值、环比与同比
+    """
+    measure = measure or TIME_ANALYTICS_CONFIG['measure']
+
+    # 日序列连续，上卷后的各期也连续，shift 即对应上一期/去年同期
+    totals = rollup_by_period(daily[measure], period)
+    return pd.DataFrame({
+        measure: totals,
+        '环比': growth_rate(totals, totals.shift(1)),
+        '同比': growth_rate(totals, totals.shift(YOY_LAGS[period]))
+    })
+
+
+def compute_time_metrics(df, measure=None, windows=None):
+    """
+    计算一个筛选状态下的全部时间分析指标
+
+    只扫描一次明细得到日序列，其余指标均由日序列派生。
+
+    Args:
+        df (pd.DataFrame): 含日期键列的数据框
+        measure (str): 指标列
+        windows (list): 滚动窗口天数
+
+    Returns:
+        dict: {'daily': 日序列, 'rolling': 滚动与累计, 'month': 月度环比同比, 'quarter': 季度环比同比}，
+            数据为空或缺少指标列时返回空字典
+    """
+    measure = measure or TIME_ANALYTICS_CONFIG['measure']
+    daily = build_daily_series(df)
+    if len(daily) == 0 or measure not in daily.columns:
+        return {}
+
+    return {
+        'daily': daily,
+        'rolling': rolling_metrics(daily, measure, windows),
+        'month': period_over_period(daily, 'month', measure),
+        'quarter': period_over_period(daily, 'quarter', measure)
+    }
@@ -0,0 +1,205 @@
+"""
+BI系统Top-K排行模块
+包含基于部分选择的精确Top-K、可合并的Space-Saving近似Top-K，以及层级下钻
+"""
+
+import numpy as np
+import pandas as pd
+
+from config import TOPK_CONFIG
+from engine import groupby_sum
+
+
+def top_k(totals, k=None):
+    """
+    精确Top-K：用部分选择代替全量排序
+
+    Args:
+        totals (pd.Series): 以维度值为索引的汇总值
+        k (int): 保留的数量，默认取 TOPK_CONFIG['k']
+
+    Returns:
+        pd.Series: 按汇总值降序排列的前k项
+    """
+    if k is None:
+        k = TOPK_CONFIG['k']
+    if len(totals) <= k:
+        return totals.sort_values(ascending=False)
+
+    values = totals.values
+    idx = np.argpartition(values, len(values) - k)[-k:]
+    idx = idx[np.argsort(values[idx])[::-1]]
+    return totals.iloc[idx]
+
+
+class SpaceSavingSketch:
+    """
+    可合并的Space-Saving重项摘要
+
+    最多保留 capacity 个候选项及其估计值与误差上界。未被保留的项的真实值
+    不超过 floor。多个分区的摘要可以相互合并，合并结果的误差上界可加。
+    仅适用于非负权重（如销量、销售额）。
+    """
+
+    def __init__(self, capacity=None):
+        """
+        Args:
+            capacity (int): 保留的候选项数量，默认取 TOPK_CONFIG['sketch_capacity']
+        """
+        self.capacity = capacity or TOPK_CONFIG['sketch_capacity']
+        self.counts = pd.Series(dtype='float64')
+        self.errors = pd.Series(dtype='float64')
+        self.floor = 0.0
+
+    @classmethod
+    def from_totals(cls, totals, capacity=None):
+        """
+        由一个分区的精确汇总值构建摘要
+
+        Args:
+            totals (pd.Series): 以维度值为索引的汇总值
+            capacity (int): 保留的候选项数量
+
+        Returns:
+            SpaceSavingSketch: 摘要
+        """
+        sketch = cls(capacity)
+        kept = top_k(totals, sketch.capacity).astype('float64')
+        sketch.counts = kept
+        sketch.errors = pd.Series(0.0, index=kept.index)
+        if len(totals) > len(kept):
+            sketch.floor = float(kept.iloc[-1])
+        return sketch
+
+    def update(self, totals):
+        """
+        合并一批新的汇总值
+
+        Args:
+            totals (pd.Series): 以维度值为索引的汇总值
+
+        Returns:
+            SpaceSavingSketch: self
+        """
+        return self.merge(SpaceSavingSketch.from_totals(totals, self.capacity))
+
+    def merge(self, other):
+        """
+        原地合并另一个摘要
+
+        某一方未保留的项按该方的 floor 计入估计值与误差。
+
+        Args:
+            other (SpaceSavingSketch): 另一个摘要
+
+        Returns:
+            SpaceSavingSketch: self
+        """
+        items = self.counts.index.union(other.counts.index)
+        counts = (self.counts.reindex(items, fill_value=self.floor) +
+                  other.counts.reindex(items, fill_value=other.floor))
+        errors = (self.errors.reindex(items, fill_value=self.floor) +
+                  other.errors.reindex(items, fill_value=other.floor))
+        floor = self.floor + other.floor
+
+        kept = top_k(counts, self.capacity)
+        if len(counts) > len(kept):
+            floor = max(floor, float(kept.iloc[-1]))
+
+        self.counts = kept
+        self.errors = errors.reindex(kept.index)
+        self.floor = floor
+        return self
+
+    def top(self, k=None):
+        """
+        获取近似Top-K
+
+        Args:
+            k (int): 数量，默认取 TOPK_CONFIG['k']
+
+        Returns:
+            pd.DataFrame: 列为 估计值、下界、误差，按估计值降序
+        """
+        estimates = top_k(self.counts, k)
+        errors = self.errors.reindex(estimates.index)
+        return pd.DataFrame({
+            '估计值': estimates,
+            '下界': estimates - errors,
+            '误差': errors
+        })
+
+
+def approximate_top_k(df, dim, measure, k=None, capacity=None, chunk_rows=None):
+    """
+    近似Top-K：逐块读取明细更新摘要，内存占用只与摘要容量和块大小有关
+
+    每块用因子化与 bincount 汇总（不排序、不构建分组），再合并到摘要中。
+
+    Args:
+        df (pd.DataFrame): 数据框
+        dim (str): 排行维度
+        measure (str): 汇总指标
+        k (int): 数量
+        capacity (int): 摘要保留的候选项数量
+        chunk_rows (int): 每块行数，默认取 TOPK_CONFIG['chunk_rows']
+
+    Returns:
+        pd.DataFrame: 见 SpaceSavingSketch.top
+    """
+    chunk_rows = chunk_rows or TOPK_CONFIG['chunk_rows']
+    sketch = SpaceSavingSketch(capacity)
+    for start in range(0, len(df), chunk_rows):
+        chunk = df.iloc[start:start + chunk_rows]
+        codes, uniques = pd.factorize(chunk[dim])
+        weights = chunk[measure].to_numpy(dtype='float64', na_value=0.0)
+        valid = codes >= 0
+        totals = np.bincount(codes[valid], weights=weights[valid], minlength=len(uniques))
+        sketch.update(pd.Series(totals, index=pd.Index(uniques, name=dim)))
+    return sketch.top(k)
+
+
+def build_hierarchy(df, levels, measure):
+    """
+    构建层级汇总，用于在层级间下钻时无需重新扫描明细
+
+    分组结果不排序，Top-K 由 top_k 的部分选择得到，无需对全部取值排序。
+
+    Args:
+        df (pd.DataFrame): 数据框
+        levels (list): 由粗到细的维度，例如 ['产品类别', '产品名称']
+        measure (str): 汇总指标
+
+    Returns:
+        pd.Series: 以多级索引为键的汇总值
+    """
+    return groupby_sum(df, levels, [measure], sort=False)[measure]
+
+
+def drilldown_top_k(hierarchy, path=(), k=None):
+    """
+    在层级汇总上获取某一层的Top-K
+
+    Args:
+        hierarchy (pd.Series): build_hierarchy 的结果
+        path (tuple): 已选定的上层取值，空元组表示最顶层
+        k (int): 数量
+
+    Returns:
+        pd.Series: 该层按汇总值降序排列的前k项
+    """
+    if len(path) >= hierarchy.index.nlevels:
+        raise ValueError("已到达最细层级，无法继续下钻")
+
+    subset = hierarchy
+    try:
+        for value in path:
+            subset = subset.xs(value, level=0)
+    except KeyError:
+        subset = pd.Series(dtype=hierarchy.dtype, name=hierarchy.name)
+
+    if subset.index.nlevels > 1:
+        totals = subset.groupby(level=0, sort=False).sum()
+    else:
+        totals = subset
+    return top_k(totals.rename_axis(hierarchy.index.names[len(path)]), k)
@@ -6,42 +6,226 @@ BI系统工具函数模块
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
-import plotly.express as px
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
 import io
+import os
 
-def validate_data(df):
+# 图表库（plotly）在图表函数内按需导入，只做数据处理时无需加载
+
+from config import (
+    AGGREGATE_CONFIG, REQUIRED_FIELDS, OPTIONAL_FIELDS, DATA_SCHEMA,
+    VALIDATION_CONFIG, SAMPLE_DATA_CONFIG
+)
+from engine import groupby_sum, summary_stats, value_counts, parse_dates as parse_formatted_dates
+from render import optimize_figure
+from profiling import profile_frame
+from dimensions import DAY_KEY, PERIOD_COLUMNS, DimensionDictionary, date_to_key, aggregate_by_period
+
+def generate_sample_data():
+    """
+    生成示例数据
+    
+    Returns:
+        pd.DataFrame: 示例数据框
+    """
+    config = SAMPLE_DATA_CONFIG
+    np.random.seed(42)
+    dates = pd.date_range(start=config['start_date'], end=config['end_date'], freq='D')
+    
+    data = []
+    for date in dates:
+        for _ in range(np.random.randint(5, 15)):
+            data.append({
+                '日期': date,
+                '产品类别': np.random.choice(config['categories']),
+                '产品名称': np.random.choice(config['products']),
+                '销售额': np.random.randint(*config['sales_range']),
+                '数量': np.random.randint(*config['quantity_range']),
+                '地区': np.random.choice(config['regions']),
+                '客户类型': np.random.choice(config['customer_types']),
+                '支付方式': np.random.choice(config['payment_methods'])
+            })
+    
+    return pd.DataFrame(data)
+
+# 模式类型 -> 读取时使用的pandas类型
+SCHEMA_DTYPES = {
+    'float': 'float64',
+    'int': 'Int64',
+    'string': str
+}
+
+def parse_dates(values, date_format=None):
+    """
+    按声明的日期格式解析日期，格式不匹配时退回自动推断
+    
+    Args:
+        values (pd.Series): 日期列
+        date_format (str): 日期格式，默认取 DATA_SCHEMA
+        
+    Returns:
+        pd.Series: datetime64 类型的日期列
+    """
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values
+    
+    if date_format is None:
+        date_format = DATA_SCHEMA['日期'].get('format')
+    
+    if date_format:
+        try:
+            return parse_formatted_dates(values, date_format)
+        except (ValueError, TypeError):
+            pass
+    parsed = coerce_dates(values, date_format)
+    if (parsed.isna() & values.notna()).any():
+        raise ValueError("日期字段包含无法解析的值")
+    return parsed
+
+def coerce_dates(values, date_format=None):
+    """
+    解析日期，无法解析的值记为缺失
+    
+    先按声明的格式整列解析一次，只对未解析的非空值再自动推断格式。
+    
+    Args:
+        values (pd.Series): 日期列
+        date_format (str): 日期格式，默认取 DATA_SCHEMA
+        
+    Returns:
+        pd.Series: datetime64 类型的日期列
+    """
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values
+    if date_format is None:
+        date_format = DATA_SCHEMA['日期'].get('format')
+    
+    if date_format:
+        parsed = pd.to_datetime(values, format=date_format, errors='coerce')
+    else:
+        parsed = pd.Series(pd.NaT, index=values.index, dtype='datetime64[ns]', name=values.name)
+    retry = (parsed.isna() & values.notna()).to_numpy()
+    if retry.any():
+        parsed.iloc[retry] = pd.to_datetime(values[retry], errors='coerce').to_numpy()
+    return parsed
+
+def validate_data(df, schema=None, sample_size=None):
     """
     验证数据格式是否符合要求
     
+    字段存在性与数据类型在全量上检查（只看dtype，开销很小）；尚未解析的日期列在全量上
+    向量化解析一次（无法解析的值记为缺失）并报告无法解析的行数；分类取值只在抽样行上检查。
+    
     Args:
         df (pd.DataFrame): 待验证的数据框
+        schema (dict): 字段模式，默认取 DATA_SCHEMA
+        sample_size (int): 抽样行数，默认取 VALIDATION_CONFIG['sample_size']
         
     Returns:
         tuple: (是否有效, 错误信息列表)
     """
+    if schema is None:
+        schema = DATA_SCHEMA
+    if sample_size is None:
+        sample_size = VALIDATION_CONFIG['sample_size']
+    
     errors = []
+    sample = df.sample(n=sample_size, random_state=0) if len(df) > sample_size else df
     
     # 检查必需字段
-    required_fields = ['日期', '销售额']
-    for field in required_fields:
+    for field in REQUIRED_FIELDS:
         if field not in df.columns:
             errors.append(f"缺少必需字段: {field}")
     
     # 检查数据类型
-    if '日期' in df.columns:
-        try:
-            pd.to_datetime(df['日期'])
-        except:
-            errors.append("日期字段格式不正确")
-    
-    if '销售额' in df.columns:
-        if not pd.api.types.is_numeric_dtype(df['销售额']):
-            errors.append("销售额字段必须是数值类型")
+    for field, spec in schema.items():
+        if field not in df.columns:
+            continue
+        dtype = spec.get('dtype')
+        
+        if dtype == 'datetime':
+            if not pd.api.types.is_datetime64_any_dtype(df[field]):
+                invalid = int((coerce_dates(df[field], spec.get('format')).isna() & df[field].notna()).sum())
+                if invalid:
+                    errors.append(f"{field}字段格式不正确 ({invalid:,} 行无法解析)")
+        elif dtype in ('float', 'int'):
+            if not pd.api.types.is_numeric_dtype(df[field]):
+                errors.append(f"{field}字段必须是数值类型")
+        elif dtype == 'string' and spec.get('categories'):
+            invalid = set(sample[field].dropna().unique()) - set(spec['categories'])
+            if invalid:
+                errors.append(f"{field}字段包含不允许的取值: {', '.join(map(str, sorted(invalid, key=str)[:5]))}")
     
     return len(errors) == 0, errors
 
+def _read_frame(reader, source, dtypes, chunksize=None, on_chunk=None):
+    """按块读取CSV（Excel整体读取），每读完一块回调一次已读行数"""
+    if chunksize is None or reader is not pd.read_csv:
+        df = reader(source, dtype=dtypes) if dtypes else reader(source)
+        if on_chunk is not None:
+            on_chunk(len(df))
+        return df
+    
+    chunks = []
+    rows = 0
+    with pd.read_csv(source, dtype=dtypes, chunksize=chunksize) as chunk_reader:
+        for chunk in chunk_reader:
+            chunks.append(chunk)
+            rows += len(chunk)
+            if on_chunk is not None:
+                on_chunk(rows)
+    return pd.concat(chunks, ignore_index=True)
+
+def read_data_file(source, filename=None, schema=None, chunksize=None, on_chunk=None):
+    """
+    读取CSV或Excel数据文件
+    
+    按字段模式声明的类型直接解析，省去类型推断；日期列按声明的格式
+    在读取时解析一次。声明的类型与文件内容不符时退回自动推断，
+    由 validate_data 报告具体问题。
+    
+    Args:
+        source (str | file-like): 文件路径或文件对象
+        filename (str): 文件名，用于判断格式；为空时取自source
+        schema (dict): 字段模式，默认取 DATA_SCHEMA
+        chunksize (int): CSV按块读取的行数，为空时一次读取
+        on_chunk (callable): 每读完一块调用 on_chunk(已读行数)，可抛出异常中止读取
+        
+    Returns:
+        pd.DataFrame: 读取的数据框
+    """
+    if filename is None:
+        filename = source if isinstance(source, str) else getattr(source, 'name', '')
+    if schema is None:
+        schema = DATA_SCHEMA
+    
+    ext = os.path.splitext(filename)[1].lower()
+    if ext == '.csv':
+        reader = pd.read_csv
+    elif ext in ('.xlsx', '.xls'):
+        reader = pd.read_excel
+    else:
+        raise ValueError(f"不支持的文件格式: {ext}")
+    
+    dtypes = {
+        field: SCHEMA_DTYPES[spec['dtype']]
+        for field, spec in schema.items() if spec.get('dtype') in SCHEMA_DTYPES
+    }
+    try:
+        df = _read_frame(reader, source, dtypes, chunksize, on_chunk)
+    except (ValueError, TypeError):
+        if hasattr(source, 'seek'):
+            source.seek(0)
+        df = _read_frame(reader, source, None, chunksize, on_chunk)
+    
+    for field, spec in schema.items():
+        if spec.get('dtype') == 'datetime' and field in df.columns:
+            try:
+                df[field] = parse_dates(df[field], spec.get('format'))
+            except (ValueError, TypeError):
+                pass
+    
+    return df
+
 def preprocess_data(df):
     """
     数据预处理
@@ -54,18 +238,16 @@ def preprocess_data(df):
     """
     df_processed = df.copy()
     
-    # 处理日期字段
+    # 处理日期字段：时间属性由日历维度表按唯一日期提供，事实表只保存整数日期键；
+    # 日期缺失的行保留（日期键为 MISSING_DAY_KEY），计入总计但不归入任何时间段
     if '日期' in df_processed.columns:
-        df_processed['日期'] = pd.to_datetime(df_processed['日期'])
-        df_processed['月份'] = df_processed['日期'].dt.to_period('M')
-        df_processed['季度'] = df_processed['日期'].dt.to_period('Q')
-        df_processed['年份'] = df_processed['日期'].dt.year
-        df_processed['星期'] = df_processed['日期'].dt.day_name()
+        df_processed['日期'] = parse_dates(df_processed['日期'])
+        df_processed[DAY_KEY] = date_to_key(df_processed['日期'])
     
-    # 处理数值字段
+    # 处理数值字段（读取时已按模式解析的列无需再转换）
     numeric_fields = ['销售额', '数量']
     for field in numeric_fields:
-        if field in df_processed.columns:
+        if field in df_processed.columns and not pd.api.types.is_numeric_dtype(df_processed[field]):
             df_processed[field] = pd.to_numeric(df_processed[field], errors='coerce')
     
     return df_processed
@@ -82,53 +264,139 @@ def calculate_kpis(df):
     """
     kpis = {}
     
+    # 和、计数、最值与去重集合可分区计算后合并，数据量大时并行
+    stats = summary_stats(df, '销售额', ['客户类型', '地区', '产品类别'])
+    
     if '销售额' in df.columns:
-        kpis['总销售额'] = df['销售额'].sum()
-        kpis['平均销售额'] = df['销售额'].mean()
-        kpis['最大销售额'] = df['销售额'].max()
-        kpis['最小销售额'] = df['销售额'].min()
+        kpis['总销售额'] = stats['sum']
+        kpis['平均销售额'] = stats['sum'] / stats['non_null'] if stats['non_null'] > 0 else np.nan
+        kpis['最大销售额'] = stats['max']
+        kpis['最小销售额'] = stats['min']
     
-    kpis['总订单数'] = len(df)
+    kpis['总订单数'] = stats['count']
     
-    if '销售额' in df.columns and len(df) > 0:
-        kpis['平均订单金额'] = df['销售额'].sum() / len(df)
+    if '销售额' in df.columns and stats['count'] > 0:
+        kpis['平均订单金额'] = stats['sum'] / stats['count']
     
     if '客户类型' in df.columns:
-        kpis['客户类型数'] = df['客户类型'].nunique()
+        kpis['客户类型数'] = len(stats['distinct']['客户类型'])
     
     if '地区' in df.columns:
-        kpis['地区数'] = df['地区'].nunique()
+        kpis['地区数'] = len(stats['distinct']['地区'])
     
     if '产品类别' in df.columns:
-        kpis['产品类别数'] = df['产品类别'].nunique()
+        kpis['产品类别数'] = len(stats['distinct']['产品类别'])
     
     return kpis
 
+def compute_aggregates(df, dimensions=None, cubes=None):
+    """
+    按维度计算可合并的预聚合结果
+    
+    每个维度得到一张以维度值为索引的小表，包含销售额、数量之和与订单数；
+    每个多维组合（如日期键 × 地区）得到一张以元组为键、多级索引的小表。
+    多批数据的结果可以通过 merge_aggregates 直接相加合并。
+    
+    Args:
+        df (pd.DataFrame): 预处理后的数据框
+        dimensions (list): 聚合维度，默认取 AGGREGATE_CONFIG['dimensions']
+        cubes (list): 多维组合，默认取 AGGREGATE_CONFIG['cubes']
+        
+    Returns:
+        dict: {维度 或 维度元组: pd.DataFrame}
+    """
+    if dimensions is None:
+        dimensions = AGGREGATE_CONFIG['dimensions']
+    if cubes is None:
+        cubes = AGGREGATE_CONFIG['cubes']
+    
+    measures = [field for field in ['销售额', '数量'] if field in df.columns]
+    aggregates = {}
+    for dim in dimensions:
+        if dim not in df.columns:
+            continue
+        aggregates[dim] = groupby_sum(df, dim, measures, count_name='订单数')
+    for dims in cubes:
+        if all(dim in df.columns for dim in dims):
+            aggregates[tuple(dims)] = groupby_sum(df, list(dims), measures, count_name='订单数')
+    
+    return aggregates
+
+def merge_aggregates(base, delta):
+    """
+    将增量预聚合结果合并到已有结果中（原地更新）
+    
+    Args:
+        base (dict): 已有的预聚合结果，会被修改
+        delta (dict): 新数据的预聚合结果
+        
+    Returns:
+        dict: 合并后的预聚合结果 (即base)
+    """
+    for dim, agg in delta.items():
+        if dim in base:
+            levels = list(range(agg.index.nlevels))
+            base[dim] = pd.concat([base[dim], agg]).groupby(level=levels).sum()
+        else:
+            base[dim] = agg.copy()
+    
+    return base
+
+# 可筛选的字段：可选字段中的文本字段
+FILTER_FIELDS = [field for field in OPTIONAL_FIELDS if DATA_SCHEMA.get(field, {}).get('dtype') == 'string']
+
+def build_dimension_dictionaries(df=None, aggregates=None, base=None):
+    """
+    构建可筛选字段的维度字典（取值、出现次数与检索索引）
+    
+    已有预聚合结果的字段直接取其订单数，无需扫描明细。
+    提供 base 时 df/aggregates 为新增数据，与 base 中的字典合并（只为新取值建立检索索引）。
+    
+    Args:
+        df (pd.DataFrame): 数据框
+        aggregates (dict): compute_aggregates 的结果
+        base (dict): 已有的维度字典（字段 -> DimensionDictionary）
+        
+    Returns:
+        dict: 字段 -> DimensionDictionary
+    """
+    dictionaries = {}
+    for field in FILTER_FIELDS:
+        if aggregates and field in aggregates:
+            counts = aggregates[field]['订单数']
+        elif df is not None and field in df.columns:
+            counts = value_counts(df[field])
+        else:
+            continue
+        if base and field in base:
+            dictionaries[field] = base[field].update(counts)
+        else:
+            dictionaries[field] = DimensionDictionary(counts)
+    
+    return dictionaries
+
 def create_sales_trend_chart(df, period='month'):
     """
     创建销售趋势图表
     
     Args:
         df (pd.DataFrame): 数据框
-        period (str): 时间周期 ('month', 'quarter', 'week')
+        period (str): 时间周期 ('month', 'quarter', 'week', 'iso_week', 'year', 'fiscal')，
+            其中 'week' 按星期几汇总
         
     Returns:
         plotly.graph_objects.Figure: 图表对象
     """
-    if '销售额' not in df.columns:
+    import plotly.express as px
+    
+    if '销售额' not in df.columns or DAY_KEY not in df.columns:
         return None
     
-    if period == 'month' and '月份' in df.columns:
-        group_col = '月份'
-    elif period == 'quarter' and '季度' in df.columns:
-        group_col = '季度'
-    elif period == 'week' and '星期' in df.columns:
-        group_col = '星期'
-    else:
+    if period not in PERIOD_COLUMNS:
         return None
     
-    sales_data = df.groupby(group_col)['销售额'].sum().reset_index()
-    sales_data[group_col] = sales_data[group_col].astype(str)
+    sales_data = aggregate_by_period(df, period)
+    group_col = sales_data.columns[0]
     
     fig = px.line(
         sales_data,
@@ -144,7 +412,54 @@ def create_sales_trend_chart(df, period='month'):
         height=400
     )
     
-    return fig
+    return optimize_figure(fig)
+
+# 增长率图表保留的小数位数（显示为百分比时精确到0.01%）
+GROWTH_PRECISION = 4
+
+def create_time_metrics_chart(data, view='rolling'):
+    """
+    创建时间分析指标图表
+    
+    Args:
+        data (pd.DataFrame): time_analytics.compute_time_metrics 结果中对应视图的数据
+        view (str): 视图 ('rolling': 滚动销售额, 'cumulative': 累计销售额,
+            'month': 月度环比/同比, 'quarter': 季度环比/同比)
+        
+    Returns:
+        plotly.graph_objects.Figure: 图表对象
+    """
+    import plotly.express as px
+    
+    if data is None or len(data) == 0:
+        return None
+    
+    plot_data = data.reset_index()
+    x_col = plot_data.columns[0]
+    
+    if view == 'rolling':
+        y_cols = [col for col in data.columns if col.endswith('日滚动')]
+        fig = px.line(plot_data, x=x_col, y=[data.columns[0]] + y_cols, title="滚动销售趋势")
+        fig.update_layout(yaxis_title="销售额 (¥)", legend_title_text="")
+    elif view == 'cumulative':
+        y_col = [col for col in data.columns if col.startswith('累计')][0]
+        fig = px.area(plot_data, x=x_col, y=y_col, title="累计销售趋势")
+        fig.update_layout(yaxis_title="销售额 (¥)")
+    elif view in ('month', 'quarter'):
+        fig = px.bar(
+            plot_data,
+            x=x_col,
+            y=['环比', '同比'],
+            barmode='group',
+            title="月度环比/同比" if view == 'month' else "季度环比/同比"
+        )
+        fig.update_xaxes(type='category')
+        fig.update_layout(yaxis_title="增长率", yaxis_tickformat='.1%', legend_title_text="")
+    else:
+        return None
+    
+    fig.update_layout(height=400)
+    return optimize_figure(fig, precision=GROWTH_PRECISION)
 
 def create_category_analysis_chart(df, chart_type='pie'):
     """
@@ -157,10 +472,12 @@ def create_category_analysis_chart(df, chart_type='pie'):
     Returns:
         plotly.graph_objects.Figure: 图表对象
     """
+    import plotly.express as px
+    
     if '产品类别' not in df.columns or '销售额' not in df.columns:
         return None
     
-    category_data = df.groupby('产品类别')['销售额'].sum().reset_index()
+    category_data = groupby_sum(df, '产品类别', ['销售额']).reset_index()
     
     if chart_type == 'pie':
         fig = px.pie(
@@ -180,7 +497,7 @@ def create_category_analysis_chart(df, chart_type='pie'):
         )
     
     fig.update_layout(height=400)
-    return fig
+    return optimize_figure(fig)
 
 def create_region_analysis_chart(df):
     """
@@ -192,12 +509,17 @@ def create_region_analysis_chart(df):
     Returns:
         plotly.graph_objects.Figure: 图表对象
     """
+    import plotly.express as px
+    import plotly.graph_objects as go
+    from plotly.subplots import make_subplots
+    
     if '地区' not in df.columns:
         return None
     
     # 地区销售情况
-    region_sales = df.groupby('地区')['销售额'].sum().reset_index() if '销售额' in df.columns else None
-    region_orders = df.groupby('地区').size().reset_index(name='订单数')
+    region_data = groupby_sum(df, '地区', [m for m in ['销售额'] if m in df.columns], count_name='订单数').reset_index()
+    region_sales = region_data[['地区', '销售额']] if '销售额' in df.columns else None
+    region_orders = region_data[['地区', '订单数']]
     
     if region_sales is not None:
         fig = make_subplots(
@@ -227,7 +549,7 @@ def create_region_analysis_chart(df):
         )
     
     fig.update_layout(height=400, showlegend=False)
-    return fig
+    return optimize_figure(fig)
 
 def create_customer_analysis_chart(df):
     """
@@ -239,12 +561,19 @@ def create_customer_analysis_chart(df):
     Returns:
         plotly.graph_objects.Figure: 图表对象
     """
+    import plotly.express as px
+    import plotly.graph_objects as go
+    from plotly.subplots import make_subplots
+    
     if '客户类型' not in df.columns:
         return None
     
     # 客户类型分析
-    customer_data = df.groupby('客户类型')['销售额'].sum().reset_index() if '销售额' in df.columns else None
-    payment_data = df['支付方式'].value_counts().reset_index() if '支付方式' in df.columns else None
+    customer_data = groupby_sum(df, '客户类型', ['销售额']).reset_index() if '销售额' in df.columns else None
+    payment_data = (
+        groupby_sum(df, '支付方式', [], count_name='使用次数')
+        .sort_values('使用次数', ascending=False).reset_index()
+    ) if '支付方式' in df.columns else None
     
     if customer_data is not None and payment_data is not None:
         fig = make_subplots(
@@ -261,7 +590,7 @@ def create_customer_analysis_chart(df):
         
         # 支付方式柱状图
         fig.add_trace(
-            go.Bar(x=payment_data['index'], y=payment_data['支付方式'], name='支付方式'),
+            go.Bar(x=payment_data['支付方式'], y=payment_data['使用次数'], name='支付方式'),
             row=1, col=2
         )
     else:
@@ -273,37 +602,57 @@ def create_customer_analysis_chart(df):
         )
     
     fig.update_layout(height=400, showlegend=False)
-    return fig
+    return optimize_figure(fig)
 
-def generate_summary_report(df):
+def generate_summary_report(df, key=None):
     """
     生成数据摘要报告
     
     Args:
         df (pd.DataFrame): 数据框
+        key (hashable): 数据集的缓存键（如数据集标识），为空时按数据框的指纹缓存
         
     Returns:
-        dict: 摘要报告字典
+        dict: 摘要报告字典；分类字段只列出前 PROFILE_CONFIG['top_n'] 个高频取值，
+            报告大小与唯一值数量无关
     """
+    # 全部统计量由数据概况逐列一次计算得到（按数据集键或数据指纹缓存）
+    profile = profile_frame(df, [col for col in df.columns if col != DAY_KEY], key=key)
     report = {}
-    
+
     # 基本信息
     report['数据行数'] = len(df)
     report['数据列数'] = len(df.columns)
-    report['时间范围'] = f"{df['日期'].min().date()} 至 {df['日期'].max().date()}" if '日期' in df.columns else "无日期数据"
-    
+    if '日期' in df.columns and profile.columns['日期']['kind'] == 'datetime':
+        dates = profile.columns['日期']
+        report['时间范围'] = f"{dates['min'].date()} 至 {dates['max'].date()}"
+    else:
+        report['时间范围'] = "无日期数据"
+
     # 数值型数据统计
-    numeric_cols = df.select_dtypes(include=[np.number]).columns
-    if len(numeric_cols) > 0:
-        report['数值型字段统计'] = df[numeric_cols].describe().to_dict()
-    
+    numeric_cols = profile.columns_of('numeric')
+    if numeric_cols:
+        report['数值型字段统计'] = {
+            col: {
+                **profile.numeric_table([col])[col].to_dict(),
+                '缺失数': profile.columns[col]['nulls'],
+                '唯一值数': profile.columns[col]['distinct']
+            } for col in numeric_cols
+        }
+
     # 分类数据统计
-    categorical_cols = df.select_dtypes(include=['object']).columns
-    if len(categorical_cols) > 0:
+    categorical_cols = profile.columns_of('categorical')
+    if categorical_cols:
         report['分类字段统计'] = {}
         for col in categorical_cols:
-            report['分类字段统计'][col] = df[col].value_counts().to_dict()
-    
+            stats = profile.columns[col]
+            report['分类字段统计'][col] = {
+                '高频取值': stats['top'].to_dict(),
+                '其他取值频次': stats['other'],
+                '唯一值数': stats['distinct'],
+                '缺失数': stats['nulls']
+            }
+
     return report
 
 def export_data(df, format='csv'):
@@ -0,0 +1,150 @@
+"""
+BI系统预热模块
+服务启动时在后台构建默认数据集及其预聚合结果，并持久化快照，
+重启或新扩容的进程可直接从快照加载
+"""
+
+import hashlib
+import json
+import os
+import threading
+
+from config import SAMPLE_DATA_CONFIG, SNAPSHOT_CONFIG
+
+_lock = threading.Lock()
+_default = {}
+
+
+def snapshot_fingerprint():
+    """
+    默认数据集快照的指纹，示例数据配置或快照版本变化时快照失效
+
+    Returns:
+        str: 指纹
+    """
+    payload = json.dumps([SAMPLE_DATA_CONFIG, SNAPSHOT_CONFIG['version']], sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+def _snapshot_paths():
+    path = SNAPSHOT_CONFIG['path']
+    return (
+        os.path.join(path, 'default.parquet'),
+        os.path.join(path, 'default_aggregates.pkl'),
+        os.path.join(path, 'meta.json')
+    )
+
+
+def _load_snapshot():
+    """从磁盘加载快照，快照不存在或已失效时返回 None"""
+    import pandas as pd
+
+    data_path, aggregates_path, meta_path = _snapshot_paths()
+    if not all(os.path.exists(p) for p in (data_path, aggregates_path, meta_path)):
+        return None
+
+    with open(meta_path, 'r', encoding='utf-8') as f:
+        meta = json.load(f)
+    if meta.get('fingerprint') != snapshot_fingerprint():
+        return None
+
+    return pd.read_parquet(data_path), pd.read_pickle(aggregates_path)
+
+
+def _save_snapshot(df, aggregates):
+    """将默认数据集及预聚合结果写入磁盘快照"""
+    import pandas as pd
+
+    data_path, aggregates_path, meta_path = _snapshot_paths()
+    os.makedirs(SNAPSHOT_CONFIG['path'], exist_ok=True)
+
+    # 先写临时文件再替换，避免并发启动的进程读到不完整的快照
+    df.to_parquet(data_path + '.tmp', index=False)
+    os.replace(data_path + '.tmp', data_path)
+    pd.to_pickle(aggregates, aggregates_path + '.tmp')
+    os.replace(aggregates_path + '.tmp', aggregates_path)
+    with open(meta_path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump({'fingerprint': snapshot_fingerprint(), 'rows': len(df)}, f)
+    os.replace(meta_path + '.tmp', meta_path)
+
+
+def get_default_dataset():
+    """
+    获取默认（示例）数据集及其预聚合结果
+
+    依次使用进程内缓存、磁盘快照，都不可用时重新生成并写入快照；
+    分层样本与维度字典随数据集一同构建，见 get_default_sample() 与 get_default_dictionaries()。
+    明细与样本登记到内存管理器，超出内存预算时可能被溢出到磁盘，访问时透明重新加载。
+    返回的数据为进程内共享对象，调用方不应修改。
+
+    Returns:
+        tuple: (预处理后的数据框, 预聚合结果字典)
+    """
+    from memory import memory_manager
+    from sampling import build_stratified_sample, SAMPLE_COLUMNS
+    from storage import DERIVED_COLUMNS
+    from utils import build_dimension_dictionaries
+
+    with _lock:
+        if not _default:
+            snapshot = _load_snapshot() if SNAPSHOT_CONFIG['enabled'] else None
+            if snapshot is None:
+                from utils import generate_sample_data, preprocess_data, compute_aggregates
+
+                df = preprocess_data(generate_sample_data())
+                aggregates = compute_aggregates(df)
+                if SNAPSHOT_CONFIG['enabled']:
+                    try:
+                        _save_snapshot(df, aggregates)
+                    except OSError as e:
+                        print(f"⚠️  快照写入失败: {e}")
+                snapshot = (df, aggregates)
+            df, aggregates = snapshot
+            _default['aggregates'] = aggregates
+            _default['dictionaries'] = build_dimension_dictionaries(df, aggregates)
+            _default['sample'] = memory_manager.manage(build_stratified_sample(df), 'sample', '样本',
+                                                       derived_columns=DERIVED_COLUMNS + SAMPLE_COLUMNS)
+            _default['data'] = memory_manager.manage(df, 'sample', '明细')
+            memory_manager.track('预聚合', 'sample', aggregates, 'sample')
+            memory_manager.track('维度字典', 'sample', _default['dictionaries'], 'sample')
+        return _default['data'].get(), _default['aggregates']
+
+
+def get_default_sample():
+    """
+    获取默认数据集的分层样本（与数据集一同构建）
+
+    Returns:
+        pd.DataFrame: 分层样本
+    """
+    get_default_dataset()
+    return _default['sample'].get()
+
+
+def get_default_dictionaries():
+    """
+    获取默认数据集可筛选字段的维度字典（与数据集一同构建）
+
+    Returns:
+        dict: 字段 -> DimensionDictionary
+    """
+    get_default_dataset()
+    return _default['dictionaries']
+
+
+def warm_start():
+    """预热：构建默认数据集，并提前导入图表库"""
+    get_default_dataset()
+    import plotly.express  # noqa: F401
+
+
+def start_background_warmup():
+    """
+    在后台线程中预热，服务器可同时开始接受连接
+
+    Returns:
+        threading.Thread: 预热线程
+    """
+    thread = threading.Thread(target=warm_start, name='bi-warmup', daemon=True)
+    thread.start()
+    return thread